@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Compare the ABR algorithms with a batch sweep over synthetic traces of stable, varying and mobile networks
+"""
+
+import argparse
+import collections
+import json
+import logging
+import os
+import random
+import tempfile
+
+from dash_emulator.batch import BatchRunner, build_sessions
+from dash_emulator.player_factory import ABR_CONTROLLERS
+
+MPD_TEMPLATE = """<?xml version="1.0" encoding="utf-8"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" mediaPresentationDuration="PT{total:.1f}S"
+     minBufferTime="PT{duration:.1f}S" maxSegmentDuration="PT{duration:.1f}S">
+  <Period id="0" start="PT0.0S">
+    <AdaptationSet id="0" contentType="video" frameRate="30/1" maxWidth="1920" maxHeight="1080" par="16:9">
+{video}
+    </AdaptationSet>
+    <AdaptationSet id="1" contentType="audio">
+{audio}
+    </AdaptationSet>
+  </Period>
+</MPD>
+"""
+
+REPRESENTATION_TEMPLATE = """      <Representation id="{id}" mimeType="{mime}" codecs="avc1" bandwidth="{bandwidth}" width="1920"
+                      height="1080">
+        <SegmentTemplate timescale="1000" initialization="init-$RepresentationID$.m4s"
+                         media="chunk-$RepresentationID$-$Number%05d$.m4s" startNumber="1">
+          <SegmentTimeline>
+            <S t="0" d="{duration_ms}" r="{num_segments}"/>
+          </SegmentTimeline>
+        </SegmentTemplate>
+      </Representation>"""
+
+VIDEO_BITRATES = [300000, 750000, 1200000, 2400000, 4800000, 8000000]
+AUDIO_BITRATES = [128000]
+
+
+def build_mpd_text(num_segments, duration):
+    def representations(first_id, bitrates, mime):
+        return "\n".join(REPRESENTATION_TEMPLATE.format(id=first_id + i, mime=mime, bandwidth=bitrate,
+                                                        duration_ms=int(duration * 1000), num_segments=num_segments)
+                         for i, bitrate in enumerate(bitrates))
+
+    return MPD_TEMPLATE.format(total=num_segments * duration, duration=duration,
+                               video=representations(0, VIDEO_BITRATES, "video/mp4"),
+                               audio=representations(len(VIDEO_BITRATES), AUDIO_BITRATES, "audio/mp4"))
+
+
+def fiber(rng):
+    # A stable link with a little jitter
+    bandwidth = rng.uniform(10e6, 20e6)
+    return [(1, bandwidth * rng.uniform(0.95, 1.05)) for _ in range(600)]
+
+
+def cable(rng):
+    # A shared link whose bandwidth changes every few seconds
+    return [(rng.uniform(3, 10), rng.uniform(2e6, 8e6)) for _ in range(100)]
+
+
+def mobile(rng):
+    # A link which varies a lot and sometimes nearly drops
+    return [(rng.uniform(1, 4), rng.uniform(0.2e6, 1e6) if rng.random() < 0.15 else rng.uniform(1e6, 6e6))
+            for _ in range(300)]
+
+
+PROFILES = collections.OrderedDict([("fiber", fiber), ("cable", cable), ("mobile", mobile)])
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--traces", type=int, default=5, help="Number of traces per network profile")
+    arg_parser.add_argument("--segments", type=int, default=150, help="Number of segments of the video")
+    arg_parser.add_argument("--duration", type=float, default=2, help="Segment duration in seconds")
+    arg_parser.add_argument("--abr", type=str, action='append', default=None, choices=list(ABR_CONTROLLERS),
+                            help="ABR algorithm to compare. Default to all of them.")
+    arg_parser.add_argument("--processes", type=int, default=None, help="Number of worker processes")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    algorithms = args.abr if args.abr is not None else list(ABR_CONTROLLERS)
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as folder:
+        mpd_path = os.path.join(folder, "manifest.mpd")
+        with open(mpd_path, 'w') as f:
+            f.write(build_mpd_text(args.segments, args.duration))
+        traces = dict()
+        for profile, generate in PROFILES.items():
+            for i in range(args.traces):
+                path = os.path.join(folder, "%s-%d.txt" % (profile, i))
+                with open(path, 'w') as f:
+                    for duration, bandwidth in generate(rng):
+                        f.write("%.3f %d\n" % (duration, bandwidth))
+                traces[path] = profile
+
+        sessions = []
+        for abr in algorithms:
+            sessions += build_sessions([mpd_path], list(traces), {}, abr)
+        output = os.path.join(folder, "results.jsonl")
+        BatchRunner(output, args.processes).run(sessions)
+        with open(output) as f:
+            results = [json.loads(line) for line in f if line.strip()]
+
+    metrics = collections.defaultdict(list)
+    for result in results:
+        if "qoe" in result:
+            metrics[(traces[result["trace"]], result["abr"])].append(result["qoe"])
+    print("%-8s %-10s %14s %10s %16s %10s" % ("network", "abr", "bitrate (Mbps)", "rebuffers", "rebuffering (s)",
+                                            "switches"))
+    for profile in PROFILES:
+        for abr in algorithms:
+            qoe = metrics[(profile, abr)]
+            if len(qoe) == 0:
+                continue
+
+            def mean(name):
+                return sum(q[name] for q in qoe) / len(qoe)
+
+            print("%-8s %-10s %14.2f %10.2f %16.2f %10.1f" % (profile, abr, mean("average_bitrate") / 1e6,
+                                                            mean("rebuffer_count"), mean("rebuffer_duration"),
+                                                            mean("switches")))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Compare the event loop implementations on the hot paths of a fleet: many concurrent segment downloads through one
+connection pool, and many tasks waking up from short sleeps
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import socket
+import time
+
+from aiohttp import web
+
+from dash_emulator.download import DownloadManagerImpl
+from dash_emulator.event_loop import ASYNCIO, UVLOOP, uvloop, run_in_event_loop
+from dash_emulator.session import SessionPool
+
+SEGMENT_SIZE = 100000
+CHUNK_SIZE = 40960
+
+
+def run_origin(sock):
+    body = b'\0' * SEGMENT_SIZE
+
+    async def handler(request):
+        return web.Response(body=body)
+
+    app = web.Application()
+    app.router.add_get('/{name:.*}', handler)
+    web.run_app(app, sock=sock, print=None, access_log=None)
+
+
+async def download(base_url, num_clients, num_segments):
+    session_pool = SessionPool(0, 0)
+    download_managers = [DownloadManagerImpl([], chunk_size=CHUNK_SIZE, session_pool=session_pool)
+                         for _ in range(num_clients)]
+
+    async def client(client_id, download_manager):
+        for index in range(num_segments):
+            await download_manager.download("%s/%d/%d.m4s" % (base_url, client_id, index))
+
+    await asyncio.gather(*[client(i, m) for i, m in enumerate(download_managers)])
+    for download_manager in download_managers:
+        await download_manager.close()
+
+
+async def sleep(num_tasks, num_sleeps):
+    async def task():
+        for _ in range(num_sleeps):
+            await asyncio.sleep(0.001)
+
+    await asyncio.gather(*[task() for _ in range(num_tasks)])
+
+
+def measure(main, loop):
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    run_in_event_loop(main, loop)
+    return time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--clients", type=int, default=200, help="Number of concurrent downloaders")
+    arg_parser.add_argument("--segments", type=int, default=20, help="Number of segments each downloader fetches")
+    arg_parser.add_argument("--tasks", type=int, default=2000, help="Number of sleeping tasks")
+    arg_parser.add_argument("--sleeps", type=int, default=100, help="Number of sleeps of each task")
+    args = arg_parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    loops = [ASYNCIO] + ([UVLOOP] if uvloop is not None else [])
+    if uvloop is None:
+        print("uvloop is not installed, only asyncio is measured")
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    base_url = "http://127.0.0.1:%d" % sock.getsockname()[1]
+    origin = multiprocessing.Process(target=run_origin, args=(sock,), daemon=True)
+    origin.start()
+    time.sleep(1)
+
+    num_downloads = args.clients * args.segments
+    num_wakeups = args.tasks * args.sleeps
+    print("%-8s %-9s %10s %10s %18s" % ("loop", "path", "wall (s)", "CPU (s)", "CPU per op (us)"))
+    for loop in loops:
+        wall, cpu = measure(download(base_url, args.clients, args.segments), loop)
+        print("%-8s %-9s %10.2f %10.2f %18.1f" % (loop, "download", wall, cpu, 1e6 * cpu / num_downloads))
+        wall, cpu = measure(sleep(args.tasks, args.sleeps), loop)
+        print("%-8s %-9s %10.2f %10.2f %18.1f" % (loop, "sleep", wall, cpu, 1e6 * cpu / num_wakeups))
+    origin.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Run a fleet of players against a local origin, and show where the CPU time of the fleet process goes
+
+The origin runs in another process, so the CPU time measured is the one of the players only. A fleet fits in one core
+as long as its CPU time stays below its wall time. With --processes, the fleet is sharded over worker processes and the
+CPU time of all the workers is measured instead of profiled.
+"""
+
+import argparse
+import cProfile
+import logging
+import multiprocessing
+import pstats
+import resource
+import socket
+import time
+
+from aiohttp import web
+
+from dash_emulator.event_loop import EVENT_LOOPS, resolve_event_loop, run_in_event_loop
+from dash_emulator.fleet import Fleet
+from dash_emulator.sharded_fleet import ShardedFleet
+
+MPD_TEMPLATE = """<?xml version="1.0" encoding="utf-8"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" mediaPresentationDuration="PT{total:.1f}S"
+     minBufferTime="PT{duration:.1f}S" maxSegmentDuration="PT{duration:.1f}S">
+  <Period id="0" start="PT0.0S">
+    <AdaptationSet id="0" contentType="video" frameRate="30/1" maxWidth="1280" maxHeight="720" par="16:9">
+{video}
+    </AdaptationSet>
+    <AdaptationSet id="1" contentType="audio">
+{audio}
+    </AdaptationSet>
+  </Period>
+</MPD>
+"""
+
+REPRESENTATION_TEMPLATE = """      <Representation id="{id}" mimeType="{mime}" codecs="avc1" bandwidth="{bandwidth}" width="1280"
+                      height="720">
+        <SegmentTemplate timescale="1000" initialization="init-$RepresentationID$.m4s"
+                         media="chunk-$RepresentationID$-$Number%05d$.m4s" startNumber="1">
+          <SegmentTimeline>
+            <S t="0" d="{duration_ms}" r="{num_segments}"/>
+          </SegmentTimeline>
+        </SegmentTemplate>
+      </Representation>"""
+
+VIDEO_BITRATES = [200000, 400000, 800000]
+AUDIO_BITRATES = [64000]
+
+
+def build_mpd_text(num_segments, duration):
+    def representations(first_id, bitrates, mime):
+        return "\n".join(REPRESENTATION_TEMPLATE.format(id=first_id + i, mime=mime, bandwidth=bitrate,
+                                                        duration_ms=int(duration * 1000), num_segments=num_segments)
+                         for i, bitrate in enumerate(bitrates))
+
+    return MPD_TEMPLATE.format(total=num_segments * duration, duration=duration,
+                               video=representations(0, VIDEO_BITRATES, "video/mp4"),
+                               audio=representations(len(VIDEO_BITRATES), AUDIO_BITRATES, "audio/mp4"))
+
+
+def run_origin(sock, num_segments, duration):
+    """
+    Serve the MPD and segments sized after their bitrates, from pre-allocated bodies
+    """
+    mpd_text = build_mpd_text(num_segments, duration)
+    bodies = {}
+    for representation_id, bitrate in enumerate(VIDEO_BITRATES + AUDIO_BITRATES):
+        bodies[str(representation_id)] = b'\0' * int(bitrate * duration / 8)
+
+    async def handle_mpd(request):
+        return web.Response(text=mpd_text, content_type="application/dash+xml")
+
+    async def handle_init(request):
+        return web.Response(body=b'\0' * 1000)
+
+    async def handle_segment(request):
+        return web.Response(body=bodies[request.match_info["representation"]])
+
+    app = web.Application()
+    app.router.add_get("/manifest.mpd", handle_mpd)
+    app.router.add_get("/init-{representation}.m4s", handle_init)
+    app.router.add_get("/chunk-{representation}-{number}.m4s", handle_segment)
+    web.run_app(app, sock=sock, print=None, access_log=None)
+
+
+def run_sharded(url, args):
+    def print_report(report):
+        print("%6.1fs running %5d, finished %5d, stalled %4d, rebuffer ratio %.4f, %7.1f Mbps" % (
+            report["elapsed"], report["running"], report["finished"], report["stalled"], report["rebuffer_ratio"],
+            report["throughput"] / 1e6))
+
+    fleet = ShardedFleet(args.clients, args.processes, args.stagger, progress=print_report, event_loop=args.loop)
+    wall_start = time.perf_counter()
+    report = fleet.run(url)
+    wall = time.perf_counter() - wall_start
+    cpu = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # The origin is still running, so only the workers have been reaped
+    cpu = cpu.ru_utime + cpu.ru_stime
+    print("clients: %d finished, %d failed, %d workers crashed" % (report["finished"], report["failed"],
+                                                                   report["crashed_workers"]))
+    print("rebuffer ratio: %.4f, average throughput: %.1f Mbps" % (report["rebuffer_ratio"],
+                                                                  report["average_throughput"] / 1e6))
+    print("wall time: %.1fs, CPU time of the workers: %.1fs, CPU load: %.0f%% of one core" % (wall, cpu,
+                                                                                               100 * cpu / wall))
+    print("CPU time per client: %.2fms" % (1000 * cpu / args.clients))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--clients", type=int, default=1000)
+    arg_parser.add_argument("--segments", type=int, default=10)
+    arg_parser.add_argument("--duration", type=float, default=2, help="Segment duration in seconds")
+    arg_parser.add_argument("--stagger", type=float, default=0.002, help="Delay between two client starts")
+    arg_parser.add_argument("--top", type=int, default=25, help="Number of functions to show in the profile")
+    arg_parser.add_argument("--no-profile", action="store_true", help="Measure the CPU time without the profiler")
+    arg_parser.add_argument("--processes", type=int, default=1, help="Number of worker processes of the fleet")
+    arg_parser.add_argument("--loop", type=str, default="auto", choices=EVENT_LOOPS, help="Event loop implementation")
+    args = arg_parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    url = "http://127.0.0.1:%d/manifest.mpd" % sock.getsockname()[1]
+    origin = multiprocessing.Process(target=run_origin, args=(sock, args.segments, args.duration), daemon=True)
+    origin.start()
+    time.sleep(1)
+
+    if args.processes > 1:
+        run_sharded(url, args)
+        origin.terminate()
+        return
+
+    fleet = Fleet(args.clients, args.stagger)
+    profiler = cProfile.Profile() if not args.no_profile else None
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    if profiler is not None:
+        profiler.enable()
+    sink = run_in_event_loop(fleet.run(url), args.loop)
+    if profiler is not None:
+        profiler.disable()
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    origin.terminate()
+
+    summary = sink.summary()
+    num_segments = args.clients * args.segments
+    print("event loop: %s" % resolve_event_loop(args.loop))
+    print("clients: %d finished, %d failed" % (summary["finished"], summary["failed"]))
+    if "rebuffer_count" in summary:
+        print("rebuffers per client: mean %.2f, max %d" % (summary["rebuffer_count"]["mean"],
+                                                            summary["rebuffer_count"]["max"]))
+    print("wall time: %.1fs, CPU time: %.1fs, CPU load: %.0f%% of one core" % (wall, cpu, 100 * cpu / wall))
+    print("CPU time per client: %.2fms, per segment: %.3fms" % (1000 * cpu / args.clients, 1000 * cpu / num_segments))
+    print("max RSS: %.0fMB" % (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+    if profiler is not None:
+        print()
+        pstats.Stats(profiler).sort_stats("tottime").print_stats(args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Report the memory a parsed MPD holds per segment and per representation: segments as plain objects with a __dict__,
+as slotted Segments and as a SegmentTimeline, and whole parsed manifests with and without their raw content
+"""
+
+import gc
+import tracemalloc
+
+from dash_emulator.models import Segment, SegmentTimeline
+from dash_emulator.mpd.parser import StreamingMPDParser
+
+from mpd_parser import build_mpd, NUM_REPRESENTATIONS, SEGMENT_DURATION
+
+NUM_SEGMENTS = 10800
+MEDIA = "http://127.0.0.1/videos/chunk-0-%(number)05d.m4s"
+
+
+class DictSegment(object):
+    def __init__(self, url, duration, size=None):
+        self.url = url
+        self.duration = duration
+        self.size = size
+
+
+def retained(func, *args):
+    """
+    The bytes allocated by a function which are still held by its result
+    """
+    tracemalloc.start()
+    result = func(*args)
+    # Release the free lists of the interpreter, e.g. the tuples cached after the parsing
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def build_timeline():
+    return SegmentTimeline(MEDIA, 1000, 1, [(0, SEGMENT_DURATION * 1000, NUM_SEGMENTS)])
+
+
+def build_segments(segment_class):
+    return [segment_class(segment.url, segment.duration) for segment in build_timeline()]
+
+
+def main():
+    # Leave out the allocations made once, e.g. by the compiled regular expressions
+    StreamingMPDParser().parse(build_mpd(1), "http://127.0.0.1/videos/output.mpd")
+
+    print("%-28s %16s" % ("segments", "bytes / segment"))
+    for name, func, args in (("objects with a __dict__", build_segments, (DictSegment,)),
+                             ("slotted Segment", build_segments, (Segment,)),
+                             ("SegmentTimeline", build_timeline, ())):
+        print("%-28s %16.2f" % (name, retained(func, *args) / NUM_SEGMENTS))
+
+    print()
+    print("%6s %-28s %22s" % ("hours", "manifest", "bytes / representation"))
+    url = "http://127.0.0.1/videos/output.mpd"
+    for hours in (1, 6):
+        for name, parser in (("with the raw content", StreamingMPDParser(keep_content=True)),
+                             ("without the raw content", StreamingMPDParser())):
+            # The manifest is downloaded by the player, so it is counted unless the parser drops it
+            size = retained(lambda: parser.parse(build_mpd(hours), url))
+            print("%6d %-28s %22.0f" % (hours, name, size / NUM_REPRESENTATIONS))
+
+
+if __name__ == '__main__':
+    main()
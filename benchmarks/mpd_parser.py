@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Compare the time and the peak memory of the MPD parsers on VOD manifests of growing durations, with one S element per
+segment in the SegmentTimeline
+"""
+
+import os
+import tempfile
+import time
+import tracemalloc
+
+from dash_emulator.mpd.parser import DefaultMPDParser, StreamingMPDParser
+
+SEGMENT_DURATION = 2
+NUM_REPRESENTATIONS = 10
+MB = 1024 * 1024
+
+MPD_TEMPLATE = """<?xml version="1.0" encoding="utf-8"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" mediaPresentationDuration="PT{total}S"
+     minBufferTime="PT{duration}S" maxSegmentDuration="PT{duration}S">
+  <Period id="0" start="PT0.0S">
+    <AdaptationSet id="0" contentType="video" frameRate="30/1" maxWidth="1920" maxHeight="1080" par="16:9">
+{representations}
+    </AdaptationSet>
+  </Period>
+</MPD>
+"""
+
+REPRESENTATION_TEMPLATE = """      <Representation id="{id}" mimeType="video/mp4" codecs="avc1" bandwidth="{bandwidth}"
+                      width="1920" height="1080">
+        <SegmentTemplate timescale="1000" initialization="init-$RepresentationID$.m4s"
+                         media="chunk-$RepresentationID$-$Number%05d$.m4s" startNumber="1">
+          <SegmentTimeline>
+{timeline}
+          </SegmentTimeline>
+        </SegmentTemplate>
+      </Representation>"""
+
+
+def build_mpd(hours):
+    num_segments = hours * 3600 // SEGMENT_DURATION
+    timeline = "\n".join('            <S t="%d" d="%d"/>' % (i * SEGMENT_DURATION * 1000, SEGMENT_DURATION * 1000)
+                         for i in range(num_segments))
+    representations = "\n".join(REPRESENTATION_TEMPLATE.format(id=i, bandwidth=(i + 1) * 500000, timeline=timeline)
+                                for i in range(NUM_REPRESENTATIONS))
+    return MPD_TEMPLATE.format(total=hours * 3600, duration=SEGMENT_DURATION, representations=representations)
+
+
+def measure(func, *args, repeat=3):
+    elapsed = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = min(elapsed, time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak
+
+
+def main():
+    url = "http://127.0.0.1/videos/output.mpd"
+    print("%6s %10s %-28s %10s %14s" % ("hours", "size (MB)", "parser", "time (s)", "peak (MB)"))
+    with tempfile.TemporaryDirectory() as directory:
+        for hours in (1, 3, 6):
+            content = build_mpd(hours)
+            path = os.path.join(directory, "%d.mpd" % hours)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+            size = len(content) / MB
+            for name, func, args in (("DefaultMPDParser", DefaultMPDParser().parse, (content, url)),
+                                     ("StreamingMPDParser", StreamingMPDParser().parse, (content, url)),
+                                     ("StreamingMPDParser (file)", StreamingMPDParser().parse_file, (path, url))):
+                elapsed, peak = measure(func, *args)
+                print("%6d %10.1f %-28s %10.2f %14.1f" % (hours, size, name, elapsed, peak / MB))
+
+
+if __name__ == '__main__':
+    main()
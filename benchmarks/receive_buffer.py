@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Compare the memory allocated to receive a response body with ReceiveBuffer and with a growing bytearray
+"""
+
+import time
+import tracemalloc
+
+from dash_emulator.download import ReceiveBuffer
+
+CHUNK_SIZE = 4096
+MB = 1024 * 1024
+
+
+def receive_with_bytearray(chunks):
+    content = bytearray()
+    for chunk in chunks:
+        content.extend(chunk)
+    return bytes(content)
+
+
+def receive_with_receive_buffer(chunks, size_hint):
+    content = ReceiveBuffer(size_hint)
+    for chunk in chunks:
+        content.write(chunk)
+    return content.getbuffer()
+
+
+def measure(func, *args, repeat=5):
+    elapsed = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = min(elapsed, time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak
+
+
+def main():
+    print("%8s %-28s %12s %16s" % ("size", "method", "time (ms)", "peak / MB (MB)"))
+    for size_mb in (1, 4, 16):
+        size = size_mb * MB
+        chunk = b'\0' * CHUNK_SIZE
+        chunks = [chunk] * (size // CHUNK_SIZE)
+        for name, func, args in (("bytearray + bytes()", receive_with_bytearray, (chunks,)),
+                                 ("ReceiveBuffer (known size)", receive_with_receive_buffer, (chunks, size)),
+                                 ("ReceiveBuffer (unknown size)", receive_with_receive_buffer, (chunks, None))):
+            elapsed, peak = measure(func, *args)
+            print("%6dMB %-28s %12.2f %16.2f" % (size_mb, name, elapsed * 1000, peak / size))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,17 @@
+import math
 from abc import ABC, abstractmethod
 from typing import Dict, Optional
 
 from dash_emulator.bandwidth import BandwidthMeter
 from dash_emulator.buffer import BufferManager
-from dash_emulator.models import AdaptationSet
+from dash_emulator.models import AdaptationSet, AdaptationSets, BitrateLadder
 
 
 class ABRController(ABC):
+    # The shares of the bandwidth of the video and the audio adaptation sets, when there are both
+    VIDEO_BANDWIDTH_SHARE = 0.8
+    AUDIO_BANDWIDTH_SHARE = 0.2
+
     @abstractmethod
     def update_selection(self, adaptation_sets: Dict[int, AdaptationSet]) -> Dict[int, int]:
         """
@@ -25,8 +30,32 @@ class ABRController(ABC):
         """
         pass
 
+    def _split_bandwidth(self, adaptation_sets: Dict[int, AdaptationSet], bandwidth: float) -> Dict[int, float]:
+        """
+        Split the bandwidth between the adaptation sets. 80% goes to the video adaptation sets and 20% to the audio
+        ones if there are both, and every adaptation set of a content type gets an equal share.
+        """
+        if not isinstance(adaptation_sets, AdaptationSets):
+            # Not the adaptation sets of an MPD, which are counted when the MPD is built
+            adaptation_sets = AdaptationSets(adaptation_sets)
+        num_videos, num_audios = adaptation_sets.num_videos, adaptation_sets.num_audios
+        shares: Dict[int, float] = dict()
+        if num_videos == 0 or num_audios == 0:
+            bw_per_adaptation_set = bandwidth / (num_videos + num_audios)
+            for adaptation_set in adaptation_sets.values():
+                shares[adaptation_set.id] = bw_per_adaptation_set
+        else:
+            bw_per_video = (bandwidth * self.VIDEO_BANDWIDTH_SHARE) / num_videos
+            bw_per_audio = (bandwidth * self.AUDIO_BANDWIDTH_SHARE) / num_audios
+            for adaptation_set in adaptation_sets.values():
+                shares[adaptation_set.id] = bw_per_video if adaptation_set.content_type == "video" else bw_per_audio
+        return shares
+
 
 class DashABRController(ABRController):
+    # The fraction of the bandwidth estimate the selections are made from
+    BANDWIDTH_SAFETY_FACTOR = 0.7
+
     def __init__(self,
                  panic_buffer: float,
                  safe_buffer: float,
@@ -67,42 +96,18 @@ class DashABRController(ABRController):
         id: int
             The representation id
         """
-        representations = sorted(adaptation_set.representations.values(), key=lambda x: x.bandwidth, reverse=True)
-        representation = None
-        for representation in representations:
-            if representation.bandwidth < bw:
-                return representation.id
-        # If there's no representation whose bitrate is lower than the estimate, return the lowest one
-        return representation.id
+        # If there's no representation whose bitrate is lower than the estimate, the lowest one is returned
+        return adaptation_set.ladder.select(bw)
 
     def update_selection(self, adaptation_sets: Dict[int, AdaptationSet]) -> Dict[int, int]:
         # Only use 70% of measured bandwidth
-        available_bandwidth = int(self.bandwidth_meter.bandwidth * 0.7)
-
-        # Count the number of video adaptation sets and audio adaptation sets
-        num_videos = 0
-        num_audios = 0
-        for adaptation_set in adaptation_sets.values():
-            if adaptation_set.content_type == "video":
-                num_videos += 1
-            else:
-                num_audios += 1
+        available_bandwidth = int(self.bandwidth_meter.bandwidth * self.BANDWIDTH_SAFETY_FACTOR)
 
         # Calculate ideal selections
-        if num_videos == 0 or num_audios == 0:
-            bw_per_adaptation_set = available_bandwidth / (num_videos + num_audios)
-            ideal_selection: Dict[int, int] = dict()
-            for adaptation_set in adaptation_sets.values():
-                ideal_selection[adaptation_set.id] = self.choose_ideal_selection(adaptation_set, bw_per_adaptation_set)
-        else:
-            bw_per_video = (available_bandwidth * 0.8) / num_videos
-            bw_per_audio = (available_bandwidth * 0.2) / num_audios
-            ideal_selection: Dict[int, int] = dict()
-            for adaptation_set in adaptation_sets.values():
-                if adaptation_set.content_type == "video":
-                    ideal_selection[adaptation_set.id] = self.choose_ideal_selection(adaptation_set, bw_per_video)
-                else:
-                    ideal_selection[adaptation_set.id] = self.choose_ideal_selection(adaptation_set, bw_per_audio)
+        shares = self._split_bandwidth(adaptation_sets, available_bandwidth)
+        ideal_selection: Dict[int, int] = dict()
+        for adaptation_set in adaptation_sets.values():
+            ideal_selection[adaptation_set.id] = self.choose_ideal_selection(adaptation_set, shares[adaptation_set.id])
 
         buffer_level = self.buffer_manager.buffer_level
         final_selections = dict()
@@ -124,3 +129,145 @@ class DashABRController(ABRController):
             final_selections = ideal_selection
         self._last_selections = final_selections
         return final_selections
+
+
+class _BolaLadder(object):
+    def __init__(self, ladder: BitrateLadder, min_buffer: float, buffer_target: float):
+        """
+        The BOLA utilities and parameters of one bitrate ladder, computed once
+
+        Parameters
+        ----------
+        ladder: BitrateLadder
+            The bitrate ladder of an adaptation set
+        min_buffer: float
+            The buffer level under which the lowest representation is chosen, in seconds
+        buffer_target: float
+            The buffer level from which the highest representation is chosen, in seconds
+        """
+        self.ladder = ladder
+        bandwidths = ladder.bandwidths
+        # The utility of the lowest representation is 1, so that it is chosen when the buffer is nearly empty
+        self.utilities = tuple(math.log(bandwidth / bandwidths[0]) + 1 for bandwidth in bandwidths)
+        if self.utilities[-1] > 1 and buffer_target > min_buffer:
+            self.gp = (self.utilities[-1] - 1) / (buffer_target / min_buffer - 1)
+            self.vp = min_buffer / self.gp
+        else:
+            # All the representations have the same bandwidth
+            self.gp = 0.0
+            self.vp = 0.0
+        self.min_buffer_levels = tuple(self._min_buffer_level(position) for position in range(len(ladder)))
+
+    def _min_buffer_level(self, position: int) -> float:
+        """
+        The buffer level from which BOLA prefers a representation to all the lower ones
+        """
+        bandwidth = self.ladder.bandwidths[position]
+        utility = self.utilities[position]
+        level = 0.0
+        for lower in range(position):
+            lower_bandwidth = self.ladder.bandwidths[lower]
+            if lower_bandwidth < bandwidth:
+                lower_utility = self.utilities[lower]
+                level = max(level, self.vp * (self.gp + (bandwidth * lower_utility - lower_bandwidth * utility) /
+                                              (bandwidth - lower_bandwidth)))
+        return level
+
+    def choose(self, buffer_level: float) -> int:
+        """
+        Returns
+        -------
+        position: int
+            The position of the representation maximizing the BOLA score in the ladder
+        """
+        best = 0
+        best_score = None
+        for position, (utility, bandwidth) in enumerate(zip(self.utilities, self.ladder.bandwidths)):
+            score = (self.vp * (utility + self.gp) - buffer_level) / bandwidth
+            if best_score is None or score >= best_score:
+                best = position
+                best_score = score
+        return best
+
+
+class BolaABRController(ABRController):
+    def __init__(self,
+                 min_buffer: float,
+                 buffer_target: float,
+                 bandwidth_meter: BandwidthMeter,
+                 buffer_manager: BufferManager,
+                 placeholder: bool = False,
+                 oscillation_control: bool = False):
+        """
+        BOLA, a buffer-based ABR rule choosing the representation which maximizes
+            (V * (utility + gp) - buffer_level) / bitrate
+        where the utility of a representation is the log of its bitrate. V and gp are derived from the buffer levels
+        where the lowest and the highest representations start to be chosen.
+
+        Parameters
+        ----------
+        min_buffer: float
+            The buffer level under which the lowest representation is chosen, in seconds
+        buffer_target: float
+            The buffer level from which the highest representation is chosen, in seconds.
+            It should not be higher than the max buffer duration of the scheduler.
+        bandwidth_meter: BandwidthMeter
+            A bandwidth meter which could provide the latest bandwidth estimate
+        buffer_manager : BufferManager
+            A buffer manager which could provide the buffer level estimate
+        placeholder: bool
+            If it's True, the representations are chosen by throughput at startup and after stalls, and BOLA carries
+            on from there with a placeholder buffer, which makes it choose the same representation and shrinks as
+            the real buffer fills. Otherwise BOLA starts from the lowest representation.
+        oscillation_control: bool
+            If it's True (BOLA-O), BOLA doesn't switch up above the representation chosen by throughput, unless the
+            last representation is already higher.
+        """
+        self.min_buffer = min_buffer
+        self.buffer_target = buffer_target
+        self.bandwidth_meter = bandwidth_meter
+        self.buffer_manager = buffer_manager
+        self.placeholder = placeholder
+        self.oscillation_control = oscillation_control
+
+        self._ladders: Dict[int, _BolaLadder] = dict()
+        self._placeholders: Dict[int, float] = dict()
+        self._last_positions: Dict[int, int] = dict()
+        self._startup = True
+
+    def _bola_ladder(self, adaptation_set: AdaptationSet) -> _BolaLadder:
+        bola_ladder = self._ladders.get(adaptation_set.id)
+        if bola_ladder is None or bola_ladder.ladder is not adaptation_set.ladder:
+            bola_ladder = _BolaLadder(adaptation_set.ladder, self.min_buffer, self.buffer_target)
+            self._ladders[adaptation_set.id] = bola_ladder
+        return bola_ladder
+
+    def update_selection(self, adaptation_sets: Dict[int, AdaptationSet]) -> Dict[int, int]:
+        buffer_level = self.buffer_manager.buffer_level
+        if self._startup is False and buffer_level <= 0:
+            # Stalled, start over
+            self._startup = True
+            self._placeholders.clear()
+
+        # Only use 70% of measured bandwidth, like DashABRController
+        shares = self._split_bandwidth(adaptation_sets, int(self.bandwidth_meter.bandwidth * 0.7))
+        selections = dict()
+        for id_, adaptation_set in adaptation_sets.items():
+            bola_ladder = self._bola_ladder(adaptation_set)
+            throughput_position = max(adaptation_set.ladder.below(shares[id_]), 0)
+            if self.placeholder and self._startup:
+                position = throughput_position
+                self._placeholders[id_] = max(0.0, bola_ladder.min_buffer_levels[position] - buffer_level)
+            else:
+                # The placeholder buffer shrinks as the real buffer fills
+                placeholder = min(self._placeholders.get(id_, 0.0), max(0.0, self.buffer_target - buffer_level))
+                self._placeholders[id_] = placeholder
+                position = bola_ladder.choose(buffer_level + placeholder)
+                last_position = self._last_positions.get(id_)
+                if self.oscillation_control and position > throughput_position and last_position is not None and \
+                        position > last_position:
+                    position = max(throughput_position, last_position)
+            self._last_positions[id_] = position
+            selections[id_] = adaptation_set.ladder.ids[position]
+        self._startup = False
+        return selections
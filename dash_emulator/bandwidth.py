@@ -1,9 +1,10 @@
 import logging
-import time
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Optional, Dict
 
+from dash_emulator.clock import Clock, SystemClock
 from dash_emulator.download import DownloadEventListener
+from dash_emulator.ring_buffer import RingBuffer
 
 
 class BandwidthUpdateListener(ABC):
@@ -47,7 +48,7 @@ class BandwidthMeterImpl(BandwidthMeter, DownloadEventListener):
     log = logging.getLogger("BandwidthMeterImpl")
 
     def __init__(self, init_bandwidth: int, smooth_factor: float,
-                 bandwidth_update_listeners: List[BandwidthUpdateListener]):
+                 bandwidth_update_listeners: List[BandwidthUpdateListener], clock: Optional[Clock] = None):
         """
         The formula to estimate the bandwidth is
             bandwidth = last_bandwidth * smooth_factor + latest_bandwidth * (1-smooth_factor)
@@ -60,17 +61,20 @@ class BandwidthMeterImpl(BandwidthMeter, DownloadEventListener):
             The smooth factor in use.
         bandwidth_update_listeners: List[BandwidthUpdateListener]
             A list of bandwidth update listeners
+        clock: Clock, optional
+            The clock to time the transmissions with. The system clock is used if it's None.
         """
         self._bw = init_bandwidth
         self.smooth_factor = smooth_factor
         self.listeners = bandwidth_update_listeners
+        self.clock = clock if clock is not None else SystemClock()
 
         self.bytes_transferred = 0
         self.transmission_start_time = None
         self.transmission_end_time = None
 
     async def on_transfer_start(self, url) -> None:
-        self.transmission_start_time = time.time()
+        self.transmission_start_time = self.clock.time()
         self.bytes_transferred = 0
         self.log.info("Transmission starts. URL: " + url)
 
@@ -78,7 +82,7 @@ class BandwidthMeterImpl(BandwidthMeter, DownloadEventListener):
         self.bytes_transferred += length
 
     async def on_transfer_end(self, size: int, url: str) -> None:
-        self.transmission_end_time = time.time()
+        self.transmission_end_time = self.clock.time()
         self.update_bandwidth()
         self.bytes_transferred = 0
 
@@ -100,3 +104,365 @@ class BandwidthMeterImpl(BandwidthMeter, DownloadEventListener):
     def add_listener(self, listener: BandwidthUpdateListener):
         if listener not in self.listeners:
             self.listeners.append(listener)
+
+
+class SampledBandwidthMeter(BandwidthMeter, DownloadEventListener, ABC):
+    def __init__(self, init_bandwidth: int, capacity: int, bandwidth_update_listeners: List[BandwidthUpdateListener],
+                 clock: Optional[Clock] = None):
+        """
+        The base of the bandwidth meters estimating the bandwidth from the last samples of transfer durations and
+        sizes, kept in fixed-size ring buffers
+
+        Parameters
+        ----------
+        init_bandwidth: int
+            The bandwidth estimate before any sample, in bps
+        capacity: int
+            The max number of samples kept
+        bandwidth_update_listeners: List[BandwidthUpdateListener]
+            A list of bandwidth update listeners, notified at the end of every transfer
+        clock: Clock, optional
+            The clock to time the transmissions with. The system clock is used if it's None.
+        """
+        self._bw = init_bandwidth
+        self.listeners = bandwidth_update_listeners
+        self.clock = clock if clock is not None else SystemClock()
+
+        self.durations = RingBuffer(capacity)
+        """
+        The durations of the samples in seconds, from the oldest one
+        """
+
+        self.sizes = RingBuffer(capacity)
+        """
+        The sizes of the samples in bytes, from the oldest one
+        """
+
+        # The start time of every ongoing transfer, keyed by the URL
+        self._transfer_starts: Dict[str, float] = dict()
+
+    def add_sample(self, duration: float, size: float) -> None:
+        """
+        Add a sample, evicting the oldest one if the ring buffers are full
+
+        Parameters
+        ----------
+        duration: float
+            The duration of the sample in seconds
+        size: float
+            The bytes transferred during the sample
+        """
+        evicted_duration = self.durations.append(duration)
+        evicted_size = self.sizes.append(size)
+        self.on_sample(duration, size, evicted_duration, evicted_size)
+
+    @abstractmethod
+    def on_sample(self, duration: float, size: float, evicted_duration: Optional[float],
+                  evicted_size: Optional[float]) -> None:
+        """
+        Update the estimate with a new sample
+
+        Parameters
+        ----------
+        duration: float
+            The duration of the new sample in seconds
+        size: float
+            The bytes transferred during the new sample
+        evicted_duration: float, optional
+            The duration of the sample evicted by the new one, None if no sample is evicted
+        evicted_size: float, optional
+            The size of the sample evicted by the new one, None if no sample is evicted
+        """
+        pass
+
+    async def on_transfer_start(self, url) -> None:
+        self._transfer_starts[url] = self.clock.time()
+
+    async def on_bytes_transferred(self, length: int, url: str, position: int, size: int) -> None:
+        pass
+
+    async def on_transfer_end(self, size: int, url: str) -> None:
+        start = self._transfer_starts.pop(url, None)
+        if start is not None:
+            self.on_transfer_complete(self.clock.time() - start, size, url)
+        for listener in self.listeners:
+            await listener.on_bandwidth_update(self.bandwidth)
+
+    async def on_transfer_canceled(self, url: str, position: int, size: int) -> None:
+        return await self.on_transfer_end(position, url)
+
+    def on_transfer_complete(self, duration: float, size: int, url: str) -> None:
+        """
+        Sample a whole transfer, unless it took no time
+
+        Parameters
+        ----------
+        duration: float
+            The duration of the transfer in seconds
+        size: int
+            The bytes transferred
+        url: str
+            The URL of the transfer
+        """
+        if duration > 0 and size > 0:
+            self.add_sample(duration, size)
+
+    @property
+    def bandwidth(self) -> int:
+        return self._bw
+
+    def add_listener(self, listener: BandwidthUpdateListener):
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+
+class HarmonicMeanBandwidthMeter(SampledBandwidthMeter):
+    log = logging.getLogger("HarmonicMeanBandwidthMeter")
+
+    def __init__(self, init_bandwidth: int, window: int, bandwidth_update_listeners: List[BandwidthUpdateListener],
+                 clock: Optional[Clock] = None):
+        """
+        The bandwidth estimate is the harmonic mean of the throughputs of the last transfers, which a few fast
+        transfers can't pull up as much as a plain mean
+
+        Parameters
+        ----------
+        init_bandwidth: int
+            The bandwidth estimate before any transfer, in bps
+        window: int
+            The number of transfers in the mean
+        bandwidth_update_listeners: List[BandwidthUpdateListener]
+            A list of bandwidth update listeners
+        clock: Clock, optional
+            The clock to time the transmissions with. The system clock is used if it's None.
+        """
+        super().__init__(init_bandwidth, window, bandwidth_update_listeners, clock)
+        # The sum of the inverse throughputs in the window, and the number of samples added since it was summed up
+        self._inverse_sum = 0.0
+        self._num_updates = 0
+
+    def on_sample(self, duration: float, size: float, evicted_duration: Optional[float],
+                  evicted_size: Optional[float]) -> None:
+        self._num_updates += 1
+        if self._num_updates >= self.durations.capacity:
+            # Sum up again once per turn of the ring buffers, so that rounding errors don't pile up
+            self._num_updates = 0
+            self._inverse_sum = 0.0
+            for i in range(len(self.durations)):
+                self._inverse_sum += self.durations[i] / (8 * self.sizes[i])
+        else:
+            self._inverse_sum += duration / (8 * size)
+            if evicted_duration is not None:
+                self._inverse_sum -= evicted_duration / (8 * evicted_size)
+        self._bw = len(self.durations) / self._inverse_sum
+
+
+class DualEwmaBandwidthMeter(SampledBandwidthMeter):
+    log = logging.getLogger("DualEwmaBandwidthMeter")
+
+    def __init__(self, init_bandwidth: int, fast_half_life: float, slow_half_life: float, capacity: int,
+                 bandwidth_update_listeners: List[BandwidthUpdateListener], clock: Optional[Clock] = None):
+        """
+        Two exponentially weighted moving averages of the throughputs of the transfers, weighted by their durations,
+        with a fast and a slow half life. The estimate is the lower of them, so that it drops quickly when the
+        throughput drops and rises slowly when it rises.
+
+        Parameters
+        ----------
+        init_bandwidth: int
+            The bandwidth estimate before any transfer, in bps
+        fast_half_life: float
+            The half life of the fast average, in seconds of transfer
+        slow_half_life: float
+            The half life of the slow average, in seconds of transfer
+        capacity: int
+            The max number of samples kept
+        bandwidth_update_listeners: List[BandwidthUpdateListener]
+            A list of bandwidth update listeners
+        clock: Clock, optional
+            The clock to time the transmissions with. The system clock is used if it's None.
+        """
+        super().__init__(init_bandwidth, capacity, bandwidth_update_listeners, clock)
+        self._fast_alpha = 0.5 ** (1 / fast_half_life)
+        self._slow_alpha = 0.5 ** (1 / slow_half_life)
+        self._fast = 0.0
+        self._slow = 0.0
+        self._total_weight = 0.0
+
+    def on_sample(self, duration: float, size: float, evicted_duration: Optional[float],
+                  evicted_size: Optional[float]) -> None:
+        throughput = 8 * size / duration
+        fast_alpha = self._fast_alpha ** duration
+        slow_alpha = self._slow_alpha ** duration
+        self._fast = fast_alpha * self._fast + (1 - fast_alpha) * throughput
+        self._slow = slow_alpha * self._slow + (1 - slow_alpha) * throughput
+        self._total_weight += duration
+        # Both averages start from 0, correct their bias towards it
+        fast = self._fast / (1 - self._fast_alpha ** self._total_weight)
+        slow = self._slow / (1 - self._slow_alpha ** self._total_weight)
+        self._bw = min(fast, slow)
+
+
+class SampleBandwidthMeter(SampledBandwidthMeter):
+    log = logging.getLogger("SampleBandwidthMeter")
+
+    def __init__(self, init_bandwidth: int, window: int, bandwidth_update_listeners: List[BandwidthUpdateListener],
+                 percentile: Optional[float] = None, clock: Optional[Clock] = None):
+        """
+        The bandwidth is estimated from the progress of the transfers: every on_bytes_transferred is timed against
+        the previous one of the same transfer, so that short transfers and the ends of long ones count as much as
+        their bytes.
+
+        Parameters
+        ----------
+        init_bandwidth: int
+            The bandwidth estimate before any sample, in bps
+        window: int
+            The number of progress samples kept
+        bandwidth_update_listeners: List[BandwidthUpdateListener]
+            A list of bandwidth update listeners, notified at the end of every transfer
+        percentile: float, optional
+            If it's given, the estimate is this percentile (0 to 100) of the throughputs of the samples. Otherwise, it's
+            the bytes of the samples over their durations.
+        clock: Clock, optional
+            The clock to time the transmissions with. The system clock is used if it's None.
+        """
+        super().__init__(init_bandwidth, window, bandwidth_update_listeners, clock)
+        self.percentile = percentile
+        self._total_duration = 0.0
+        self._total_size = 0.0
+        # The time of the last progress of every ongoing transfer and the bytes received at that time, keyed by the URL
+        self._last_progress: Dict[str, float] = dict()
+        self._pending_bytes: Dict[str, int] = dict()
+        self._updated = False
+
+    def on_sample(self, duration: float, size: float, evicted_duration: Optional[float],
+                  evicted_size: Optional[float]) -> None:
+        self._total_duration += duration
+        self._total_size += size
+        if evicted_duration is not None:
+            self._total_duration -= evicted_duration
+            self._total_size -= evicted_size
+        self._updated = True
+
+    async def on_transfer_start(self, url) -> None:
+        self._last_progress[url] = self.clock.time()
+        self._pending_bytes[url] = 0
+
+    async def on_bytes_transferred(self, length: int, url: str, position: int, size: int) -> None:
+        last = self._last_progress.get(url)
+        if last is None:
+            return
+        now = self.clock.time()
+        pending = self._pending_bytes[url] + length
+        if now > last:
+            self.add_sample(now - last, pending)
+            self._last_progress[url] = now
+            pending = 0
+        # Bytes received at the same time as the previous ones count in the next sample
+        self._pending_bytes[url] = pending
+
+    async def on_transfer_end(self, size: int, url: str) -> None:
+        self._last_progress.pop(url, None)
+        self._pending_bytes.pop(url, None)
+        if self._updated:
+            self._updated = False
+            self._update_bandwidth()
+        for listener in self.listeners:
+            await listener.on_bandwidth_update(self.bandwidth)
+
+    def _update_bandwidth(self):
+        if self.percentile is None:
+            if self._total_duration > 0:
+                self._bw = 8 * self._total_size / self._total_duration
+            return
+        throughputs = sorted(8 * size / duration for duration, size in zip(self.durations, self.sizes))
+        if len(throughputs) > 0:
+            self._bw = throughputs[min(int(len(throughputs) * self.percentile / 100), len(throughputs) - 1)]
+
+
+class ConcurrentBandwidthMeter(SampleBandwidthMeter):
+    log = logging.getLogger("ConcurrentBandwidthMeter")
+
+    def __init__(self, init_bandwidth: int, window: int, bandwidth_update_listeners: List[BandwidthUpdateListener],
+                 percentile: Optional[float] = None, clock: Optional[Clock] = None):
+        """
+        The bandwidth is estimated from the throughput of the link while it is busy: the time during which at least
+        one transfer is running, counted once however many transfers overlap, and the bytes of all the transfers.
+        Parallel transfers share the link, so each one is slower than the link, but together they fill it.
+
+        A sample is taken at the end of every transfer, of the busy time and the bytes since the last sample.
+
+        Parameters
+        ----------
+        init_bandwidth: int
+            The bandwidth estimate before any sample, in bps
+        window: int
+            The number of samples kept
+        bandwidth_update_listeners: List[BandwidthUpdateListener]
+            A list of bandwidth update listeners, notified at the end of every transfer
+        percentile: float, optional
+            If it's given, the estimate is this percentile (0 to 100) of the throughputs of the samples. Otherwise, it's
+            the bytes of the samples over their durations.
+        clock: Clock, optional
+            The clock to time the transmissions with. The system clock is used if it's None.
+        """
+        super().__init__(init_bandwidth, window, bandwidth_update_listeners, percentile, clock)
+        # The bytes received by every running transfer, keyed by the URL
+        self._transfers: Dict[str, List[int]] = dict()
+        self._num_running = 0
+        # The time the busy time was last counted up to, the busy time and the bytes since the last sample
+        self._counted_until = 0.0
+        self._busy_time = 0.0
+        self._busy_bytes = 0
+
+    def _count_busy_time(self, now: float) -> None:
+        if self._num_running > 0:
+            self._busy_time += now - self._counted_until
+        self._counted_until = now
+
+    @staticmethod
+    def _transfer_index(received: List[int], position: int) -> int:
+        """
+        Tell apart the transfers of the same URL by the bytes they received
+
+        Returns
+        -------
+        index: int
+            The index of the transfer which received this many bytes, or else the most bytes up to it
+        """
+        index = 0
+        for i, count in enumerate(received):
+            if count <= position and (received[index] > position or count > received[index]):
+                index = i
+        return index
+
+    async def on_transfer_start(self, url) -> None:
+        self._count_busy_time(self.clock.time())
+        self._transfers.setdefault(url, []).append(0)
+        self._num_running += 1
+
+    async def on_bytes_transferred(self, length: int, url: str, position: int, size: int) -> None:
+        received = self._transfers.get(url)
+        if received is None:
+            return
+        received[self._transfer_index(received, position - length)] += length
+        self._busy_bytes += length
+
+    async def on_transfer_end(self, size: int, url: str) -> None:
+        self._count_busy_time(self.clock.time())
+        received = self._transfers.get(url)
+        if received is not None:
+            self._num_running -= 1
+            index = self._transfer_index(received, size)
+            # The bytes the progress events didn't report
+            self._busy_bytes += max(size - received.pop(index), 0)
+            if len(received) == 0:
+                del self._transfers[url]
+        if self._busy_time > 0 and self._busy_bytes > 0:
+            self.add_sample(self._busy_time, self._busy_bytes)
+            self._busy_time = 0.0
+            self._busy_bytes = 0
+            self._update_bandwidth()
+        for listener in self.listeners:
+            await listener.on_bandwidth_update(self.bandwidth)
@@ -0,0 +1,220 @@
+import asyncio
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import time
+from typing import Dict, List, Optional, Iterable, Callable, Set, Any
+
+from dash_emulator.clock import run_in_virtual_time, EventLoopClock
+from dash_emulator.config import Config
+from dash_emulator.event_loop import run_in_event_loop, resolve_event_loop
+from dash_emulator.models import MPD
+from dash_emulator.player_factory import build_simulated_dash_player
+from dash_emulator.qoe import QoECollector
+from dash_emulator.simulation import fetch_mpd, segment_sizes, SegmentSizes
+from dash_emulator.trace import BandwidthTrace, load_trace
+
+# The parsed inputs of the worker process, reused by all the sessions it runs
+_mpds: Dict[str, MPD] = dict()
+_sizes: Dict[str, SegmentSizes] = dict()
+_traces: Dict[str, BandwidthTrace] = dict()
+
+# The event loop implementation to download the MPD files with
+_event_loop: Optional[str] = None
+
+
+def session_key(mpd: str, trace: str, abr_params: Dict[str, Any], abr: str) -> str:
+    """
+    Returns
+    -------
+    key: str
+        The key identifying one session in the results
+    """
+    return json.dumps([mpd, trace, abr, abr_params], sort_keys=True)
+
+
+def build_sessions(mpds: List[str], traces: List[str], abr_grid: Dict[str, List[Any]],
+                   abr: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Build the sessions of a sweep over all the combinations of the inputs, for one ABR algorithm
+
+    Parameters
+    ----------
+    mpds: List[str]
+        The URLs or paths of the MPD files
+    traces: List[str]
+        The paths of the bandwidth traces
+    abr_grid: Dict[str, List[Any]]
+        The values of every ABR parameter to sweep, e.g. {"panic_buffer": [1, 2], "safe_buffer": [4, 6]}
+    abr: str, optional
+        The name of the ABR algorithm in player_factory.ABR_CONTROLLERS. The algorithm of the config is used if it's
+        None.
+
+    Returns
+    -------
+    sessions: List[Dict[str, Any]]
+        One dictionary per session, with the keys "key", "mpd", "trace", "abr" and "abr_params"
+    """
+    abr = abr if abr is not None else Config.abr_algorithm
+    names = sorted(abr_grid.keys())
+    grid = [dict(zip(names, values)) for values in itertools.product(*[abr_grid[name] for name in names])]
+    sessions = []
+    for mpd, trace, abr_params in itertools.product(mpds, traces, grid):
+        sessions.append({"key": session_key(mpd, trace, abr_params, abr), "mpd": mpd, "trace": trace, "abr": abr,
+                         "abr_params": abr_params})
+    return sessions
+
+
+def _init_worker(log_level: int, event_loop: Optional[str] = None) -> None:
+    global _event_loop
+    _event_loop = event_loop
+    logging.basicConfig(level=log_level)
+    logging.getLogger().setLevel(log_level)
+
+
+def run_session(session: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Simulate one session in virtual time. It runs in the worker processes.
+
+    Parameters
+    ----------
+    session: Dict[str, Any]
+        One of the sessions built by build_sessions
+
+    Returns
+    -------
+    result: Dict[str, Any]
+        The session with its QoE metrics under "qoe", or the error under "error"
+    """
+    result = dict(session)
+    try:
+        mpd_target = session["mpd"]
+        if mpd_target not in _mpds:
+            _mpds[mpd_target] = run_in_event_loop(fetch_mpd(mpd_target), _event_loop)
+            _sizes[mpd_target] = segment_sizes(_mpds[mpd_target], Config.simulation_init_segment_size)
+        if session["trace"] not in _traces:
+            _traces[session["trace"]] = load_trace(session["trace"])
+        mpd = _mpds[mpd_target]
+
+        qoe = QoECollector(mpd, EventLoopClock())
+        player = build_simulated_dash_player(mpd, _traces[session["trace"]], [qoe], session["abr_params"],
+                                             _sizes[mpd_target], session.get("abr"))
+        try:
+            run_in_virtual_time(asyncio.wait_for(player.start(mpd.url), Config.simulation_max_session_duration))
+        except asyncio.TimeoutError:
+            raise TimeoutError("The session didn't end within %ds of virtual time"
+                               % Config.simulation_max_session_duration) from None
+        result["qoe"] = qoe.result()
+    except Exception as e:
+        result["error"] = "%s: %s" % (type(e).__name__, e)
+    return result
+
+
+class BatchRunner(object):
+    log = logging.getLogger("BatchRunner")
+
+    def __init__(self,
+                 output: str,
+                 processes: Optional[int] = None,
+                 chunk_size: int = 1,
+                 worker_log_level: int = logging.WARNING,
+                 progress: Optional[Callable[[int, int], None]] = None,
+                 event_loop: Optional[str] = None):
+        """
+        Run many simulated sessions on a process pool, and append their results to a JSON Lines file as they complete.
+
+        The sessions which already have a result in the output file are skipped, so an interrupted sweep continues
+        where it stopped when it is run again. Sessions which failed are run again.
+
+        Parameters
+        ----------
+        output: str
+            The path of the JSON Lines file to append the results to
+        processes: int, optional
+            The number of worker processes. The number of CPUs is used if it's None.
+        chunk_size: int
+            The number of sessions sent to a worker at once
+        worker_log_level: int
+            The logging level of the worker processes
+        progress: Callable[[int, int], None], optional
+            Called with the number of finished sessions and the total number of sessions every time one finishes
+        event_loop: str, optional
+            The event loop implementation the workers download the MPD files with. The sessions themselves always run
+            in virtual time. The event loop of the config is used if it's None.
+        """
+        self.output = output
+        self.processes = processes if processes is not None else os.cpu_count()
+        self.chunk_size = chunk_size
+        self.worker_log_level = worker_log_level
+        self.progress = progress
+        self.event_loop = resolve_event_loop(event_loop)
+
+    def completed_keys(self) -> Set[str]:
+        """
+        Returns
+        -------
+        keys: Set[str]
+            The keys of the sessions which already have a result in the output file
+        """
+        keys = set()
+        if not os.path.exists(self.output):
+            return keys
+        with open(self.output) as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    # A torn write of an interrupted run
+                    continue
+                if "error" not in result:
+                    keys.add(result["key"])
+        return keys
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.output, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def run(self, sessions: Iterable[Dict[str, Any]]) -> int:
+        """
+        Run the sessions which are not completed yet
+
+        Parameters
+        ----------
+        sessions: Iterable[Dict[str, Any]]
+            The sessions built by build_sessions
+
+        Returns
+        -------
+        num_failed: int
+            The number of sessions which failed in this run
+        """
+        completed = self.completed_keys()
+        pending = [session for session in sessions if session["key"] not in completed]
+        total = len(pending)
+        self.log.info("%d sessions to run, %d already completed" % (total, len(completed)))
+
+        num_done = 0
+        num_failed = 0
+        start_time = time.time()
+        with open(self.output, 'a') as f, multiprocessing.Pool(self.processes, _init_worker,
+                                                               (self.worker_log_level, self.event_loop)) as pool:
+            if not self._ends_with_newline():
+                # Terminate the line torn by an interrupted run
+                f.write("\n")
+            for result in pool.imap_unordered(run_session, pending, self.chunk_size):
+                f.write(json.dumps(result) + "\n")
+                f.flush()
+                num_done += 1
+                if "error" in result:
+                    num_failed += 1
+                    self.log.warning("Session %s failed: %s" % (result["key"], result["error"]))
+                if self.progress is not None:
+                    self.progress(num_done, total)
+        self.log.info("%d sessions finished in %.1fs, %d failed" % (num_done, time.time() - start_time, num_failed))
+        return num_failed
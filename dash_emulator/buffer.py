@@ -1,4 +1,9 @@
 from abc import ABC, abstractmethod
+from collections import deque
+from typing import Optional, Dict, Deque, Tuple
+
+from dash_emulator.clock import Clock, SystemClock
+from dash_emulator.intervals import IntervalSet
 
 
 class BufferManager(ABC):
@@ -13,6 +18,29 @@ class BufferManager(ABC):
         """
         pass
 
+    @property
+    @abstractmethod
+    def buffer_bytes(self) -> int:
+        """
+        Returns
+        -------
+        buffer_bytes: int
+            The bytes of the segments in the buffer which are not completely played back yet
+        """
+        pass
+
+    @property
+    @abstractmethod
+    def time_to_eviction(self) -> Optional[float]:
+        """
+        Returns
+        -------
+        time_to_eviction: float, optional
+            The time in seconds until the first segment in the buffer is completely played back and evicted, None if
+            there isn't any segment in the buffer
+        """
+        pass
+
     @abstractmethod
     def enqueue_buffer(self, duration: float) -> None:
         """
@@ -26,7 +54,25 @@ class BufferManager(ABC):
         pass
 
     @abstractmethod
-    def update_buffer(self, position: float) -> None:
+    def enqueue_segment(self, adaptation_set_id: int, start: float, duration: float, size: int = 0) -> None:
+        """
+        Enqueue a segment of an adaptation set into the buffer manager
+
+        Parameters
+        ----------
+        adaptation_set_id: int
+            The ID of the adaptation set of the segment
+        start: float
+            The start time of the segment in the presentation, in seconds
+        duration: float
+            The duration of the segment in seconds
+        size: int
+            The size of the segment in bytes
+        """
+        pass
+
+    @abstractmethod
+    def update_buffer(self, position: float, playing: bool = False) -> None:
         """
         Update the buffer level given the position
 
@@ -34,21 +80,187 @@ class BufferManager(ABC):
         ----------
         position: float
             The position of current playback in seconds
+        playing: bool
+            If the playback is going on. If it's True, the position keeps moving forward until the next update.
         """
         pass
 
 
-class BufferManagerImpl(BufferManager):
+class _BufferedBytes(object):
     def __init__(self):
+        """
+        The bytes of the buffered segments, evicted when the position passes the end of their segment
+        """
+        self.total = 0
+        """
+        The bytes of the segments not evicted yet
+        """
+
+        # The end time and the size of every segment not evicted yet, in the order they are enqueued
+        self._segments: Deque[Tuple[float, int]] = deque()
+
+    def add(self, end: float, size: int) -> None:
+        if size > 0:
+            self._segments.append((end, size))
+            self.total += size
+
+    def evict(self, position: float) -> None:
+        segments = self._segments
+        while len(segments) > 0 and segments[0][0] <= position:
+            self.total -= segments.popleft()[1]
+
+    @property
+    def first_end(self) -> Optional[float]:
+        """
+        The end time of the first segment not evicted yet, None if there isn't any
+        """
+        return self._segments[0][0] if len(self._segments) > 0 else None
+
+
+class BufferManagerImpl(BufferManager):
+    def __init__(self, clock: Optional[Clock] = None):
+        """
+        Parameters
+        ----------
+        clock: Clock, optional
+            The clock to move the position forward with while playing. The system clock is used if it's None.
+        """
+        self.clock = clock if clock is not None else SystemClock()
+
         self._buffer_position = 0
         self._position = 0
+        self._playing = False
+        self._update_time = 0.0
+        # The end of the buffer of every adaptation set
+        self._ends: Dict[int, float] = dict()
+        self._bytes = _BufferedBytes()
 
     def enqueue_buffer(self, duration: float) -> None:
         self._buffer_position += duration
 
-    def update_buffer(self, position: float) -> None:
+    def enqueue_segment(self, adaptation_set_id: int, start: float, duration: float, size: int = 0) -> None:
+        self._ends[adaptation_set_id] = max(self._ends.get(adaptation_set_id, 0), start + duration)
+        self._buffer_position = min(self._ends.values())
+        self._bytes.add(start + duration, size)
+
+    def update_buffer(self, position: float, playing: bool = False) -> None:
         self._position = position
+        self._playing = playing
+        if playing:
+            self._update_time = self.clock.time()
 
     @property
     def buffer_level(self):
-        return self._buffer_position - self._position
+        return self._buffer_position - self._current_position()
+
+    @property
+    def buffer_bytes(self) -> int:
+        self._bytes.evict(self._current_position())
+        return self._bytes.total
+
+    @property
+    def time_to_eviction(self) -> Optional[float]:
+        position = self._current_position()
+        self._bytes.evict(position)
+        first_end = self._bytes.first_end
+        return first_end - position if first_end is not None else None
+
+    def _current_position(self) -> float:
+        if self._playing:
+            return self._position + (self.clock.time() - self._update_time)
+        return self._position
+
+
+class TimelineBufferManager(BufferManager):
+    def __init__(self, clock: Optional[Clock] = None, tolerance: float = 0.001):
+        """
+        A buffer manager keeping the buffered time ranges of every adaptation set. The buffer level is the time from
+        the position to the end of the buffered range containing it, in the adaptation set which has the least of it,
+        so that playback can't go past a gap of any adaptation set. The ranges played out are pruned as the position
+        moves forward, so only the ranges ahead are kept. The bytes of a segment are kept until the position passes
+        its end.
+
+        Parameters
+        ----------
+        clock: Clock, optional
+            The clock to move the position forward with while playing. The system clock is used if it's None.
+        tolerance: float
+            Ranges separated by a gap up to this long, in seconds, are merged, to absorb rounding errors of the segment
+            timings
+        """
+        self.clock = clock if clock is not None else SystemClock()
+        self.tolerance = tolerance
+
+        self.ranges: Dict[int, IntervalSet] = dict()
+        """
+        The buffered ranges of every adaptation set, keyed by the adaptation set ID
+        """
+
+        self._position = 0.0
+        self._playing = False
+        self._update_time = 0.0
+        # The end of the playable buffer from the position, across the adaptation sets
+        self._playable_end = 0.0
+        self._bytes = _BufferedBytes()
+
+    def enqueue_buffer(self, duration: float) -> None:
+        # Without an adaptation set, the buffer of every adaptation set is extended from its end
+        for adaptation_set_id in list(self.ranges) if len(self.ranges) > 0 else [0]:
+            ranges = self._ranges_of(adaptation_set_id)
+            start = ranges.end if ranges.end is not None else self._position
+            ranges.add(start, start + duration)
+        self._update_playable_end()
+
+    def enqueue_segment(self, adaptation_set_id: int, start: float, duration: float, size: int = 0) -> None:
+        self._ranges_of(adaptation_set_id).add(start, start + duration)
+        self._update_playable_end()
+        self._bytes.add(start + duration, size)
+
+    def update_buffer(self, position: float, playing: bool = False) -> None:
+        self._position = position
+        self._playing = playing
+        if playing:
+            self._update_time = self.clock.time()
+        for ranges in self.ranges.values():
+            ranges.remove_before(position)
+        self._update_playable_end()
+        self._bytes.evict(position)
+
+    @property
+    def buffer_level(self):
+        return self._playable_end - self._current_position()
+
+    @property
+    def buffer_bytes(self) -> int:
+        # Evict what has been played back since the last update
+        self._bytes.evict(self._current_position())
+        return self._bytes.total
+
+    @property
+    def time_to_eviction(self) -> Optional[float]:
+        position = self._current_position()
+        self._bytes.evict(position)
+        first_end = self._bytes.first_end
+        return first_end - position if first_end is not None else None
+
+    def _current_position(self) -> float:
+        if self._playing:
+            return self._position + (self.clock.time() - self._update_time)
+        return self._position
+
+    def _ranges_of(self, adaptation_set_id: int) -> IntervalSet:
+        ranges = self.ranges.get(adaptation_set_id)
+        if ranges is None:
+            ranges = IntervalSet(self.tolerance)
+            self.ranges[adaptation_set_id] = ranges
+        return ranges
+
+    def _update_playable_end(self) -> None:
+        playable_end = None
+        for ranges in self.ranges.values():
+            end = ranges.end_from(self._position)
+            if end is None:
+                end = self._position
+            if playable_end is None or end < playable_end:
+                playable_end = end
+        self._playable_end = playable_end if playable_end is not None else self._position
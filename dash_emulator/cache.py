@@ -0,0 +1,215 @@
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+
+class CacheEntry(object):
+    def __init__(self, key: str, url: str, byte_range: Optional[str], size: int):
+        self.key = key
+        """
+        The key of the entry, which is also the file name
+        """
+
+        self.url = url
+        """
+        The URL of the cached content
+        """
+
+        self.byte_range = byte_range
+        """
+        The byte range of the cached content, e.g. "0-1023". None for the whole resource.
+        """
+
+        self.size = size
+        """
+        The size of the cached content in bytes
+        """
+
+
+class SegmentCache(object):
+    log = logging.getLogger("SegmentCache")
+
+    JOURNAL_FILE_NAME = "journal.jsonl"
+
+    # Incomplete files older than this are left by interrupted runs (s)
+    STALE_PART_AGE = 3600
+
+    def __init__(self, folder: str, max_size: int, replay_throughput: Optional[float] = None):
+        """
+        A content cache on the disk with LRU eviction, which survives restarts.
+
+        The cached files are named by the hash of the URL and the byte range. Every change of the cache is appended to a
+        journal file in the folder, which is replayed when the cache is opened again and compacted when it grows too
+        long.
+
+        Parameters
+        ----------
+        folder: str
+            The folder to keep the cached files in
+        max_size: int
+            The maximum total size of the cached files in bytes.
+            The least recently used files are evicted when the size goes beyond it.
+        replay_throughput: float, optional
+            If it's not None, cache hits are delivered at this throughput in bps (bits per second), so the bandwidth
+            meters see a realistic timing. Otherwise they are delivered as fast as possible.
+        """
+        self.folder = pathlib.Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.replay_throughput = replay_throughput
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self._size = 0
+        self._journal = None
+        self._load()
+
+    @property
+    def size(self) -> int:
+        """
+        The total size of the cached files in bytes
+        """
+        return self._size
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(url: str, byte_range: Optional[str] = None) -> str:
+        """
+        Returns
+        -------
+        key: str
+            The cache key of a URL and an optional byte range
+        """
+        raw = url if byte_range is None else "%s#%s" % (url, byte_range)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def lookup(self, url: str, byte_range: Optional[str] = None) -> Optional[str]:
+        """
+        Look up the cache and mark the entry as the most recently used one
+
+        Returns
+        -------
+        path: str, optional
+            The path of the cached file. None if it's not cached.
+        """
+        key = self.key(url, byte_range)
+        entry = self._entries.get(key)
+        if entry is None or not os.path.exists(self._path(key)):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        self._append_journal({"touch": key})
+        return self._path(key)
+
+    def temp_path(self, url: str, byte_range: Optional[str] = None) -> str:
+        """
+        Returns
+        -------
+        path: str
+            A unique path to write a new file to. Pass it to commit() once the file is complete.
+        """
+        return str(self.folder / ("%s.%s.part" % (self.key(url, byte_range), uuid.uuid4().hex)))
+
+    def commit(self, url: str, temp_path: str, byte_range: Optional[str] = None) -> None:
+        """
+        Add a complete file to the cache, and evict the least recently used files if the cache is too large
+
+        Parameters
+        ----------
+        url: str
+            The URL of the content
+        temp_path: str
+            The path returned by temp_path(), where the content has been written to
+        byte_range: str, optional
+            The byte range of the content
+        """
+        key = self.key(url, byte_range)
+        size = os.path.getsize(temp_path)
+        if size > self.max_size:
+            os.remove(temp_path)
+            return
+        os.replace(temp_path, self._path(key))
+        old_entry = self._entries.pop(key, None)
+        if old_entry is not None:
+            self._size -= old_entry.size
+        self._entries[key] = CacheEntry(key, url, byte_range, size)
+        self._size += size
+        self._append_journal({"add": key, "url": url, "range": byte_range, "size": size})
+        self._evict()
+
+    def close(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def _path(self, key: str) -> str:
+        return str(self.folder / key)
+
+    def _evict(self) -> None:
+        while self._size > self.max_size and len(self._entries) > 0:
+            key, entry = self._entries.popitem(last=False)
+            self._size -= entry.size
+            if os.path.exists(self._path(key)):
+                os.remove(self._path(key))
+            self._append_journal({"remove": key})
+            self.log.debug("Evict %s" % entry.url)
+
+    def _append_journal(self, record: dict) -> None:
+        if self._journal is None:
+            self._journal = open(self.folder / self.JOURNAL_FILE_NAME, 'a', buffering=1)
+        self._journal.write(json.dumps(record) + "\n")
+
+    def _load(self) -> None:
+        journal_path = self.folder / self.JOURNAL_FILE_NAME
+        num_records = 0
+        if journal_path.exists():
+            with open(journal_path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn write at the end of the journal
+                        continue
+                    num_records += 1
+                    if "add" in record:
+                        key = record["add"]
+                        old_entry = self._entries.pop(key, None)
+                        if old_entry is not None:
+                            self._size -= old_entry.size
+                        self._entries[key] = CacheEntry(key, record["url"], record["range"], record["size"])
+                        self._size += record["size"]
+                    elif "touch" in record and record["touch"] in self._entries:
+                        self._entries.move_to_end(record["touch"])
+                    elif "remove" in record and record["remove"] in self._entries:
+                        self._size -= self._entries.pop(record["remove"]).size
+
+        # Drop the entries whose files are gone, and the files left by interrupted downloads
+        for key in [key for key in self._entries if not os.path.exists(self._path(key))]:
+            self._size -= self._entries.pop(key).size
+        for path in self.folder.glob("*.part"):
+            if time.time() - path.stat().st_mtime > self.STALE_PART_AGE:
+                path.unlink()
+
+        if num_records > 2 * len(self._entries):
+            self._compact()
+        self._evict()
+
+    def _compact(self) -> None:
+        journal_path = self.folder / self.JOURNAL_FILE_NAME
+        temp_path = self.folder / (self.JOURNAL_FILE_NAME + ".tmp")
+        with open(temp_path, 'w') as f:
+            for entry in self._entries.values():
+                f.write(json.dumps({"add": entry.key, "url": entry.url, "range": entry.byte_range,
+                                    "size": entry.size}) + "\n")
+        os.replace(temp_path, journal_path)
@@ -0,0 +1,186 @@
+import asyncio
+import selectors
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from dash_emulator.event_loop import cancel_all_tasks
+
+
+class Clock(ABC):
+    @abstractmethod
+    def time(self) -> float:
+        """
+        Returns
+        -------
+        time: float
+            The current time in seconds
+        """
+        pass
+
+    @abstractmethod
+    async def sleep(self, delay: float) -> None:
+        """
+        Sleep for some time
+
+        Parameters
+        ----------
+        delay: float
+            The time to sleep in seconds
+        """
+        pass
+
+
+class SystemClock(Clock):
+    """
+    The wall clock
+    """
+
+    def time(self) -> float:
+        return time.time()
+
+    async def sleep(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+
+
+class EventLoopClock(Clock):
+    """
+    The clock of the running event loop. It follows the virtual time when running in a VirtualTimeEventLoop.
+    """
+
+    def time(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    async def sleep(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+
+
+class ManualClock(Clock):
+    def __init__(self, start_time: float = 0.0):
+        """
+        A clock which only moves when it is told to. Sleeping on it moves it forward at once.
+
+        Parameters
+        ----------
+        start_time: float
+            The time when the clock starts, in seconds
+        """
+        self._time = start_time
+
+    def time(self) -> float:
+        return self._time
+
+    async def sleep(self, delay: float) -> None:
+        self.advance(delay)
+
+    def advance(self, delay: float) -> None:
+        """
+        Move the clock forward
+
+        Parameters
+        ----------
+        delay: float
+            The time to move forward in seconds
+        """
+        if delay > 0:
+            self._time += delay
+
+
+class _VirtualTimeSelector(selectors.BaseSelector):
+    def __init__(self, selector: selectors.BaseSelector):
+        self._selector = selector
+        self._loop: Optional['VirtualTimeEventLoop'] = None
+
+    def register(self, fileobj, events, data=None):
+        return self._selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self._selector.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self._selector.modify(fileobj, events, data)
+
+    def select(self, timeout=None):
+        events = self._selector.select(0)
+        if events or timeout == 0:
+            return events
+        if timeout is None:
+            # No timer is scheduled, only real I/O (e.g. a worker thread) could wake the loop up
+            return self._selector.select(None)
+        # Nothing to do until the next timer, jump to it
+        self._loop.advance(timeout)
+        return events
+
+    def close(self):
+        self._selector.close()
+
+    def get_key(self, fileobj):
+        return self._selector.get_key(fileobj)
+
+    def get_map(self):
+        return self._selector.get_map()
+
+
+class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+    def __init__(self, start_time: float = 0.0):
+        """
+        An event loop running in virtual time.
+
+        Whenever the loop has nothing to do but wait for a timer, the virtual time jumps to that timer instead of
+        sleeping. asyncio.sleep and the timers therefore cost no wall time, and a session runs as fast as the CPU
+        allows. Real I/O still works, but it takes no virtual time.
+
+        Parameters
+        ----------
+        start_time: float
+            The virtual time when the loop starts, in seconds
+        """
+        selector = _VirtualTimeSelector(selectors.DefaultSelector())
+        super().__init__(selector)
+        selector._loop = self
+        self._virtual_time = start_time
+
+    def time(self) -> float:
+        return self._virtual_time
+
+    def advance(self, delay: float) -> None:
+        """
+        Move the virtual time forward
+
+        Parameters
+        ----------
+        delay: float
+            The time to move forward in seconds
+        """
+        if delay > 0:
+            self._virtual_time += delay
+
+
+def run_in_virtual_time(main, start_time: float = 0.0):
+    """
+    Run a coroutine in a new VirtualTimeEventLoop, like asyncio.run()
+
+    Parameters
+    ----------
+    main
+        The coroutine to run
+    start_time: float
+        The virtual time when the loop starts, in seconds
+
+    Returns
+    -------
+    result
+        The result of the coroutine
+    """
+    loop = VirtualTimeEventLoop(start_time)
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(main)
+    finally:
+        try:
+            cancel_all_tasks(loop)
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.run_until_complete(loop.shutdown_default_executor())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
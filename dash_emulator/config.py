@@ -17,6 +17,29 @@ class Config(object):
     # averageSpeed = SMOOTHING_FACTOR * lastSpeed + (1-SMOOTHING_FACTOR) * averageSpeed;
     smoothing_factor = 0.5
 
+    # Bandwidth estimator: "ewma" for one EWMA over whole transfers, "harmonic-mean" for the harmonic mean of the last
+    # transfers, "dual-ewma" for the lower of a fast and a slow EWMA, "sample" for the progress of the transfers, or
+    # "concurrent" for the throughput of the link while any transfer runs, which suits concurrent downloads
+    bandwidth_estimator = "ewma"
+
+    # Number of transfers in the harmonic mean, and kept by the dual EWMA
+    bandwidth_window = 5
+
+    # Half life of the fast EWMA of the dual EWMA (s)
+    bandwidth_fast_half_life = 2
+
+    # Half life of the slow EWMA of the dual EWMA (s)
+    bandwidth_slow_half_life = 5
+
+    # Number of progress samples of the sample estimator
+    bandwidth_sample_window = 100
+
+    # Percentile of the throughputs of the samples the sample estimator takes, None for their bytes over their durations
+    bandwidth_sample_percentile = None
+
+    # Number of samples of the concurrent estimator, one at the end of every transfer
+    bandwidth_busy_window = 10
+
     # minimum frame chunk size ratio
     # The size ratio of a segment which is for I-, P-, and B-frames.
     min_frame_chunk_ratio = 0.6
@@ -28,11 +51,138 @@ class Config(object):
     vq_threshold_size_ratio = min_frame_chunk_ratio * (
             min_frame_chunk_ratio + (1 - min_frame_chunk_ratio) * vq_threshold)
 
+    # ABR algorithm: "dash" for the throughput rule with panic and safe buffers, "bola" for BOLA, "bola-o" for BOLA
+    # choosing by throughput at startup and with oscillation control, "mpc" for MPC, or "robust-mpc" for MPC discounting
+    # the bandwidth estimate by its recent errors
+    abr_algorithm = "dash"
+
+    # Buffer level under which the dash ABR algorithm doesn't switch up (s)
+    abr_panic_buffer = 2
+
+    # Buffer level over which the dash ABR algorithm doesn't switch down (s)
+    abr_safe_buffer = 4
+
+    # Buffer level under which BOLA chooses the lowest representation (s)
+    bola_min_buffer = 2
+
+    # Buffer level from which BOLA chooses the highest representation (s)
+    bola_buffer_target = 5
+
+    # Buffer level over which the scheduler waits before downloading the next segment (s)
+    max_buffer_duration = 5
+
+    # Bytes of the buffer over which the scheduler waits before downloading the next segment, None for no limit
+    max_buffer_bytes = None
+
+    # Number of segments MPC plans ahead
+    mpc_horizon = 5
+
+    # Penalty of one second of rebuffering for MPC, in Mbps of bitrate
+    mpc_rebuffer_penalty = 4.3
+
+    # Penalty of a bitrate switch for MPC, per Mbps of change
+    mpc_switch_penalty = 1
+
+    # Number of bandwidth estimation errors RobustMPC discounts the estimate with
+    mpc_error_window = 5
+
+    # Step buffer levels are quantized to in the MPC decision table (s)
+    mpc_buffer_step = 0.25
+
+    # Relative step throughputs are quantized to in the MPC decision table
+    mpc_throughput_step = 0.05
+
     # Timeout max ratio
     timeout_max_ratio = 2
 
     # Update interval
     update_interval = 0.05
 
+    # Let the player sleep until the next buffer underrun or scheduler event instead of waking up every update interval
+    event_driven_player = False
+
+    # Interval between two buffer level events of the event driven player (s), 0 for every wake-up, None to disable
+    buffer_sample_interval = 0.5
+
+    # Event loop implementation: "uvloop", "asyncio", or "auto" for uvloop when it is installed and asyncio otherwise.
+    # The simulations in virtual time always run on their own event loop.
+    event_loop = "auto"
+
     # Chunk size
     chunk_size = 40960
+
+    # Max number of concurrent downloads for one segment index
+    max_concurrent_downloads = 1
+
+    # Max number of connections in the connection pool (0 for no limit)
+    max_connections = 100
+
+    # Max number of connections to one host (0 for no limit)
+    max_connections_per_host = 6
+
+    # How long an idle connection is kept alive (s)
+    keepalive_timeout = 15
+
+    # How long a DNS record is cached (s)
+    dns_cache_ttl = 10
+
+    # Set TCP_NODELAY on the sockets
+    tcp_nodelay = True
+
+    # Max number of connections in the connection pool shared by the players of a fleet (0 for no limit)
+    fleet_max_connections = 0
+
+    # Delay between the starts of two players of a fleet (s)
+    fleet_stagger = 0.01
+
+    # Upper bounds of the bins of the live bitrate histogram of a sharded fleet (bps)
+    fleet_bitrate_bins = [500000, 1000000, 2000000, 4000000, 8000000]
+
+    # Interval between two live reports of a sharded fleet (s)
+    fleet_report_interval = 1
+
+    # Min interval between two progress events of one download (s), 0 to deliver every chunk
+    progress_interval = 0
+
+    # Min bytes in one progress event of one download, 0 to disable
+    progress_bytes = 0
+
+    # How many bytes are written to the disk at once when saving segments
+    write_block_size = 1 << 20
+
+    # Max total size of the segment cache (bytes)
+    cache_max_size = 10 << 30
+
+    # Throughput to replay cached segments at (bps), None to replay as fast as possible
+    cache_replay_throughput = None
+
+    # Give every segment download a deadline of timeout_max_ratio times the segment duration, and retry the failed ones
+    retry_downloads = False
+
+    # Abandon a segment download which would drain the buffer, and download a lower representation instead
+    abandon_slow_downloads = False
+
+    # Max number of retries of a failed segment download
+    max_retries = 3
+
+    # Delay before the first retry (s), doubled at every retry
+    retry_backoff_base = 0.5
+
+    # Max delay before a retry (s)
+    retry_backoff_max = 8
+
+    # Min time a segment download runs before it could be abandoned (s)
+    abandonment_min_elapsed = 0.5
+
+    # Time before the first byte of each simulated transfer (s)
+    simulation_latency = 0
+
+    # Max interval between two progress events of one simulated transfer (s), 0 to deliver them only when the
+    # bandwidth of the trace changes
+    simulation_progress_interval = 0.5
+
+    # Size of the initialization segments in simulations (bytes)
+    simulation_init_segment_size = 1000
+
+    # Max virtual time of one session of a batch sweep (s), after which it fails
+    simulation_max_session_duration = 24 * 3600
@@ -1,9 +1,20 @@
+import asyncio
 import logging
+import os
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from typing import List, Optional, Set, AsyncIterator
 
 import aiohttp
 
+from dash_emulator.cache import SegmentCache
+from dash_emulator.clock import Clock, SystemClock
+from dash_emulator.session import SessionPool
+from dash_emulator.storage import FileWriter
+
+
+class DownloadError(Exception):
+    pass
+
 
 class DownloadEventListener(ABC):
     @abstractmethod
@@ -58,19 +69,231 @@ class DownloadEventListener(ABC):
         pass
 
 
+class DownloadHandle(object):
+    def __init__(self, url: str, save: bool = False, path: Optional[str] = None):
+        """
+        A handle to one running download request
+
+        Parameters
+        ----------
+        url: str
+            The URL of the request
+        save: bool
+            If the received bytes should be kept and returned
+        path: str, optional
+            The path of the file to write the received bytes to
+        """
+        self.url = url
+        """
+        The URL of the request
+        """
+
+        self.save = save
+        """
+        If the received bytes are kept and returned
+        """
+
+        self.path = path
+        """
+        The path of the file to write the received bytes to
+        """
+
+        self.position = 0
+        """
+        The number of bytes received so far
+        """
+
+        self.size: Optional[int] = None
+        """
+        The size of the content in bytes. None if it is unknown yet.
+        """
+
+        self.canceled = False
+        """
+        If the request got canceled before completion
+        """
+
+        self._stop_requested = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def stop_requested(self) -> bool:
+        return self._stop_requested
+
+    @property
+    def done(self) -> bool:
+        """
+        If the request has finished, whether it completes or gets canceled
+        """
+        return self._task is not None and self._task.done()
+
+    def cancel(self) -> None:
+        """
+        Ask the download manager to stop this request.
+        The request stops at the next chunk boundary and listeners get notified by on_transfer_canceled.
+        """
+        self._stop_requested = True
+
+    def abort(self) -> None:
+        """
+        Stop this request at once, even if it is waiting for bytes which never come.
+        The running task is canceled and listeners get notified by on_transfer_canceled.
+        """
+        self._stop_requested = True
+        if self._task is not None:
+            self._task.cancel()
+
+    def attach(self, task: asyncio.Task) -> None:
+        """
+        Attach the task running this request. It's called by the download manager.
+        """
+        self._task = task
+
+    async def wait(self) -> Optional[memoryview]:
+        """
+        Wait until the request finishes
+
+        Returns
+        -------
+        content: memoryview, optional
+            None if save is False or the request gets canceled, a view of the content bytes otherwise.
+        """
+        return await self._task
+
+    def __await__(self):
+        return self.wait().__await__()
+
+    def __repr__(self):
+        return "DownloadHandle(url=%s, position=%d, size=%s)" % (self.url, self.position, self.size)
+
+
+class ProgressCoalescer(object):
+    def __init__(self, listeners: List[DownloadEventListener], interval: float = 0, min_bytes: int = 0,
+                 clock: Optional[Clock] = None):
+        """
+        Batch the progress of one transfer before calling on_bytes_transferred on the listeners.
+
+        The accumulated length is delivered when at least `interval` seconds passed since the last delivery, or when at
+        least `min_bytes` bytes are pending. If both are 0, every chunk is delivered on its own.
+
+        Parameters
+        ----------
+        listeners: List[DownloadEventListener]
+            The listeners to deliver the progress to
+        interval: float
+            The minimum interval between two deliveries in seconds. 0 to disable.
+        min_bytes: int
+            The minimum number of bytes in one delivery. 0 to disable.
+        clock: Clock, optional
+            The clock to measure the interval with. The system clock is used if it's None.
+        """
+        self.listeners = listeners
+        self.interval = interval
+        self.min_bytes = min_bytes
+        self.clock = clock if clock is not None else SystemClock()
+
+        self._pending = 0
+        self._last_delivery = self.clock.time()
+
+    async def on_bytes_transferred(self, length: int, url: str, position: int, size: int) -> None:
+        self._pending += length
+        if self.interval <= 0 and self.min_bytes <= 0:
+            await self.flush(url, position, size)
+        elif 0 < self.min_bytes <= self._pending:
+            await self.flush(url, position, size)
+        elif self.interval > 0 and self.clock.time() - self._last_delivery >= self.interval:
+            await self.flush(url, position, size)
+
+    async def flush(self, url: str, position: int, size: int) -> None:
+        """
+        Deliver the pending bytes if there are any. Call it before the end or cancel events.
+        """
+        if self._pending == 0:
+            return
+        length = self._pending
+        self._pending = 0
+        self._last_delivery = self.clock.time()
+        for listener in self.listeners:
+            await listener.on_bytes_transferred(length, url, position, size)
+
+
+class ReceiveBuffer(object):
+    def __init__(self, size_hint: Optional[int] = None):
+        """
+        A buffer to receive the content of one response.
+
+        If the size is known in advance, the whole buffer is allocated once and the chunks are copied into it in place.
+        Otherwise, it grows chunk by chunk.
+
+        Parameters
+        ----------
+        size_hint: int, optional
+            The expected size of the content in bytes, usually the Content-Length of the response
+        """
+        self._buffer = bytearray(size_hint) if size_hint else bytearray()
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def write(self, chunk: bytes) -> None:
+        """
+        Append one chunk to the buffer
+        """
+        end = self._length + len(chunk)
+        if end <= len(self._buffer):
+            # Same-size slice assignment copies in place without reallocation
+            self._buffer[self._length:end] = chunk
+        else:
+            # The content is longer than expected or the size is unknown, grow the buffer
+            del self._buffer[self._length:]
+            self._buffer += chunk
+        self._length = end
+
+    def getbuffer(self) -> memoryview:
+        """
+        Returns
+        -------
+        content: memoryview
+            A view of the received bytes, without copying them
+        """
+        return memoryview(self._buffer)[:self._length]
+
+
 class DownloadManager(ABC):
     @property
     @abstractmethod
     def is_busy(self):
         """
-        If a download session is running, return True. Return False otherwise.
+        If at least one download session is running, return True. Return False otherwise.
+        """
+        pass
+
+    @abstractmethod
+    def start_download(self, url, save: bool = False, path: Optional[str] = None) -> DownloadHandle:
+        """
+        Start download without waiting for it to finish
+
+        Parameters
+        ----------
+        url: str
+            The URL of the source to download from
+        save: bool
+            if save is True, the handle returns the bytes received when awaited.
+        path: str, optional
+            The path of the file to write the bytes received to, if the download manager writes to the disk.
+
+        Returns
+        -------
+        handle: DownloadHandle
+            A handle which could be awaited, canceled or polled for the progress
         """
         pass
 
     @abstractmethod
-    async def download(self, url, save: bool = False) -> Optional[bytes]:
+    async def download(self, url, save: bool = False, path: Optional[str] = None) -> Optional[memoryview]:
         """
-        Start download
+        Start download and wait for it to finish
 
         Parameters
         ----------
@@ -78,11 +301,18 @@ class DownloadManager(ABC):
             The URL of the source to download from
         save: bool
             if save is True, this method return the bytes received. Return None otherwise.
+        path: str, optional
+            The path of the file to write the bytes received to, if the download manager writes to the disk.
 
         Returns
         -------
-        content: bytes, optional
-            None if save is False, the content bytes otherwise.
+        content: memoryview, optional
+            None if save is False or the request gets canceled, a view of the content bytes otherwise.
+
+        Raises
+        ------
+        DownloadError
+            If the request fails
         """
         pass
 
@@ -97,7 +327,7 @@ class DownloadManager(ABC):
     @abstractmethod
     async def stop(self, url: str):
         """
-        Stop one request
+        Stop all the running requests to one URL
 
         url:
             The full request URL to stop
@@ -123,7 +353,13 @@ class DownloadManagerImpl(DownloadManager):
     def __init__(self,
                  event_listeners: List[DownloadEventListener],
                  write_to_disk=False,
-                 chunk_size=4096
+                 chunk_size=4096,
+                 session_pool: Optional[SessionPool] = None,
+                 progress_interval: float = 0,
+                 progress_bytes: int = 0,
+                 write_block_size: int = 1 << 20,
+                 cache: Optional[SegmentCache] = None,
+                 clock: Optional[Clock] = None
                  ):
         """
         Parameters
@@ -132,64 +368,216 @@ class DownloadManagerImpl(DownloadManager):
             Listeners to events of some bytes downloaded
             
         write_to_disk: bool
-            Should we write the downloaded bytes to the disk
+            Should we write the downloaded bytes to the disk.
+            If it's True, the bytes of the requests with a path are streamed to that file.
 
         chunk_size: int
             How any bytes should be downloaded at once
+
+        session_pool: SessionPool, optional
+            The connection pool to send requests through. It could be shared with other download managers.
+            A private pool is created if it's None.
+
+        progress_interval: float
+            Deliver on_bytes_transferred at most once per interval, in seconds. 0 to disable.
+
+        progress_bytes: int
+            Deliver on_bytes_transferred once at least this many bytes are received. 0 to disable.
+            If both progress_interval and progress_bytes are 0, on_bytes_transferred is called for every chunk.
+
+        write_block_size: int
+            How many bytes are written to the disk at once
+
+        cache: SegmentCache, optional
+            If it's not None, the requests are served from the cache when possible, and the downloaded contents are
+            added to the cache.
+
+        clock: Clock, optional
+            The clock to time the progress events and the cache replay with. The system clock is used if it's None.
         """
         self.event_listeners = event_listeners
         self.write_to_disk = write_to_disk
         self.chunk_size = chunk_size
+        self.session_pool = (session_pool if session_pool is not None else SessionPool()).acquire()
+        self.progress_interval = progress_interval
+        self.progress_bytes = progress_bytes
+        self.write_block_size = write_block_size
+        self.cache = cache
+        self.clock = clock if clock is not None else SystemClock()
 
-        self._busy = False
-        self._session: Optional[aiohttp.ClientSession] = None
-        self._stop = False
+        self._closed = False
+        self._handles: Set[DownloadHandle] = set()
 
     @property
     def is_busy(self) -> bool:
-        return self._busy
+        return len(self._handles) > 0
+
+    @property
+    def num_in_flight(self) -> int:
+        """
+        The number of running requests
+        """
+        return len(self._handles)
+
+    def start_download(self, url, save=False, path=None) -> DownloadHandle:
+        handle = DownloadHandle(url, save, path)
+        self._handles.add(handle)
+        handle.attach(asyncio.create_task(self._download(handle)))
+        return handle
+
+    async def download(self, url, save=False, path=None) -> Optional[memoryview]:
+        return await self.start_download(url, save, path)
+
+    async def _download(self, handle: DownloadHandle) -> Optional[memoryview]:
+        try:
+            return await self._transfer(handle)
+        except aiohttp.ClientError as e:
+            raise DownloadError("Failed to download %s: %s" % (handle.url, e)) from e
+        except asyncio.CancelledError:
+            if not handle.stop_requested:
+                raise
+            # Aborted through the handle
+            handle.canceled = True
+            return None
+        finally:
+            self._handles.discard(handle)
+
+    async def _transfer(self, handle: DownloadHandle) -> Optional[memoryview]:
+        url = handle.url
+        if self.cache is not None:
+            cached_path = self.cache.lookup(url)
+            if cached_path is not None:
+                self.log.info("Start replaying %s from cache" % url)
+                handle.size = os.path.getsize(cached_path)
+                return await self._deliver(handle, self._read_file(cached_path, self.cache.replay_throughput))
 
-    async def download(self, url, save=False) -> Optional[bytes]:
-        self._busy = True
-        self._stop = False
         self.log.info("Start downloading %s" % url)
 
-        if self._session is None:
-            self._session = aiohttp.ClientSession()
+        if self._closed:
+            self.session_pool.acquire()
+            self._closed = False
 
-        content = bytearray()
-        async with self._session.get(url) as resp:
-            position = 0
+        async with self.session_pool.session.get(url) as resp:
+            if resp.status >= 400:
+                raise DownloadError("Failed to download %s: HTTP %d" % (url, resp.status))
+            handle.size = resp.content_length
+            cache_path = self.cache.temp_path(url) if self.cache is not None else None
+            return await self._deliver(handle, self._read_response(resp), cache_path)
+
+    async def _read_response(self, resp: aiohttp.ClientResponse) -> AsyncIterator[bytes]:
+        while True:
+            chunk = await resp.content.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    async def _read_file(self, path: str, throughput: Optional[float]) -> AsyncIterator[bytes]:
+        """
+        Read a file chunk by chunk. If the throughput (bps) is given, the chunks are paced to match it.
+        """
+        loop = asyncio.get_running_loop()
+        start_time = self.clock.time()
+        position = 0
+        with open(path, 'rb') as f:
+            while True:
+                block = await loop.run_in_executor(None, f.read, self.write_block_size)
+                if not block:
+                    return
+                if throughput is None:
+                    yield block
+                    continue
+                for offset in range(0, len(block), self.chunk_size):
+                    chunk = block[offset:offset + self.chunk_size]
+                    position += len(chunk)
+                    delay = start_time + position * 8 / throughput - self.clock.time()
+                    if delay > 0:
+                        await self.clock.sleep(delay)
+                    yield chunk
+
+    async def _deliver(self, handle: DownloadHandle, chunks: AsyncIterator[bytes],
+                       cache_path: Optional[str] = None) -> Optional[memoryview]:
+        """
+        Deliver the chunks of one request to the listeners, the receive buffer, the output file and the cache
+
+        Parameters
+        ----------
+        handle: DownloadHandle
+            The handle of the request
+        chunks: AsyncIterator[bytes]
+            The source of the content
+        cache_path: str, optional
+            The temporary path to write the content to, which is committed to the cache once the content is complete
+        """
+        url = handle.url
+        content = ReceiveBuffer(handle.size) if handle.save else None
+        writers = []
+        if self.write_to_disk and handle.path is not None:
+            writers.append(FileWriter(handle.path, self.write_block_size))
+        if cache_path is not None:
+            writers.append(FileWriter(cache_path, self.write_block_size))
+        progress = ProgressCoalescer(self.event_listeners, self.progress_interval, self.progress_bytes, self.clock)
+        for listener in self.event_listeners:
+            await listener.on_transfer_start(url)
+
+        completed = not handle.stop_requested
+        try:
+            if completed:
+                async for chunk in chunks:
+                    size = len(chunk)
+                    if content is not None:
+                        content.write(chunk)
+                    for writer in writers:
+                        await writer.write(chunk)
+                    handle.position += size
+                    await progress.on_bytes_transferred(size, url, handle.position, handle.size)
+                    if handle.stop_requested:
+                        completed = False
+                        break
+        except BaseException:
+            # The transfer failed, remove the partial files and let the listeners forget it before raising
+            await self._discard(handle, writers, progress)
+            raise
+        finally:
+            await chunks.aclose()
+
+        if completed:
+            # Download complete, call listeners
+            await progress.flush(url, handle.position, handle.size)
+            for writer in writers:
+                await writer.close()
+            if cache_path is not None:
+                self.cache.commit(url, cache_path)
             for listener in self.event_listeners:
-                await listener.on_transfer_start(url)
-            while not self._stop:
-                chunk = await resp.content.read(self.chunk_size)
-                if not chunk:
-                    # Download complete, call listeners
-                    for listener in self.event_listeners:
-                        await listener.on_transfer_end(resp.content_length, url)
-                    break
-                size = len(chunk)
-                if save:
-                    content.extend(chunk)
-                position += size
-                for listener in self.event_listeners:
-                    await listener.on_bytes_transferred(size, url, position, resp.content_length)
-            if self._stop:
-                for listener in self.event_listeners:
-                    await listener.on_transfer_canceled(url, position, size)
-        self._busy = False
-        return bytes(content) if save else None
+                await listener.on_transfer_end(handle.position, url)
+            return content.getbuffer() if content is not None else None
+
+        handle.canceled = True
+        await self._discard(handle, writers, progress)
+        return None
+
+    async def _discard(self, handle: DownloadHandle, writers: List[FileWriter], progress: ProgressCoalescer) -> None:
+        """
+        Remove the partial files of an unfinished request, and notify the listeners by on_transfer_canceled
+        """
+        for writer in writers:
+            await writer.abort()
+        await progress.flush(handle.url, handle.position, handle.size)
+        for listener in self.event_listeners:
+            await listener.on_transfer_canceled(handle.url, handle.position, handle.size)
 
     async def close(self) -> None:
         """
+        Release the connection pool. The pool gets closed if no other download managers use it.
         You can still download things after you close the session, but it is not recommended.
         """
-        if self._session is not None:
-            await self._session.close()
+        if not self._closed:
+            self._closed = True
+            await self.session_pool.release()
 
     async def stop(self, url):
-        self._stop = True
+        for handle in self._handles:
+            if handle.url == url:
+                handle.cancel()
 
     def add_listener(self, listener: DownloadEventListener):
         if listener not in self.event_listeners:
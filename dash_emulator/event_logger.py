@@ -19,3 +19,10 @@ class EventLogger(SchedulerEventListener, PlayerEventListener):
 
     async def on_segment_download_complete(self, index):
         self.log.info("Download complete. Index: %d" % index)
+
+    async def on_segment_abandoned(self, index, adaptation_set_id, representation_id, fallback_representation_id):
+        self.log.info("Download abandoned. Index: %d, Adaptation set: %d, Representation: %d, Fallback: %d" % (
+            index, adaptation_set_id, representation_id, fallback_representation_id))
+
+    async def on_end(self):
+        self.log.info("All segments downloaded")
@@ -0,0 +1,100 @@
+import asyncio
+from typing import Optional
+
+from dash_emulator.config import Config
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# The names of the event loop implementations
+AUTO = "auto"
+ASYNCIO = "asyncio"
+UVLOOP = "uvloop"
+EVENT_LOOPS = (AUTO, ASYNCIO, UVLOOP)
+
+
+def resolve_event_loop(name: Optional[str] = None) -> str:
+    """
+    Resolve the name of an event loop implementation
+
+    Parameters
+    ----------
+    name: str, optional
+        "auto", "asyncio" or "uvloop". The event loop of the config is used if it's None.
+
+    Returns
+    -------
+    name: str
+        "asyncio" or "uvloop". "auto" resolves to "uvloop" if it is installed, and to "asyncio" otherwise.
+    """
+    name = name if name is not None else Config.event_loop
+    if name not in EVENT_LOOPS:
+        raise ValueError("Unknown event loop %s, it should be one of %s" % (name, ", ".join(EVENT_LOOPS)))
+    if name == AUTO:
+        return UVLOOP if uvloop is not None else ASYNCIO
+    if name == UVLOOP and uvloop is None:
+        raise ValueError("The uvloop event loop is selected, but uvloop is not installed")
+    return name
+
+
+def new_event_loop(name: Optional[str] = None) -> asyncio.AbstractEventLoop:
+    """
+    Create an event loop of the selected implementation
+
+    Parameters
+    ----------
+    name: str, optional
+        "auto", "asyncio" or "uvloop". The event loop of the config is used if it's None.
+
+    Returns
+    -------
+    loop: asyncio.AbstractEventLoop
+        A new event loop
+    """
+    if resolve_event_loop(name) == UVLOOP:
+        return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
+
+
+def run_in_event_loop(main, name: Optional[str] = None):
+    """
+    Run a coroutine in a new event loop of the selected implementation, like asyncio.run()
+
+    Parameters
+    ----------
+    main
+        The coroutine to run
+    name: str, optional
+        "auto", "asyncio" or "uvloop". The event loop of the config is used if it's None.
+
+    Returns
+    -------
+    result
+        The result of the coroutine
+    """
+    loop = new_event_loop(name)
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(main)
+    finally:
+        try:
+            cancel_all_tasks(loop)
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.run_until_complete(loop.shutdown_default_executor())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
+def cancel_all_tasks(loop: asyncio.AbstractEventLoop) -> None:
+    """
+    Cancel the tasks left running in a loop whose main coroutine is done, and wait for them to finish
+    """
+    tasks = [task for task in asyncio.all_tasks(loop) if not task.done()]
+    if len(tasks) == 0:
+        return
+    for task in tasks:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
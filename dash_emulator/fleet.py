@@ -0,0 +1,195 @@
+import asyncio
+import json
+import logging
+import math
+import time
+from typing import Dict, List, Optional, Any, TextIO, Callable
+
+from dash_emulator.config import Config
+from dash_emulator.models import MPD
+from dash_emulator.player import PlayerEventListener
+from dash_emulator.player_factory import build_dash_player
+from dash_emulator.qoe import QoECollector
+from dash_emulator.session import SessionPool
+from dash_emulator.simulation import fetch_mpd
+
+
+class QoEAggregator(object):
+    log = logging.getLogger("QoEAggregator")
+
+    # The metrics summarized over all the clients
+    METRICS = ("startup_delay", "rebuffer_count", "rebuffer_duration", "average_bitrate", "switches",
+               "session_duration")
+
+    def __init__(self, output: Optional[TextIO] = None):
+        """
+        Collect the QoE metrics of all the clients of a fleet
+
+        Parameters
+        ----------
+        output: TextIO, optional
+            If it's not None, the result of every client is written to it as one JSON line when the client finishes
+        """
+        self.output = output
+
+        self.num_finished = 0
+        """
+        The number of clients which played till the end
+        """
+
+        self.num_failed = 0
+        """
+        The number of clients which failed
+        """
+
+        self._values: Dict[str, List[float]] = {metric: [] for metric in self.METRICS}
+
+    def add(self, client_id: int, result: Dict[str, Any]) -> None:
+        """
+        Add the QoE metrics of a finished client
+
+        Parameters
+        ----------
+        client_id: int
+            The index of the client in the fleet
+        result: Dict[str, Any]
+            The metrics of the client, as returned by QoECollector.result
+        """
+        self.num_finished += 1
+        for metric in self.METRICS:
+            if result.get(metric) is not None:
+                self._values[metric].append(result[metric])
+        self._write({"client": client_id, "qoe": result})
+
+    def add_error(self, client_id: int, error: str) -> None:
+        """
+        Add a client which failed
+
+        Parameters
+        ----------
+        client_id: int
+            The index of the client in the fleet
+        error: str
+            The description of the error
+        """
+        self.num_failed += 1
+        self.log.warning("Client %d failed: %s", client_id, error)
+        self._write({"client": client_id, "error": error})
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        if self.output is not None:
+            self.output.write(json.dumps(record) + "\n")
+
+    @staticmethod
+    def _percentile(values: List[float], percent: float) -> float:
+        index = min(len(values) - 1, max(0, math.ceil(percent / 100 * len(values)) - 1))
+        return values[index]
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Returns
+        -------
+        summary: Dict[str, Any]
+            The numbers of finished and failed clients, and the mean, median, 95th percentile and max of every metric
+        """
+        summary: Dict[str, Any] = {"finished": self.num_finished, "failed": self.num_failed}
+        for metric, values in self._values.items():
+            if len(values) == 0:
+                continue
+            values = sorted(values)
+            summary[metric] = {
+                "mean": sum(values) / len(values),
+                "p50": self._percentile(values, 50),
+                "p95": self._percentile(values, 95),
+                "max": values[-1]
+            }
+        return summary
+
+
+class Fleet(object):
+    log = logging.getLogger("Fleet")
+
+    def __init__(self,
+                 num_clients: int,
+                 stagger: float = 0,
+                 sink: Optional[QoEAggregator] = None,
+                 session_pool: Optional[SessionPool] = None,
+                 listener_factory: Optional[Callable[[int, MPD], PlayerEventListener]] = None):
+        """
+        Run many players in one event loop, e.g. to load-test an origin or a CDN edge.
+
+        The players share one connection pool and one parsed MPD object. Each player is built just before it starts,
+        so the clients which haven't started yet cost nothing.
+
+        Parameters
+        ----------
+        num_clients: int
+            The number of players
+        stagger: float
+            The delay between the starts of two consecutive players, in seconds
+        sink: QoEAggregator, optional
+            The sink of the QoE metrics of all the players. A new one is created if it's None.
+        session_pool: SessionPool, optional
+            The connection pool shared by all the players.
+            A pool with the fleet settings of the config is created if it's None.
+        listener_factory: Callable[[int, MPD], PlayerEventListener], optional
+            If it's not None, it builds one more listener for every player from the index of the player and the MPD.
+            The listener is also attached to the scheduler and the downloads if it listens to them.
+        """
+        cfg = Config
+        self.num_clients = num_clients
+        self.stagger = stagger
+        self.sink = sink if sink is not None else QoEAggregator()
+        self.session_pool = session_pool if session_pool is not None else SessionPool(
+            cfg.fleet_max_connections, 0, cfg.keepalive_timeout, cfg.dns_cache_ttl, cfg.tcp_nodelay)
+
+        self.listener_factory = listener_factory
+
+        self.num_running = 0
+        """
+        The number of players which are playing right now
+        """
+
+    async def run(self, mpd_url: str) -> QoEAggregator:
+        """
+        Start all the players and wait for all of them to end
+
+        Parameters
+        ----------
+        mpd_url: str
+            The URL of the MPD file to play. It is downloaded and parsed only once.
+
+        Returns
+        -------
+        sink: QoEAggregator
+            The sink holding the QoE metrics of all the players
+        """
+        # Hold the pool, so it isn't closed when no player happens to be running between two staggered starts
+        self.session_pool.acquire()
+        try:
+            mpd = await fetch_mpd(mpd_url, session_pool=self.session_pool)
+            start_time = time.time()
+            await asyncio.gather(*[self._run_client(client_id, mpd) for client_id in range(self.num_clients)])
+            self.log.info("%d clients finished in %.1fs, %d failed", self.sink.num_finished,
+                          time.time() - start_time, self.sink.num_failed)
+        finally:
+            await self.session_pool.release()
+        return self.sink
+
+    async def _run_client(self, client_id: int, mpd: MPD) -> None:
+        if client_id > 0 and self.stagger > 0:
+            await asyncio.sleep(client_id * self.stagger)
+        qoe = QoECollector(mpd)
+        listeners: List[PlayerEventListener] = [qoe]
+        if self.listener_factory is not None:
+            listeners.append(self.listener_factory(client_id, mpd))
+        player = build_dash_player(session_pool=self.session_pool, mpd=mpd, listeners=listeners)
+        self.num_running += 1
+        try:
+            await player.start(mpd.url)
+        except Exception as e:
+            self.sink.add_error(client_id, "%s: %s" % (type(e).__name__, e))
+        else:
+            self.sink.add(client_id, qoe.result())
+        finally:
+            self.num_running -= 1
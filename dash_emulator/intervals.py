@@ -0,0 +1,143 @@
+import random
+from typing import List, Tuple, Optional, Iterator
+
+
+class _Range(object):
+    __slots__ = ("start", "end", "next")
+
+    def __init__(self, start: float, end: float, level: int):
+        self.start = start
+        self.end = end
+        # The next range on every level of the skip list it is on
+        self.next: List[Optional[_Range]] = [None] * level
+
+
+class IntervalSet(object):
+    # The maximum number of levels of the skip list, enough for 2 ** 32 ranges
+    MAX_LEVEL = 32
+
+    def __init__(self, tolerance: float = 0.0):
+        """
+        A set of disjoint half-open ranges [start, end), kept sorted by start in a skip list. Ranges overlapping or
+        closer than the tolerance are merged.
+
+        The ranges are disjoint, so they are sorted by end as well. Adding a range, and finding the range at a
+        position, take O(log n) expected time in the number of ranges. Every range merged or removed is unlinked in
+        O(log n), once.
+
+        Parameters
+        ----------
+        tolerance: float
+            Ranges separated by a gap up to this long are merged, e.g. to absorb rounding errors of segment timings
+        """
+        self.tolerance = tolerance
+        self._head = _Range(float("-inf"), float("-inf"), self.MAX_LEVEL)
+        # The number of levels in use
+        self._level = 1
+        self._length = 0
+        # The levels of the ranges are random, but the same on every run
+        self._random = random.Random(0)
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < self.MAX_LEVEL and self._random.random() < 0.5:
+            level += 1
+        return level
+
+    def add(self, start: float, end: float) -> None:
+        """
+        Add a range, merging it with the ranges it overlaps or touches
+
+        Parameters
+        ----------
+        start: float
+            The start of the range
+        end: float
+            The end of the range, excluded
+        """
+        if end <= start:
+            return
+        # The last range on every level which ends before the start
+        previous: List[_Range] = [self._head] * self.MAX_LEVEL
+        node = self._head
+        for i in range(self._level - 1, -1, -1):
+            while node.next[i] is not None and node.next[i].end < start - self.tolerance:
+                node = node.next[i]
+            previous[i] = node
+
+        # Merge the ranges starting before the end
+        node = node.next[0]
+        while node is not None and node.start <= end + self.tolerance:
+            start = min(start, node.start)
+            end = max(end, node.end)
+            for i in range(len(node.next)):
+                previous[i].next[i] = node.next[i]
+            self._length -= 1
+            node = node.next[0]
+
+        level = self._random_level()
+        self._level = max(self._level, level)
+        new = _Range(start, end, level)
+        for i in range(level):
+            new.next[i] = previous[i].next[i]
+            previous[i].next[i] = new
+        self._length += 1
+
+    def remove_before(self, position: float) -> None:
+        """
+        Remove everything before a position, dropping the ranges which end before it
+
+        Parameters
+        ----------
+        position: float
+            The position to remove the ranges before
+        """
+        head = self._head
+        node = head.next[0]
+        while node is not None and node.end <= position:
+            # The first range follows the head on every level it is on
+            for i in range(len(node.next)):
+                head.next[i] = node.next[i]
+            self._length -= 1
+            node = node.next[0]
+        while self._level > 1 and head.next[self._level - 1] is None:
+            self._level -= 1
+        if node is not None and node.start < position:
+            node.start = position
+
+    def end_from(self, position: float) -> Optional[float]:
+        """
+        Returns
+        -------
+        end: float, optional
+            The end of the range containing the position, or starting within the tolerance after it. None if there
+            isn't any.
+        """
+        # The last range starting before the position, within the tolerance
+        node = self._head
+        for i in range(self._level - 1, -1, -1):
+            while node.next[i] is not None and node.next[i].start <= position + self.tolerance:
+                node = node.next[i]
+        if node is not self._head and node.end + self.tolerance >= position:
+            return node.end
+        return None
+
+    @property
+    def end(self) -> Optional[float]:
+        """
+        The end of the last range, None if the set is empty
+        """
+        node = self._head
+        for i in range(self._level - 1, -1, -1):
+            while node.next[i] is not None:
+                node = node.next[i]
+        return node.end if node is not self._head else None
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[Tuple[float, float]]:
+        node = self._head.next[0]
+        while node is not None:
+            yield node.start, node.end
+            node = node.next[0]
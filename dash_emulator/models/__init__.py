@@ -1,2 +1,3 @@
-from dash_emulator.models.mpd_objects import MPD, AdaptationSet, Segment, Representation
+from dash_emulator.models.mpd_objects import MPD, AdaptationSet, AdaptationSets, BitrateLadder, Segment, \
+    Representation, SegmentTimeline
 from dash_emulator.models.player_objects import State
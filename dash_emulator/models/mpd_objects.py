@@ -1,19 +1,41 @@
-from typing import List, Literal, Dict
+import bisect
+from array import array
+from types import MappingProxyType
+from typing import List, Literal, Dict, Tuple, Optional, Iterable, Iterator, Union, Sequence, Mapping, overload
 
 
-class MPD(object):
+class _Immutable(object):
+    """
+    The base of the MPD objects. They have slots instead of a __dict__, and each attribute is set once, by the
+    constructor, so that a parsed MPD can be shared read-only by many players.
+    """
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError("%s is immutable, %s can't be set" % (type(self).__name__, name))
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        raise AttributeError("%s is immutable, %s can't be deleted" % (type(self).__name__, name))
+
+
+class MPD(_Immutable):
+    __slots__ = ("content", "url", "type", "media_presentation_duration", "min_buffer_time", "max_segment_duration",
+                 "adaptation_sets")
+
     def __init__(self,
-                 content: str,
+                 content: Optional[str],
                  url: str,
                  type_: Literal["static", "dynamic"],
                  media_presentation_duration: float,
                  max_segment_duration: float,
                  min_buffer_time: float,
-                 adaptation_sets: Dict[int, 'AdaptationSet']
+                 adaptation_sets: Mapping[int, 'AdaptationSet']
                  ):
         self.content = content
         """
-        The raw content of the MPD file
+        The raw content of the MPD file, None if the parser doesn't keep it
         """
 
         self.url = url
@@ -41,13 +63,19 @@ class MPD(object):
         The maximum segment duration in seconds
         """
 
-        self.adaptation_sets: Dict[int, AdaptationSet] = adaptation_sets
+        self.adaptation_sets: AdaptationSets = AdaptationSets(adaptation_sets)
         """
-        All the adaptation sets
+        All the adaptation sets, in a read-only mapping which also counts them by content type
         """
 
+    def __reduce__(self):
+        return MPD, (self.content, self.url, self.type, self.media_presentation_duration, self.max_segment_duration,
+                     self.min_buffer_time, dict(self.adaptation_sets))
+
+
+class AdaptationSet(_Immutable):
+    __slots__ = ("id", "content_type", "frame_rate", "max_width", "max_height", "par", "representations", "ladder")
 
-class AdaptationSet(object):
     def __init__(self,
                  adaptation_set_id: int,
                  content_type: Literal["video", "audio"],
@@ -55,7 +83,7 @@ class AdaptationSet(object):
                  max_width: int,
                  max_height: int,
                  par: str,
-                 representations: Dict[int, 'Representation']
+                 representations: Mapping[int, 'Representation']
                  ):
         self.id = adaptation_set_id
         """
@@ -87,16 +115,141 @@ class AdaptationSet(object):
         The ratio of width / height
         """
 
-        self.representations: Dict[int, Representation] = representations
+        self.representations: Mapping[int, Representation] = MappingProxyType(dict(representations))
+        """
+        All the representations under the adaptation set, in a read-only mapping
+        """
+
+        self.ladder = BitrateLadder(representations)
+        """
+        The representations sorted by bandwidth
+        """
+
+    def __reduce__(self):
+        return AdaptationSet, (self.id, self.content_type, self.frame_rate, self.max_width, self.max_height, self.par,
+                               dict(self.representations))
+
+
+class AdaptationSets(_Immutable, Mapping):
+    __slots__ = ("_adaptation_sets", "num_videos", "num_audios")
+
+    def __init__(self, adaptation_sets: Mapping[int, AdaptationSet]):
+        """
+        The adaptation sets of an MPD in a read-only mapping keyed by the adaptation set ID, counted by content type
+        once, when the MPD is built
+
+        Parameters
+        ----------
+        adaptation_sets: Mapping[int, AdaptationSet]
+            The adaptation sets
+        """
+        self._adaptation_sets: Dict[int, AdaptationSet] = dict(adaptation_sets)
+
+        self.num_videos = sum(1 for adaptation_set in self._adaptation_sets.values()
+                              if adaptation_set.content_type == "video")
+        """
+        The number of video adaptation sets
+        """
+
+        self.num_audios = len(self._adaptation_sets) - self.num_videos
+        """
+        The number of the other adaptation sets, which are audio
+        """
+
+    def __getitem__(self, adaptation_set_id: int) -> AdaptationSet:
+        return self._adaptation_sets[adaptation_set_id]
+
+    def __len__(self) -> int:
+        return len(self._adaptation_sets)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._adaptation_sets)
+
+    def __reduce__(self):
+        return AdaptationSets, (self._adaptation_sets,)
+
+    def __repr__(self):
+        return "AdaptationSets(%r)" % self._adaptation_sets
+
+
+class BitrateLadder(_Immutable):
+    __slots__ = ("bandwidths", "ids", "_positions")
+
+    def __init__(self, representations: Mapping[int, 'Representation']):
+        """
+        The representations of an adaptation set in ascending order of bandwidth, to pick them by binary search.
+        Among representations of equal bandwidth, the one listed first comes last in the ladder, so it is the one
+        picked by a search for the highest bandwidth under a limit.
+
+        Parameters
+        ----------
+        representations: Mapping[int, Representation]
+            The representations of the adaptation set
+        """
+        representations = list(representations.values())
+        order = sorted(range(len(representations)), key=lambda i: (representations[i].bandwidth, -i))
+
+        self.bandwidths: Tuple[int, ...] = tuple(representations[i].bandwidth for i in order)
+        """
+        The bandwidths in ascending order
+        """
+
+        self.ids: Tuple[int, ...] = tuple(representations[i].id for i in order)
         """
-        All the representations under the adaptation set
+        The representation IDs, in the same order as the bandwidths
         """
 
+        self._positions: Dict[int, int] = {id_: position for position, id_ in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def position(self, representation_id: int) -> int:
+        """
+        Returns
+        -------
+        position: int
+            The position of a representation in the ladder, 0 for the lowest one
+        """
+        return self._positions[representation_id]
+
+    def below(self, bandwidth: float) -> int:
+        """
+        Returns
+        -------
+        position: int
+            The position of the highest representation whose bandwidth is lower than the given one,
+            or -1 if there is none
+        """
+        return bisect.bisect_left(self.bandwidths, bandwidth) - 1
+
+    def at_most(self, bandwidth: float) -> int:
+        """
+        Returns
+        -------
+        position: int
+            The position of the highest representation whose bandwidth is not higher than the given one,
+            or -1 if there is none
+        """
+        return bisect.bisect_right(self.bandwidths, bandwidth) - 1
+
+    def select(self, bandwidth: float) -> int:
+        """
+        Returns
+        -------
+        id: int
+            The ID of the highest representation whose bandwidth is lower than the given one,
+            or the ID of the lowest representation if there is none
+        """
+        return self.ids[max(self.below(bandwidth), 0)]
+
+
+class Representation(_Immutable):
+    __slots__ = ("id", "mime_type", "codecs", "bandwidth", "width", "height", "initialization", "segments")
 
-class Representation(object):
     def __init__(self, id_: int, mime_type: str,
                  codecs: str, bandwidth: int, width: int, height: int,
-                 initialization: str, segments: List['Segment']):
+                 initialization: str, segments: Sequence['Segment']):
         self.id = id_
         """
         The id of the representation
@@ -132,20 +285,182 @@ class Representation(object):
         The initialization URL
         """
 
-        self.segments: List[Segment] = segments
+        self.segments: Sequence[Segment] = tuple(segments) if isinstance(segments, list) else segments
         """
-        The video segments
+        The video segments, a tuple or a SegmentTimeline computing them on access
         """
 
 
-class Segment(object):
-    def __init__(self, url: str, duration: float):
-        self.url = url
+class Segment(_Immutable):
+    __slots__ = ("url", "duration", "size")
+
+    def __init__(self, url: str, duration: float, size: Optional[int] = None):
+        """
+        Parameters
+        ----------
+        url: str
+            The complete url of the segment
+        duration: float
+            The duration of the segment in seconds
+        size: int, optional
+            The size of the segment in bytes, None if the MPD doesn't tell it
+        """
+        # Segments are built on every access to a SegmentTimeline, so the slots are set by their descriptors, without
+        # the check of _Immutable
+        _set_segment_url(self, url)
+        _set_segment_duration(self, duration)
+        _set_segment_size(self, size)
+
+
+_set_segment_url = Segment.url.__set__
+_set_segment_duration = Segment.duration.__set__
+_set_segment_size = Segment.size.__set__
+
+
+class SegmentTimeline(_Immutable, Sequence):
+    __slots__ = ("media", "timescale", "start_number", "_first_indexes", "_start_times", "_durations", "_length")
+
+    def __init__(self, media: str, timescale: int, start_number: int,
+                 entries: Iterable[Tuple[Optional[int], int, int]]):
+        """
+        The segments of a SegmentTemplate, computed on access from a run-length timeline instead of being kept as
+        objects. A run is a number of consecutive segments of the same duration, and consecutive entries of the same
+        duration without a gap between them are merged into one run, so a timeline with one S element per segment
+        takes as little memory as one with repeats.
+
+        Parameters
+        ----------
+        media: str
+            The format string of the segment URLs, formatted with a dict of "number" and "time", as compiled by
+            compile_segment_template
+        timescale: int
+            The number of ticks per second of the times and the durations
+        start_number: int
+            The number of the first segment
+        entries: Iterable[Tuple[Optional[int], int, int]]
+            The start time in ticks (None to follow the previous entry), the duration in ticks and the number of
+            segments of every entry of the timeline
+        """
+        self.media = media
+        self.timescale = timescale
+        self.start_number = start_number
+
+        # The index of the first segment, the start time and the segment duration of every run, in ticks
+        first_indexes = array('q')
+        start_times = array('q')
+        durations = array('q')
+        length = 0
+
+        time = 0
+        for t, d, count in entries:
+            if count <= 0:
+                continue
+            if t is not None:
+                time = t
+            if len(durations) > 0 and durations[-1] == d and start_times[-1] + (length - first_indexes[-1]) * d == time:
+                # The entry continues the last run
+                pass
+            else:
+                first_indexes.append(length)
+                start_times.append(time)
+                durations.append(d)
+            length += count
+            time += count * d
+
+        self._first_indexes = first_indexes
+        self._start_times = start_times
+        self._durations = durations
+        self._length = length
+
+    def __len__(self) -> int:
+        return self._length
+
+    @overload
+    def __getitem__(self, index: int) -> 'Segment':
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List['Segment']:
+        ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union['Segment', List['Segment']]:
         """
-        The complete url of the segment
+        The segment at an index, or a list of the segments in a slice. Negative indexes count from the last segment.
         """
+        if isinstance(index, slice):
+            return [self._segment(i) for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("Segment index out of range")
+        return self._segment(index)
+
+    def __iter__(self) -> Iterator['Segment']:
+        media = self.media
+        timescale = self.timescale
+        number = self.start_number
+        for run in range(len(self._first_indexes)):
+            count = self._run_end(run) - self._first_indexes[run]
+            time = self._start_times[run]
+            d = self._durations[run]
+            duration = d / timescale
+            for _ in range(count):
+                yield Segment(media % {"number": number, "time": time}, duration)
+                number += 1
+                time += d
+
+    def index_at(self, time: float) -> int:
+        """
+        Find the segment playing at a time by bisection
+
+        Parameters
+        ----------
+        time: float
+            The time in seconds, on the timeline of the segments
 
-        self.duration = duration
+        Returns
+        -------
+        index: int
+            The index of the segment containing the time, or of the first segment after it if the time is in a gap
+            of the timeline
+
+        Raises
+        ------
+        IndexError
+            If the time is before the first segment or after the last one
+        """
+        ticks = time * self.timescale
+        run = bisect.bisect_right(self._start_times, ticks) - 1
+        if run < 0:
+            raise IndexError("Time %f is before the first segment" % time)
+        index = self._first_indexes[run] + int((ticks - self._start_times[run]) // self._durations[run])
+        end = self._run_end(run)
+        if index < end:
+            return index
+        if end < self._length:
+            return end
+        raise IndexError("Time %f is after the last segment" % time)
+
+    def start_time(self, index: int) -> float:
         """
-        The duration of the segment in seconds
+        The start time of the segment at an index in seconds, on the timeline of the segments
         """
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("Segment index out of range")
+        run = bisect.bisect_right(self._first_indexes, index) - 1
+        return (self._start_times[run] + (index - self._first_indexes[run]) * self._durations[run]) / self.timescale
+
+    def _run_end(self, run: int) -> int:
+        return self._first_indexes[run + 1] if run + 1 < len(self._first_indexes) else self._length
+
+    def _segment(self, index: int) -> 'Segment':
+        run = bisect.bisect_right(self._first_indexes, index) - 1
+        d = self._durations[run]
+        time = self._start_times[run] + (index - self._first_indexes[run]) * d
+        return Segment(self.media % {"number": self.start_number + index, "time": time}, d / self.timescale)
+
+    def __repr__(self):
+        return "SegmentTimeline(media=%s, segments=%d, runs=%d)" % (self.media, self._length,
+                                                                    len(self._first_indexes))
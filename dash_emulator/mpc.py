@@ -0,0 +1,295 @@
+import logging
+import math
+from collections import deque, OrderedDict
+from typing import Dict, Optional, Tuple, Deque
+
+from dash_emulator.abr import ABRController
+from dash_emulator.bandwidth import BandwidthMeter
+from dash_emulator.buffer import BufferManager
+from dash_emulator.clock import Clock, SystemClock
+from dash_emulator.models import AdaptationSet, SegmentTimeline
+from dash_emulator.scheduler import SchedulerEventListener
+
+# The segments to plan for: the duration of each one, and its size in bytes in each representation of the ladder, or
+# None if the sizes follow the bitrates
+Plan = Tuple[Tuple[float, Optional[Tuple[int, ...]]], ...]
+
+
+class _MpcPlanner(object):
+    # The max number of decisions, and of value tables, kept in the memo tables. The least recently used ones are
+    # dropped first.
+    MEMO_SIZE = 4096
+
+    def __init__(self, adaptation_set: AdaptationSet, rebuffer_penalty: float, switch_penalty: float,
+                 max_buffer: float, buffer_step: float, throughput_step: float):
+        """
+        Plans the representations of the next segments of one adaptation set with a dynamic program over quantized
+        buffer levels, and memoizes both the values of the program and the decisions, in LRU tables of MEMO_SIZE
+        entries
+
+        Parameters
+        ----------
+        adaptation_set: AdaptationSet
+            The adaptation set
+        rebuffer_penalty: float
+            The penalty of one second of rebuffering, in Mbps of bitrate
+        switch_penalty: float
+            The penalty of a bitrate switch, per Mbps of change
+        max_buffer: float
+            The buffer level over which the scheduler waits before downloading a segment, in seconds
+        buffer_step: float
+            The step buffer levels are quantized to, in seconds
+        throughput_step: float
+            The relative step throughputs are quantized to
+        """
+        self.ladder = ladder = adaptation_set.ladder
+        self.representations = [adaptation_set.representations[id_] for id_ in ladder.ids]
+        # If the MPD tells the size of any segment. The segments computed from a SegmentTemplate have no size.
+        self.sized = any(segment.size is not None for representation in self.representations
+                         if not isinstance(representation.segments, SegmentTimeline)
+                         for segment in representation.segments)
+        self.qualities = tuple(bandwidth / 1000000 for bandwidth in ladder.bandwidths)
+        self.rebuffer_penalty = rebuffer_penalty
+        self.switch_penalty = switch_penalty
+        self.max_buffer = max_buffer
+        self.buffer_step = buffer_step
+        self._log_throughput_step = math.log1p(throughput_step)
+
+        self._decisions: 'OrderedDict[Tuple[int, int, int, Plan], int]' = OrderedDict()
+        self._values: 'OrderedDict[Tuple[int, Plan], Dict[Tuple[int, int, int], float]]' = OrderedDict()
+
+    def plan(self, index: int, horizon: int) -> Plan:
+        """
+        The durations and sizes of the segments from index on, up to horizon of them
+        """
+        if not self.sized:
+            segments = self.representations[0].segments[index:index + horizon]
+            return tuple((segment.duration, None) for segment in segments)
+        plan = []
+        for i in range(index, index + horizon):
+            if any(i >= len(representation.segments) for representation in self.representations):
+                break
+            segments = [representation.segments[i] for representation in self.representations]
+            if all(segment.size is None for segment in segments):
+                sizes = None
+            else:
+                sizes = tuple(segment.size if segment.size is not None else int(bandwidth * segment.duration / 8)
+                              for segment, bandwidth in zip(segments, self.ladder.bandwidths))
+            plan.append((segments[0].duration, sizes))
+        return tuple(plan)
+
+    def decide(self, buffer_level: float, throughput: float, last_position: Optional[int], plan: Plan) -> int:
+        """
+        Parameters
+        ----------
+        buffer_level: float
+            The current buffer level in seconds
+        throughput: float
+            The throughput expected for the adaptation set, in bps
+        last_position: int, optional
+            The position in the ladder of the last representation chosen, None if there isn't any
+        plan: Plan
+            The segments to plan for, the next one first
+
+        Returns
+        -------
+        position: int
+            The position in the ladder of the representation to download the next segment from
+        """
+        buffer_q = min(round(buffer_level / self.buffer_step), round(self.max_buffer / self.buffer_step))
+        throughput_q = round(math.log(max(throughput, 1)) / self._log_throughput_step)
+        last = last_position if last_position is not None else -1
+        key = (buffer_q, throughput_q, last, plan)
+        position = self._decisions.get(key)
+        if position is None:
+            position = self._solve(buffer_q, throughput_q, last, plan)
+            self._decisions[key] = position
+            if len(self._decisions) > self.MEMO_SIZE:
+                self._decisions.popitem(last=False)
+        else:
+            self._decisions.move_to_end(key)
+        return position
+
+    def _solve(self, buffer_q: int, throughput_q: int, last: int, plan: Plan) -> int:
+        throughput = math.exp(throughput_q * self._log_throughput_step)
+        bandwidths = self.ladder.bandwidths
+        # The download time of every planned segment in every representation
+        download_times = []
+        for duration, sizes in plan:
+            if sizes is None:
+                download_times.append(tuple(bandwidth * duration / throughput for bandwidth in bandwidths))
+            else:
+                download_times.append(tuple(size * 8 / throughput for size in sizes))
+        values_key = (throughput_q, plan)
+        values = self._values.get(values_key)
+        if values is None:
+            values = dict()
+            self._values[values_key] = values
+            if len(self._values) > self.MEMO_SIZE:
+                self._values.popitem(last=False)
+        else:
+            self._values.move_to_end(values_key)
+        qualities = self.qualities
+        buffer_step = self.buffer_step
+        max_buffer_q = round(self.max_buffer / buffer_step)
+        num_steps = len(plan)
+
+        def value(step: int, level_q: int, previous: int) -> Tuple[float, int]:
+            """
+            The best value of the segments from step on, and the position to choose at step to reach it
+            """
+            best_value = -math.inf
+            best_position = 0
+            buffer = level_q * buffer_step
+            duration = plan[step][0]
+            times = download_times[step]
+            for position, quality in enumerate(qualities):
+                download_time = times[position]
+                reward = quality - self.rebuffer_penalty * max(download_time - buffer, 0.0)
+                if previous >= 0:
+                    reward -= self.switch_penalty * abs(quality - qualities[previous])
+                if step + 1 < num_steps:
+                    # The scheduler waits for the buffer to drain under the max before the next download
+                    next_q = min(round((max(buffer - download_time, 0.0) + duration) / buffer_step), max_buffer_q)
+                    key = (step + 1, next_q, position)
+                    future = values.get(key)
+                    if future is None:
+                        future = value(step + 1, next_q, position)[0]
+                        values[key] = future
+                    reward += future
+                if reward > best_value:
+                    best_value = reward
+                    best_position = position
+            return best_value, best_position
+
+        return value(0, buffer_q, last)[1]
+
+
+class MpcABRController(ABRController, SchedulerEventListener):
+    log = logging.getLogger("MpcABRController")
+
+    def __init__(self,
+                 horizon: int,
+                 rebuffer_penalty: float,
+                 switch_penalty: float,
+                 max_buffer: float,
+                 bandwidth_meter: BandwidthMeter,
+                 buffer_manager: BufferManager,
+                 robust: bool = False,
+                 error_window: int = 5,
+                 buffer_step: float = 0.25,
+                 throughput_step: float = 0.05,
+                 clock: Optional[Clock] = None):
+        """
+        MPC, an ABR rule planning the representations of the next segments to maximize
+            sum(bitrate) - rebuffer_penalty * rebuffering - switch_penalty * sum(|bitrate switch|)
+        over a horizon of segments, assuming the throughput stays at its estimate, and downloading the first segment
+        of the best plan. The plans are found by a dynamic program over quantized buffer levels, and the decisions
+        are memoized by quantized buffer level, quantized throughput and last representation, so that most of them
+        are a lookup. The sizes of the segments in the MPD are used when they are known.
+
+        It listens to the scheduler to know which segment is next, and to measure the throughput of each segment.
+
+        Parameters
+        ----------
+        horizon: int
+            The number of segments to plan for
+        rebuffer_penalty: float
+            The penalty of one second of rebuffering, in Mbps of bitrate
+        switch_penalty: float
+            The penalty of a bitrate switch, per Mbps of change
+        max_buffer: float
+            The buffer level over which the scheduler waits before downloading a segment, in seconds
+        bandwidth_meter: BandwidthMeter
+            A bandwidth meter which could provide the latest bandwidth estimate
+        buffer_manager : BufferManager
+            A buffer manager which could provide the buffer level estimate
+        robust: bool
+            If it's True (RobustMPC), the bandwidth estimate is divided by 1 + the max relative error of the last
+            estimates against the throughputs of the segments downloaded next
+        error_window: int
+            The number of estimation errors RobustMPC keeps
+        buffer_step: float
+            The step buffer levels are quantized to, in seconds
+        throughput_step: float
+            The relative step throughputs are quantized to
+        clock: Clock, optional
+            The clock to measure the segment downloads with. Default to the system clock.
+        """
+        # Parameter sweeps could give the numbers of segments as floats, which don't slice
+        self.horizon = int(horizon)
+        self.rebuffer_penalty = rebuffer_penalty
+        self.switch_penalty = switch_penalty
+        self.max_buffer = max_buffer
+        self.bandwidth_meter = bandwidth_meter
+        self.buffer_manager = buffer_manager
+        self.robust = robust
+        self.buffer_step = buffer_step
+        self.throughput_step = throughput_step
+        self.clock = clock if clock is not None else SystemClock()
+
+        self._planners: Dict[int, _MpcPlanner] = dict()
+        self._last_positions: Dict[int, int] = dict()
+        self._adaptation_sets: Optional[Dict[int, AdaptationSet]] = None
+        self._index = 0
+
+        # The estimate the last selections were made with, and the download of the segment being downloaded
+        self._estimate: Optional[float] = None
+        self._download_start: Optional[float] = None
+        self._download_size = 0
+        self._errors: Deque[float] = deque(maxlen=int(error_window))
+
+    def _planner(self, adaptation_set: AdaptationSet) -> _MpcPlanner:
+        planner = self._planners.get(adaptation_set.id)
+        if planner is None or planner.ladder is not adaptation_set.ladder:
+            planner = _MpcPlanner(adaptation_set, self.rebuffer_penalty, self.switch_penalty, self.max_buffer,
+                                  self.buffer_step, self.throughput_step)
+            self._planners[adaptation_set.id] = planner
+        return planner
+
+    def update_selection(self, adaptation_sets: Dict[int, AdaptationSet]) -> Dict[int, int]:
+        self._adaptation_sets = adaptation_sets
+        estimate = self.bandwidth_meter.bandwidth
+        self._estimate = estimate
+        if self.robust and len(self._errors) > 0:
+            estimate /= 1 + max(self._errors)
+        shares = self._split_bandwidth(adaptation_sets, estimate)
+        buffer_level = self.buffer_manager.buffer_level
+
+        selections = dict()
+        for id_, adaptation_set in adaptation_sets.items():
+            planner = self._planner(adaptation_set)
+            plan = planner.plan(self._index, self.horizon)
+            if len(plan) == 0:
+                # Past the last segment, let the scheduler end the session
+                position = self._last_positions.get(id_, 0)
+            else:
+                position = planner.decide(buffer_level, shares[id_], self._last_positions.get(id_), plan)
+            self._last_positions[id_] = position
+            selections[id_] = adaptation_set.ladder.ids[position]
+        return selections
+
+    async def on_segment_download_start(self, index, selections):
+        self._index = index
+        self._download_start = self.clock.time()
+        self._download_size = 0
+        for adaptation_set_id, representation_id in selections.items():
+            representation = self._adaptation_sets[adaptation_set_id].representations[representation_id]
+            if index < len(representation.segments):
+                segment = representation.segments[index]
+                if segment.size is not None:
+                    self._download_size += segment.size
+                else:
+                    self._download_size += int(representation.bandwidth * segment.duration / 8)
+
+    async def on_segment_download_complete(self, index):
+        self._index = index + 1
+        elapsed = self.clock.time() - self._download_start if self._download_start is not None else 0
+        if elapsed > 0 and self._estimate is not None and self._download_size > 0:
+            throughput = self._download_size * 8 / elapsed
+            self._errors.append(abs(self._estimate - throughput) / throughput)
+        self._download_start = None
+
+    async def on_segment_abandoned(self, index, adaptation_set_id, representation_id, fallback_representation_id):
+        adaptation_set = self._adaptation_sets[adaptation_set_id]
+        self._last_positions[adaptation_set_id] = adaptation_set.ladder.position(fallback_representation_id)
@@ -1,18 +1,61 @@
 import logging
+import math
 import os
 import re
 from abc import ABC, abstractmethod
-from typing import Dict, List
+from typing import Dict, List, Optional, Iterable, Union, Tuple
 from xml.etree import ElementTree
 from xml.etree.ElementTree import Element
 
-from dash_emulator.models import MPD, AdaptationSet, Representation, Segment
+from dash_emulator.models import MPD, AdaptationSet, Representation, SegmentTimeline
 
 
 class MPDParsingException(Exception):
     pass
 
 
+# An identifier of a SegmentTemplate pattern, with its optional format tag, e.g. $Number%05d$. $$ is an escaped $.
+_TEMPLATE_IDENTIFIER = re.compile(r"\$(RepresentationID|Number|Time|Bandwidth|)(%0?\d*d)?\$")
+
+
+def compile_segment_template(template: str, representation_id: str, bandwidth: int) -> str:
+    """
+    Compile a SegmentTemplate pattern of one representation into a format string, so that the URL of each segment is
+    a single string formatting instead of a substitution of the pattern.
+    $RepresentationID$, $Bandwidth$ and $$ are substituted once, and $Number$ and $Time$ are left to the formatting.
+
+    Parameters
+    ----------
+    template: str
+        The pattern, e.g. "chunk-$RepresentationID$-$Number%05d$.m4s"
+    representation_id: str
+        The ID of the representation
+    bandwidth: int
+        The bandwidth of the representation
+
+    Returns
+    -------
+    format: str
+        The format string to format with a dict of "number" and "time", e.g. "chunk-0-%(number)05d.m4s"
+    """
+    parts = []
+    position = 0
+    for match in _TEMPLATE_IDENTIFIER.finditer(template):
+        parts.append(template[position:match.start()].replace("%", "%%"))
+        identifier, format_tag = match.groups()
+        if identifier == "RepresentationID":
+            parts.append(representation_id.replace("%", "%%"))
+        elif identifier == "Bandwidth":
+            parts.append((format_tag or "%d") % bandwidth)
+        elif identifier == "Number" or identifier == "Time":
+            parts.append("%(" + identifier.lower() + ")" + (format_tag or "%d")[1:])
+        else:
+            parts.append("$")
+        position = match.end()
+    parts.append(template[position:].replace("%", "%%"))
+    return "".join(parts)
+
+
 class MPDParser(ABC):
     @abstractmethod
     def parse(self, content: str, url: str) -> MPD:
@@ -22,6 +65,16 @@ class MPDParser(ABC):
 class DefaultMPDParser(MPDParser):
     log = logging.getLogger("DefaultMPDParser")
 
+    def __init__(self, keep_content: bool = False):
+        """
+        Parameters
+        ----------
+        keep_content: bool
+            If the raw content is kept in the MPD. It isn't by default, so that the players sharing an MPD don't keep
+            the whole manifest alive.
+        """
+        self.keep_content = keep_content
+
     @staticmethod
     def parse_iso8601_time(duration) -> float:
         """
@@ -75,8 +128,8 @@ class DefaultMPDParser(MPDParser):
             adaptation_set: AdaptationSet = self.parse_adaptation_set(adaptation_set_xml, base_url)
             adaptation_sets[adaptation_set.id] = adaptation_set
 
-        return MPD(content, url, type_, media_presentation_duration, max_segment_duration, min_buffer_time,
-                   adaptation_sets)
+        return MPD(content if self.keep_content else None, url, type_, media_presentation_duration,
+                   max_segment_duration, min_buffer_time, adaptation_sets)
 
     def parse_adaptation_set(self, tree: Element, base_url) -> AdaptationSet:
         id_ = tree.attrib.get("id")
@@ -111,24 +164,247 @@ class DefaultMPDParser(MPDParser):
         segment_template: Element = tree.find("SegmentTemplate")
         initialization = segment_template.attrib.get("initialization").replace("$RepresentationID$", id_)
         initialization = base_url + initialization
-        segments: List[Segment] = []
-
         timescale = int(segment_template.attrib.get("timescale"))
-        media = segment_template.attrib.get("media").replace("$RepresentationID$", id_)
+        media = base_url.replace("%", "%%") + compile_segment_template(segment_template.attrib.get("media"), id_,
+                                                                       bandwidth)
         start_number = int(segment_template.attrib.get('startNumber'))
 
         segment_timeline = segment_template.find("SegmentTimeline")
 
-        num = start_number
+        entries = []
         for segment in segment_timeline:  # type: Element
-            duration = float(segment.attrib.get("d")) / timescale
-            url = base_url + re.sub(r"\$Number(%\d+d)\$", r"\1", media) % num
-            segments.append(Segment(url, duration))
-            num += 1
-
-            if 'r' in segment.attrib:  # repeat
-                for i in range(1, int(segment.attrib.get('r'))):
-                    url = base_url + re.sub(r"\$Number(%\d+d)\$", r"\1", media) % num
-                    segments.append(Segment(url, duration))
-                    num += 1
+            t = segment.attrib.get('t')
+            # The number of segments, repeats included
+            count = max(int(segment.attrib.get('r')), 1) if 'r' in segment.attrib else 1
+            entries.append((int(t) if t is not None else None, int(segment.attrib.get("d")), count))
+        segments = SegmentTimeline(media, timescale, start_number, entries)
         return Representation(int(id_), mime, codec, bandwidth, width, height, initialization, segments)
+
+
+class _SegmentTemplate(object):
+    def __init__(self, attrib: Dict[str, str]):
+        """
+        The attributes of a SegmentTemplate element, and the entries of its SegmentTimeline
+        """
+        self.media = attrib.get("media")
+        self.initialization = attrib.get("initialization")
+        self.timescale = int(attrib.get("timescale", 1))
+        self.start_number = int(attrib.get("startNumber", 1))
+        self.duration = int(attrib["duration"]) if "duration" in attrib else None
+        # The start time (None to follow the previous entry), the duration and the number of segments of every S
+        # element of the SegmentTimeline, None if there isn't any SegmentTimeline
+        self.timeline: Optional[List[Tuple[Optional[int], int, int]]] = None
+
+
+class _MPDBuilder(object):
+    def __init__(self, url: str):
+        """
+        Builds an MPD from the start and end events of the elements, keeping only the elements being parsed
+        """
+        self.url = url
+        self.base_url = os.path.dirname(url) + '/'
+
+        self.mpd_attrib: Optional[Dict[str, str]] = None
+        self.num_periods = 0
+        self.adaptation_sets: Dict[int, AdaptationSet] = {}
+
+        # The tags and the elements from the root to the current element
+        self._tags: List[str] = []
+        self._elements: List[Element] = []
+        self._adaptation_set_attrib: Optional[Dict[str, str]] = None
+        self._adaptation_set_template: Optional[_SegmentTemplate] = None
+        self._representations: Dict[int, Representation] = {}
+        self._representation_attrib: Optional[Dict[str, str]] = None
+        self._representation_template: Optional[_SegmentTemplate] = None
+        self._template: Optional[_SegmentTemplate] = None
+        self._timeline: Optional[List[Tuple[Optional[int], int, int]]] = None
+        # The tag of the S elements with the namespace of the MPD, to tell them apart without parsing their tags
+        self._s_tag = "S"
+
+    def start(self, element: Element) -> None:
+        if element.tag == self._s_tag:
+            # S elements are only handled at their end, as they are most of the elements
+            return
+        # Namespaces are kept by the tags as {namespace}tag
+        tag = element.tag.rpartition("}")[2]
+        self._tags.append(tag)
+        self._elements.append(element)
+        if tag == "MPD":
+            self.mpd_attrib = dict(element.attrib)
+            self._s_tag = element.tag[:-len(tag)] + "S"
+        elif tag == "Period" and len(self._tags) == 2:
+            self.num_periods += 1
+        elif self.num_periods != 1 or len(self._tags) < 3 or self._tags[1] != "Period":
+            # Only the first period is parsed
+            pass
+        elif tag == "AdaptationSet":
+            self._adaptation_set_attrib = dict(element.attrib)
+            self._adaptation_set_template = None
+            self._representations = {}
+        elif tag == "Representation":
+            self._representation_attrib = dict(element.attrib)
+            self._representation_template = None
+        elif tag == "SegmentTemplate":
+            self._template = _SegmentTemplate(element.attrib)
+            if self._tags[-2] == "Representation":
+                self._representation_template = self._template
+            elif self._tags[-2] == "AdaptationSet":
+                self._adaptation_set_template = self._template
+        elif tag == "SegmentTimeline" and self._template is not None:
+            self._template.timeline = self._timeline = []
+
+    def end(self, element: Element) -> None:
+        if element.tag == self._s_tag:
+            if self._timeline is not None:
+                attrib = element.attrib
+                t = attrib.get("t")
+                r = attrib.get("r")
+                self._timeline.append((int(t) if t is not None else None, int(attrib["d"]),
+                                       max(int(r), 1) if r is not None else 1))
+            self._elements[-1].remove(element)
+            return
+        tag = self._tags.pop()
+        self._elements.pop()
+        if len(self._elements) > 0:
+            # Drop the element once it is parsed, so that the tree never grows
+            self._elements[-1].remove(element)
+        if self.num_periods != 1 or len(self._tags) < 2 or self._tags[1] != "Period":
+            return
+        if tag == "Representation":
+            representation = self.build_representation(self._representation_attrib, self._adaptation_set_attrib,
+                                                        self._representation_template or
+                                                        self._adaptation_set_template)
+            self._representations[representation.id] = representation
+            self._representation_attrib = None
+        elif tag == "AdaptationSet":
+            attrib = self._adaptation_set_attrib
+            id_ = int(attrib["id"]) if "id" in attrib else len(self.adaptation_sets)
+            self.adaptation_sets[id_] = AdaptationSet(id_, attrib.get("contentType"), attrib.get("frameRate", None),
+                                                      int(attrib.get("maxWidth", 0)), int(attrib.get("maxHeight", 0)),
+                                                      attrib.get("par", None), self._representations)
+            self._adaptation_set_attrib = None
+        elif tag == "SegmentTimeline":
+            self._timeline = None
+        elif tag == "SegmentTemplate":
+            self._template = None
+
+    def build_representation(self, attrib: Dict[str, str], adaptation_set_attrib: Dict[str, str],
+                             template: Optional[_SegmentTemplate]) -> Representation:
+        if template is None or template.media is None:
+            raise MPDParsingException("The MPD support is not complete yet")
+        id_ = attrib["id"]
+        bandwidth = int(attrib["bandwidth"])
+
+        def inherited(name, default=None):
+            return attrib.get(name, adaptation_set_attrib.get(name, default))
+
+        initialization = self.base_url + template.initialization.replace("$RepresentationID$", id_) \
+            if template.initialization is not None else None
+        media = self.base_url.replace("%", "%%") + compile_segment_template(template.media, id_, bandwidth)
+        timescale = template.timescale
+        if template.timeline is not None:
+            segments = SegmentTimeline(media, timescale, template.start_number, template.timeline)
+        elif template.duration is not None:
+            # Segments of the same duration over the whole presentation, the last one shortened
+            total = DefaultMPDParser.parse_iso8601_time(self.mpd_attrib.get("mediaPresentationDuration", ""))
+            if total <= 0:
+                # Live MPDs have no duration, and their segments would run without an end
+                raise MPDParsingException("Representation %s has a segment duration but the MPD has no "
+                                          "mediaPresentationDuration" % id_)
+            num_segments = math.ceil(total * timescale / template.duration - 1e-9)
+            last_duration = round(total * timescale) - (num_segments - 1) * template.duration
+            segments = SegmentTimeline(media, timescale, template.start_number,
+                                       [(0, template.duration, num_segments - 1), (None, last_duration, 1)])
+        else:
+            raise MPDParsingException("Representation %s has neither a SegmentTimeline nor a segment duration" % id_)
+        return Representation(int(id_), inherited("mimeType"), inherited("codecs"), bandwidth,
+                              int(inherited("width", 0)), int(inherited("height", 0)), initialization, segments)
+
+
+class StreamingMPDParser(MPDParser):
+    log = logging.getLogger("StreamingMPDParser")
+
+    def __init__(self, chunk_size: int = 65536, keep_content: bool = False):
+        """
+        An MPD parser feeding the content to an incremental XML parser chunk by chunk, and building the MPD from the
+        events of the elements. Each element is dropped once it is parsed, so the XML tree is never built. The
+        namespaces are handled by the XML parser, the SegmentTemplate patterns are compiled once per representation,
+        and the SegmentTimeline entries are kept as compact tuples until the representation ends.
+
+        It gives the same MPD as the DefaultMPDParser. In addition, the SegmentTemplate may be in the AdaptationSet,
+        the segments may be given by a duration instead of a SegmentTimeline, and the mimeType, codecs, width and
+        height of the representations may be given by the AdaptationSet.
+
+        Parameters
+        ----------
+        chunk_size: int
+            The size of the chunks fed to the XML parser
+        keep_content: bool
+            If the raw content given to parse is kept in the MPD. It isn't by default, so that the players sharing an
+            MPD don't keep the whole manifest alive.
+        """
+        self.chunk_size = chunk_size
+        self.keep_content = keep_content
+
+    def parse(self, content: str, url: str) -> MPD:
+        chunks = (content[i:i + self.chunk_size] for i in range(0, len(content), self.chunk_size))
+        return self._parse(chunks, url, content if self.keep_content else None)
+
+    def parse_file(self, path: str, url: str) -> MPD:
+        """
+        Parse an MPD file without reading it at once. The content is never kept.
+
+        Parameters
+        ----------
+        path: str
+            The path of the MPD file
+        url: str
+            The URL of the MPD, to resolve the segment URLs against
+        """
+        with open(path, "rb") as f:
+            return self.parse_chunks(iter(lambda: f.read(self.chunk_size), b""), url)
+
+    def parse_chunks(self, chunks: Iterable[Union[str, bytes]], url: str) -> MPD:
+        """
+        Parse an MPD from chunks of its content. The content is never kept.
+
+        Parameters
+        ----------
+        chunks: Iterable[Union[str, bytes]]
+            The chunks of the content
+        url: str
+            The URL of the MPD, to resolve the segment URLs against
+        """
+        return self._parse(chunks, url, None)
+
+    def _parse(self, chunks: Iterable[Union[str, bytes]], url: str, content: Optional[str]) -> MPD:
+        builder = _MPDBuilder(url)
+        xml_parser = ElementTree.XMLPullParser(events=("start", "end"))
+        for chunk in chunks:
+            xml_parser.feed(chunk)
+            self._handle_events(xml_parser, builder)
+        xml_parser.close()
+        self._handle_events(xml_parser, builder)
+
+        if builder.mpd_attrib is None:
+            raise MPDParsingException("""Cannot find "MPD" tag""")
+        if builder.num_periods == 0:
+            error_msg = """Cannot find "Period" tag"""
+            self.log.error(error_msg)
+            raise MPDParsingException(error_msg)
+        attrib = builder.mpd_attrib
+        return MPD(content, url, attrib["type"],
+                   DefaultMPDParser.parse_iso8601_time(attrib.get("mediaPresentationDuration", "")),
+                   DefaultMPDParser.parse_iso8601_time(attrib.get("maxSegmentDuration", "")),
+                   DefaultMPDParser.parse_iso8601_time(attrib.get("minBufferTime", "")),
+                   builder.adaptation_sets)
+
+    @staticmethod
+    def _handle_events(xml_parser: ElementTree.XMLPullParser, builder: _MPDBuilder) -> None:
+        start = builder.start
+        end = builder.end
+        for event, element in xml_parser.read_events():
+            if event == "start":
+                start(element)
+            else:
+                end(element)
@@ -60,7 +60,7 @@ class MPDProviderImpl(MPDProvider):
 
     async def update(self):
         content = await self.download_manager.download(self.mpd_url, save=True)
-        text = content.decode("utf-8")
+        text = str(content, "utf-8")
         self._mpd = self.parser.parse(text, url=self.mpd_url)
 
     async def update_repeatedly(self):
@@ -80,3 +80,26 @@ class MPDProviderImpl(MPDProvider):
         if self._task is not None:
             self._task.cancel()
         await self.download_manager.close()
+
+
+class StaticMPDProvider(MPDProvider):
+    def __init__(self, mpd: MPD):
+        """
+        Provide an MPD object which is already parsed. The MPD URL passed to start() is ignored.
+
+        Parameters
+        ----------
+        mpd: MPD
+            The MPD object
+        """
+        self._mpd = mpd
+
+    @property
+    def mpd(self) -> MPD:
+        return self._mpd
+
+    async def start(self, mpd_url):
+        pass
+
+    async def stop(self):
+        pass
@@ -1,12 +1,12 @@
 import asyncio
-import time
 from abc import ABC, abstractmethod
 from typing import Optional, List
 
 from dash_emulator.buffer import BufferManager
+from dash_emulator.clock import Clock, SystemClock
 from dash_emulator.models import State, MPD
 from dash_emulator.mpd import MPDProvider
-from dash_emulator.scheduler import Scheduler
+from dash_emulator.scheduler import Scheduler, SchedulerEventListener
 from dash_emulator.service import AsyncService
 
 
@@ -37,12 +37,17 @@ class Player(ABC):
     @abstractmethod
     async def start(self, mpd_url) -> None:
         """
-        Start the playback
+        Start the playback, and return once it ends
 
         Parameters
         ----------
         mpd_url
 
+        Raises
+        ------
+        Exception
+            The error of the scheduler, if it stopped downloading segments on one. The playback ends once the
+            segments downloaded before the error are played back.
         """
         pass
 
@@ -61,7 +66,27 @@ class Player(ABC):
         pass
 
 
+class _SchedulerWakeup(SchedulerEventListener):
+    def __init__(self):
+        """
+        Wake the player up when the scheduler enqueues a segment or runs out of segments
+        """
+        self.event = asyncio.Event()
+
+    async def on_segment_download_start(self, index, selections):
+        pass
+
+    async def on_segment_download_complete(self, index):
+        self.event.set()
+
+    async def on_end(self):
+        self.event.set()
+
+
 class DASHPlayer(Player):
+    # The shortest sleep of the main loop, so the position always moves forward (s)
+    MIN_SLEEP = 1e-6
+
     def __init__(self,
                  update_interval: float,
                  min_rebuffer_duration: float,
@@ -70,7 +95,10 @@ class DASHPlayer(Player):
                  mpd_provider: MPDProvider,
                  scheduler: Scheduler,
                  listeners: List[PlayerEventListener],
-                 services: List[AsyncService] = None):
+                 services: List[AsyncService] = None,
+                 clock: Optional[Clock] = None,
+                 event_driven: bool = False,
+                 buffer_sample_interval: Optional[float] = 0):
         """
         Parameters
         ----------
@@ -89,6 +117,18 @@ class DASHPlayer(Player):
             The buffer manager
         listeners:
             A list of player event listeners
+        services:
+            A list of services started with the playback
+        clock:
+            The clock to play on. The system clock is used if it's None.
+        event_driven:
+            If it's False, the main loop wakes up every update interval, and delivers an on_buffer_level_change event
+            every time.
+            If it's True, the main loop sleeps until the buffer runs out, or until the scheduler enqueues a segment or
+            runs out of segments, whichever comes first.
+        buffer_sample_interval:
+            The interval between two on_buffer_level_change events of the event driven main loop in seconds.
+            0 to deliver them every time the main loop wakes up, None to never deliver them.
         """
         self.update_interval = update_interval
 
@@ -100,6 +140,9 @@ class DASHPlayer(Player):
         self.mpd_provider = mpd_provider
         self.listeners = listeners
         self.services = services if services is not None else []
+        self.clock = clock if clock is not None else SystemClock()
+        self.event_driven = event_driven
+        self.buffer_sample_interval = buffer_sample_interval
 
         # MPD related
         self._mpd_obj: Optional[MPD] = None
@@ -142,6 +185,9 @@ class DASHPlayer(Player):
         self._main_loop_task = await self.main_loop()
 
         await self.scheduler.stop()
+        if self.scheduler.error is not None:
+            # The stream ended early, the caller has to know the session failed
+            raise self.scheduler.error
 
     def stop(self) -> None:
         raise NotImplementedError
@@ -154,9 +200,12 @@ class DASHPlayer(Player):
         The main loop.
         This method coordinate work between different components.
         """
+        if self.event_driven:
+            return await self._event_driven_loop()
+
         timestamp = 0
         while True:
-            now = time.time()
+            now = self.clock.time()
             interval = now - timestamp
             timestamp = now
 
@@ -171,27 +220,85 @@ class DASHPlayer(Player):
             for listener in self.listeners:
                 await listener.on_buffer_level_change(buffer_level)
 
+            if await self._update_state(buffer_level):
+                return
+
+            # A virtual clock only moves by the sleeps, and a rounding error of the buffer level could be too small to
+            # move it
+            await self.clock.sleep(max(min(buffer_level, self.update_interval), self.MIN_SLEEP)
+                                   if buffer_level > 0 else self.update_interval)
+
+    async def _event_driven_loop(self):
+        wakeup = _SchedulerWakeup()
+        self.scheduler.add_listener(wakeup)
+        loop = asyncio.get_running_loop()
+
+        timestamp = self.clock.time()
+        next_sample = timestamp
+        while True:
+            # Clear before reading the buffer level, so no event in between gets lost
+            wakeup.event.clear()
+
+            now = self.clock.time()
+            interval = now - timestamp
+            timestamp = now
+
+            # Update MPD object
+            self._mpd_obj = self.mpd_provider.mpd
+
             if self._state == State.READY:
-                if buffer_level <= 0:
-                    if self.scheduler.is_end:
-                        await self._switch_state(self._state, State.END)
-                        self._state = State.END
-                        return
-                    else:
-                        await self._switch_state(self._state, State.BUFFERING)
-                        self._state = State.BUFFERING
-            elif self._state == State.BUFFERING:
+                self._position += interval
+
+            self.buffer_manager.update_buffer(self._position)
+            buffer_level = self.buffer_manager.buffer_level
+
+            if self.buffer_sample_interval is not None and now >= next_sample:
+                next_sample = now + self.buffer_sample_interval
+                for listener in self.listeners:
+                    await listener.on_buffer_level_change(buffer_level)
+
+            if await self._update_state(buffer_level):
+                return
+            self.buffer_manager.update_buffer(self._position, self._state == State.READY)
+
+            # Sleep until the buffer runs out, the next sample, or the next event of the scheduler
+            timeout = buffer_level if self._state == State.READY else None
+            if self.buffer_sample_interval is not None and self.buffer_sample_interval > 0:
+                timeout = next_sample - now if timeout is None else min(timeout, next_sample - now)
+            timer = loop.call_later(max(timeout, self.MIN_SLEEP), wakeup.event.set) if timeout is not None else None
+            await wakeup.event.wait()
+            if timer is not None:
+                timer.cancel()
+
+    async def _update_state(self, buffer_level) -> bool:
+        """
+        Switch the state given the buffer level
+
+        Returns
+        -------
+        end: bool
+            True if the playback ends
+        """
+        if self._state == State.READY:
+            if buffer_level <= 0:
                 if self.scheduler.is_end:
+                    await self._switch_state(self._state, State.END)
+                    self._state = State.END
+                    return True
+                else:
+                    await self._switch_state(self._state, State.BUFFERING)
+                    self._state = State.BUFFERING
+        elif self._state == State.BUFFERING:
+            if self.scheduler.is_end:
+                await self._switch_state(self._state, State.READY)
+                self._state = State.READY
+            if not self._playback_started:
+                if buffer_level > self.min_start_buffer_duration:
+                    self._playback_started = True
                     await self._switch_state(self._state, State.READY)
                     self._state = State.READY
-                if not self._playback_started:
-                    if buffer_level > self.min_start_buffer_duration:
-                        self._playback_started = True
-                        await self._switch_state(self._state, State.READY)
-                        self._state = State.READY
-                else:
-                    if buffer_level > self.min_rebuffer_duration:
-                        await self._switch_state(self._state, State.READY)
-                        self._state = State.READY
-
-            await asyncio.sleep(min(buffer_level, self.update_interval) if buffer_level > 0 else self.update_interval)
+            else:
+                if buffer_level > self.min_rebuffer_duration:
+                    await self._switch_state(self._state, State.READY)
+                    self._state = State.READY
+        return False
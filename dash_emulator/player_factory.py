@@ -1,33 +1,344 @@
-from dash_emulator.abr import DashABRController
-from dash_emulator.bandwidth import BandwidthMeterImpl
-from dash_emulator.buffer import BufferManagerImpl, BufferManager
+from typing import Optional, List, Dict, Callable, Any, Mapping
+
+from dash_emulator.abr import ABRController, DashABRController, BolaABRController
+from dash_emulator.bandwidth import BandwidthMeterImpl, BandwidthMeter, HarmonicMeanBandwidthMeter, \
+    DualEwmaBandwidthMeter, SampleBandwidthMeter, ConcurrentBandwidthMeter
+from dash_emulator.buffer import TimelineBufferManager, BufferManager
+from dash_emulator.cache import SegmentCache
+from dash_emulator.clock import EventLoopClock, Clock
 from dash_emulator.config import Config
-from dash_emulator.download import DownloadManagerImpl
+from dash_emulator.download import DownloadManagerImpl, DownloadEventListener
 from dash_emulator.event_logger import EventLogger
-from dash_emulator.mpd.parser import DefaultMPDParser
-from dash_emulator.mpd.providers import MPDProviderImpl, MPDProvider
-from dash_emulator.player import Player, DASHPlayer
-from dash_emulator.scheduler import SchedulerImpl, Scheduler
+from dash_emulator.models import MPD
+from dash_emulator.mpc import MpcABRController
+from dash_emulator.mpd.parser import StreamingMPDParser
+from dash_emulator.mpd.providers import MPDProviderImpl, MPDProvider, StaticMPDProvider
+from dash_emulator.player import Player, DASHPlayer, PlayerEventListener
+from dash_emulator.policy import RetryPolicy, AbandonmentPolicy
+from dash_emulator.scheduler import SchedulerImpl, Scheduler, SchedulerEventListener
+from dash_emulator.session import SessionPool
+from dash_emulator.simulation import SimulatedDownloadManager, segment_sizes
+from dash_emulator.storage import SegmentStorage
+from dash_emulator.trace import BandwidthTrace
+
+
+def _build_dash_abr_controller(bandwidth_meter: BandwidthMeter, buffer_manager: BufferManager,
+                               clock: Optional[Clock], **params: Any) -> ABRController:
+    cfg = Config
+    params = {"panic_buffer": cfg.abr_panic_buffer, "safe_buffer": cfg.abr_safe_buffer, **params}
+    return DashABRController(bandwidth_meter=bandwidth_meter, buffer_manager=buffer_manager, **params)
+
+
+def _build_bola_abr_controller(bandwidth_meter: BandwidthMeter, buffer_manager: BufferManager,
+                               clock: Optional[Clock], **params: Any) -> ABRController:
+    cfg = Config
+    params = {"min_buffer": cfg.bola_min_buffer, "buffer_target": cfg.bola_buffer_target, **params}
+    return BolaABRController(bandwidth_meter=bandwidth_meter, buffer_manager=buffer_manager, **params)
+
+
+def _build_bola_o_abr_controller(bandwidth_meter: BandwidthMeter, buffer_manager: BufferManager,
+                                 clock: Optional[Clock], **params: Any) -> ABRController:
+    params = {"placeholder": True, "oscillation_control": True, **params}
+    return _build_bola_abr_controller(bandwidth_meter, buffer_manager, clock, **params)
+
+
+def _build_mpc_abr_controller(bandwidth_meter: BandwidthMeter, buffer_manager: BufferManager, clock: Optional[Clock],
+                              **params: Any) -> ABRController:
+    cfg = Config
+    params = {"horizon": cfg.mpc_horizon, "rebuffer_penalty": cfg.mpc_rebuffer_penalty,
+              "switch_penalty": cfg.mpc_switch_penalty, "max_buffer": cfg.max_buffer_duration,
+              "error_window": cfg.mpc_error_window, "buffer_step": cfg.mpc_buffer_step,
+              "throughput_step": cfg.mpc_throughput_step, **params}
+    return MpcABRController(bandwidth_meter=bandwidth_meter, buffer_manager=buffer_manager, clock=clock, **params)
+
+
+def _build_robust_mpc_abr_controller(bandwidth_meter: BandwidthMeter, buffer_manager: BufferManager,
+                                     clock: Optional[Clock], **params: Any) -> ABRController:
+    params = {"robust": True, **params}
+    return _build_mpc_abr_controller(bandwidth_meter, buffer_manager, clock, **params)
+
+
+ABR_CONTROLLERS: Dict[str, Callable[..., ABRController]] = {
+    "dash": _build_dash_abr_controller,
+    "bola": _build_bola_abr_controller,
+    "bola-o": _build_bola_o_abr_controller,
+    "mpc": _build_mpc_abr_controller,
+    "robust-mpc": _build_robust_mpc_abr_controller
+}
+"""
+The builders of the ABR controllers by name. Each one is called with the bandwidth meter, the buffer manager, the clock
+of the player and the parameters overriding the defaults of the config as keyword arguments.
+"""
+
+
+def build_abr_controller(name: str, bandwidth_meter: BandwidthMeter, buffer_manager: BufferManager,
+                         abr_params: Optional[Dict[str, Any]] = None, clock: Optional[Clock] = None) -> ABRController:
+    """
+    Build an ABR controller by name
+
+    Parameters
+    ----------
+    name: str
+        One of the names in ABR_CONTROLLERS
+    bandwidth_meter: BandwidthMeter
+        The bandwidth meter of the player
+    buffer_manager: BufferManager
+        The buffer manager of the player
+    abr_params: Dict[str, Any], optional
+        Keyword arguments of the ABR controller overriding the defaults, e.g. {"panic_buffer": 3}
+    clock: Clock, optional
+        The clock of the player. Default to the system clock.
+
+    Returns
+    -------
+    abr_controller: ABRController
+        The ABR controller. It should also listen to the scheduler if it's a SchedulerEventListener.
+    """
+    builder = ABR_CONTROLLERS.get(name)
+    if builder is None:
+        raise ValueError("Unknown ABR algorithm %s, it should be one of %s" % (name, ", ".join(ABR_CONTROLLERS)))
+    return builder(bandwidth_meter, buffer_manager, clock, **(abr_params or {}))
+
+
+def _build_ewma_bandwidth_meter(clock: Optional[Clock]) -> BandwidthMeter:
+    cfg = Config
+    return BandwidthMeterImpl(cfg.max_initial_bitrate, cfg.smoothing_factor, [], clock)
+
+
+def _build_harmonic_mean_bandwidth_meter(clock: Optional[Clock]) -> BandwidthMeter:
+    cfg = Config
+    return HarmonicMeanBandwidthMeter(cfg.max_initial_bitrate, cfg.bandwidth_window, [], clock)
+
+
+def _build_dual_ewma_bandwidth_meter(clock: Optional[Clock]) -> BandwidthMeter:
+    cfg = Config
+    return DualEwmaBandwidthMeter(cfg.max_initial_bitrate, cfg.bandwidth_fast_half_life, cfg.bandwidth_slow_half_life,
+                                  cfg.bandwidth_window, [], clock)
+
+
+def _build_sample_bandwidth_meter(clock: Optional[Clock]) -> BandwidthMeter:
+    cfg = Config
+    return SampleBandwidthMeter(cfg.max_initial_bitrate, cfg.bandwidth_sample_window, [],
+                                cfg.bandwidth_sample_percentile, clock)
+
+
+def _build_concurrent_bandwidth_meter(clock: Optional[Clock]) -> BandwidthMeter:
+    cfg = Config
+    return ConcurrentBandwidthMeter(cfg.max_initial_bitrate, cfg.bandwidth_busy_window, [],
+                                    cfg.bandwidth_sample_percentile, clock)
+
+
+BANDWIDTH_METERS: Dict[str, Callable[[Optional[Clock]], BandwidthMeter]] = {
+    "ewma": _build_ewma_bandwidth_meter,
+    "harmonic-mean": _build_harmonic_mean_bandwidth_meter,
+    "dual-ewma": _build_dual_ewma_bandwidth_meter,
+    "sample": _build_sample_bandwidth_meter,
+    "concurrent": _build_concurrent_bandwidth_meter
+}
+"""
+The builders of the bandwidth meters by name. Each one is called with the clock of the player and takes its parameters
+from the config.
+"""
+
+
+def build_bandwidth_meter(name: Optional[str] = None, clock: Optional[Clock] = None) -> BandwidthMeter:
+    """
+    Build a bandwidth meter by name
+
+    Parameters
+    ----------
+    name: str, optional
+        One of the names in BANDWIDTH_METERS. The estimator of the config is used if it's None.
+    clock: Clock, optional
+        The clock of the player. Default to the system clock.
+
+    Returns
+    -------
+    bandwidth_meter: BandwidthMeter
+        The bandwidth meter. It listens to the segment downloads.
+    """
+    name = name if name is not None else Config.bandwidth_estimator
+    builder = BANDWIDTH_METERS.get(name)
+    if builder is None:
+        raise ValueError("Unknown bandwidth estimator %s, it should be one of %s" % (name, ", ".join(BANDWIDTH_METERS)))
+    return builder(clock)
+
+
+def build_session_pool() -> SessionPool:
+    """
+    Build a connection pool with the settings in the config
+
+    Returns
+    -------
+    session_pool: SessionPool
+        A connection pool which could be shared by many players
+    """
+    cfg = Config
+    return SessionPool(cfg.max_connections, cfg.max_connections_per_host, cfg.keepalive_timeout, cfg.dns_cache_ttl,
+                       cfg.tcp_nodelay)
 
 
-def build_dash_player() -> Player:
+def build_retry_policy() -> RetryPolicy:
+    """
+    Build the deadline and retry policy of the segment downloads with the settings in the config
+
+    Returns
+    -------
+    retry_policy: RetryPolicy
+        The retry policy
+    """
+    cfg = Config
+    return RetryPolicy(cfg.timeout_max_ratio, cfg.max_retries, cfg.retry_backoff_base, cfg.retry_backoff_max)
+
+
+def build_segment_cache(folder: str) -> SegmentCache:
+    """
+    Build a segment cache with the settings in the config
+
+    Parameters
+    ----------
+    folder: str
+        The folder to keep the cached segments in
+
+    Returns
+    -------
+    cache: SegmentCache
+        A segment cache which could be shared by many players
+    """
+    cfg = Config
+    return SegmentCache(folder, cfg.cache_max_size, cfg.cache_replay_throughput)
+
+
+def build_dash_player(session_pool: Optional[SessionPool] = None,
+                      output: Optional[str] = None,
+                      cache: Optional[SegmentCache] = None,
+                      mpd: Optional[MPD] = None,
+                      listeners: Optional[List[PlayerEventListener]] = None,
+                      abr: Optional[str] = None,
+                      abr_params: Optional[Dict[str, Any]] = None) -> Player:
     """
     Build a MPEG-DASH Player
 
+    Parameters
+    ----------
+    session_pool: SessionPool, optional
+        The connection pool shared by the MPD provider and the segment downloader.
+        Pass the same pool to many players to share the connections between them.
+        A new pool is built if it's None.
+    output: str, optional
+        The folder to save the downloaded segments in. Segments are not saved if it's None.
+    cache: SegmentCache, optional
+        The cache to serve the segments from. Segments are always downloaded from the origin if it's None.
+    mpd: MPD, optional
+        An MPD object which is already parsed. Pass the same object to many players to parse the MPD only once.
+        The MPD is downloaded and parsed by the player if it's None.
+    listeners: List[PlayerEventListener], optional
+        Extra listeners of the player events. Those which are also SchedulerEventListeners listen to the scheduler too,
+        and those which are also DownloadEventListeners listen to the segment downloads.
+    abr: str, optional
+        The name of the ABR algorithm in ABR_CONTROLLERS. The algorithm of the config is used if it's None.
+    abr_params: Dict[str, Any], optional
+        Keyword arguments of the ABR controller overriding the defaults
+
+    Returns
+    -------
+    player: Player
+        A MPEG-DASH Player
+    """
+    cfg = Config
+    listeners = listeners if listeners is not None else []
+    if session_pool is None:
+        session_pool = build_session_pool()
+    buffer_manager: BufferManager = TimelineBufferManager()
+    event_logger = EventLogger()
+    if mpd is not None:
+        mpd_provider: MPDProvider = StaticMPDProvider(mpd)
+    else:
+        mpd_provider: MPDProvider = MPDProviderImpl(StreamingMPDParser(), cfg.update_interval,
+                                                     DownloadManagerImpl([], session_pool=session_pool))
+    bandwidth_meter = build_bandwidth_meter()
+    segment_storage = SegmentStorage(output) if output is not None else None
+    abandonment_policy = AbandonmentPolicy(buffer_manager, cfg.abandonment_min_elapsed) \
+        if cfg.abandon_slow_downloads else None
+    retry_policy = build_retry_policy() if cfg.retry_downloads else None
+    download_listeners = [l for l in [abandonment_policy] + listeners if isinstance(l, DownloadEventListener)]
+    download_manager = DownloadManagerImpl([bandwidth_meter] + download_listeners,
+                                           write_to_disk=segment_storage is not None,
+                                           chunk_size=cfg.chunk_size,
+                                           session_pool=session_pool,
+                                           progress_interval=cfg.progress_interval,
+                                           progress_bytes=cfg.progress_bytes,
+                                           write_block_size=cfg.write_block_size,
+                                           cache=cache)
+    abr_controller = build_abr_controller(abr if abr is not None else cfg.abr_algorithm, bandwidth_meter,
+                                          buffer_manager, abr_params)
+    scheduler_listeners = [event_logger] + [l for l in [abr_controller] + listeners
+                                            if isinstance(l, SchedulerEventListener)]
+    scheduler: Scheduler = SchedulerImpl(cfg.max_buffer_duration, cfg.update_interval, download_manager,
+                                         bandwidth_meter, buffer_manager, abr_controller, scheduler_listeners,
+                                         cfg.max_concurrent_downloads, segment_storage, retry_policy,
+                                         abandonment_policy, max_buffer_bytes=cfg.max_buffer_bytes)
+    return DASHPlayer(cfg.update_interval, min_rebuffer_duration=1, min_start_buffer_duration=2,
+                      buffer_manager=buffer_manager, mpd_provider=mpd_provider, scheduler=scheduler,
+                      listeners=[event_logger] + listeners, event_driven=cfg.event_driven_player,
+                      buffer_sample_interval=cfg.buffer_sample_interval)
+
+
+def build_simulated_dash_player(mpd: MPD, trace: BandwidthTrace,
+                                listeners: Optional[List[PlayerEventListener]] = None,
+                                abr_params: Optional[Dict[str, Any]] = None,
+                                sizes: Optional[Mapping[str, int]] = None,
+                                abr: Optional[str] = None) -> Player:
+    """
+    Build a MPEG-DASH Player which plays an MPD object over a simulated network.
+
+    The player follows the clock of the running event loop. Start it in a VirtualTimeEventLoop, e.g. with
+    dash_emulator.clock.run_in_virtual_time, to run the session in virtual time.
+
+    Parameters
+    ----------
+    mpd: MPD
+        The MPD object to play
+    trace: BandwidthTrace
+        The bandwidth trace of the simulated network
+    listeners: List[PlayerEventListener], optional
+        Extra listeners of the player events. Those which are also SchedulerEventListeners listen to the scheduler too.
+    abr_params: Dict[str, Any], optional
+        Keyword arguments of the ABR controller overriding the defaults, e.g. {"panic_buffer": 3}
+    sizes: Mapping[str, int], optional
+        The size of every segment in bytes, keyed by the URL. They are estimated from the bitrates if it's None.
+    abr: str, optional
+        The name of the ABR algorithm in ABR_CONTROLLERS. The algorithm of the config is used if it's None.
+
     Returns
     -------
     player: Player
         A MPEG-DASH Player
     """
     cfg = Config
-    buffer_manager: BufferManager = BufferManagerImpl()
+    listeners = listeners if listeners is not None else []
+    if sizes is None:
+        sizes = segment_sizes(mpd, cfg.simulation_init_segment_size)
+    clock = EventLoopClock()
+    buffer_manager: BufferManager = TimelineBufferManager(clock)
     event_logger = EventLogger()
-    mpd_provider: MPDProvider = MPDProviderImpl(DefaultMPDParser(), cfg.update_interval, DownloadManagerImpl([]))
-    bandwidth_meter = BandwidthMeterImpl(cfg.max_initial_bitrate, cfg.smoothing_factor, [])
-    download_manager = DownloadManagerImpl([bandwidth_meter])
-    abr_controller = DashABRController(2, 4, bandwidth_meter, buffer_manager)
-    scheduler: Scheduler = SchedulerImpl(5, cfg.update_interval, download_manager, bandwidth_meter, buffer_manager,
-                                         abr_controller, [event_logger])
+    mpd_provider: MPDProvider = StaticMPDProvider(mpd)
+    bandwidth_meter = build_bandwidth_meter(clock=clock)
+    abandonment_policy = AbandonmentPolicy(buffer_manager, cfg.abandonment_min_elapsed, clock) \
+        if cfg.abandon_slow_downloads else None
+    retry_policy = build_retry_policy() if cfg.retry_downloads else None
+    download_listeners = [bandwidth_meter] + ([abandonment_policy] if abandonment_policy is not None else [])
+    download_manager = SimulatedDownloadManager(download_listeners, trace, sizes, clock,
+                                                cfg.simulation_latency, cfg.simulation_progress_interval)
+    abr_controller = build_abr_controller(abr if abr is not None else cfg.abr_algorithm, bandwidth_meter,
+                                          buffer_manager, abr_params, clock)
+    scheduler_listeners = [event_logger] + [l for l in [abr_controller] + listeners
+                                            if isinstance(l, SchedulerEventListener)]
+    scheduler: Scheduler = SchedulerImpl(cfg.max_buffer_duration, cfg.update_interval, download_manager,
+                                         bandwidth_meter, buffer_manager, abr_controller, scheduler_listeners,
+                                         cfg.max_concurrent_downloads, None, retry_policy, abandonment_policy, clock,
+                                         cfg.max_buffer_bytes)
     return DASHPlayer(cfg.update_interval, min_rebuffer_duration=1, min_start_buffer_duration=2,
                       buffer_manager=buffer_manager, mpd_provider=mpd_provider, scheduler=scheduler,
-                      listeners=[event_logger])
+                      listeners=[event_logger] + listeners, clock=clock, event_driven=cfg.event_driven_player,
+                      buffer_sample_interval=cfg.buffer_sample_interval)
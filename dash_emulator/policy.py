@@ -0,0 +1,184 @@
+import logging
+import random
+from typing import Dict, Optional
+
+from dash_emulator.buffer import BufferManager
+from dash_emulator.clock import Clock, SystemClock
+from dash_emulator.download import DownloadEventListener, DownloadHandle
+from dash_emulator.models import AdaptationSet
+
+
+class RetryPolicy(object):
+    def __init__(self,
+                 timeout_max_ratio: float,
+                 max_retries: int,
+                 backoff_base: float,
+                 backoff_max: float,
+                 jitter: float = 0.5):
+        """
+        Decide the deadline of each segment download and how long to wait before retrying a failed one.
+
+        Parameters
+        ----------
+        timeout_max_ratio: float
+            The deadline of a segment is its duration multiplied by this ratio
+        max_retries: int
+            How many times a failed download is retried before giving up
+        backoff_base: float
+            The delay before the first retry in seconds. It doubles at every retry.
+        backoff_max: float
+            The maximum delay before a retry in seconds
+        jitter: float
+            The fraction of the delay which is randomized, between 0 and 1
+        """
+        self.timeout_max_ratio = timeout_max_ratio
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+
+    def deadline(self, duration: Optional[float]) -> Optional[float]:
+        """
+        Parameters
+        ----------
+        duration: float, optional
+            The duration of the segment in seconds
+
+        Returns
+        -------
+        deadline: float, optional
+            How long the download could take in seconds. None if there's no deadline.
+        """
+        if duration is None or self.timeout_max_ratio <= 0:
+            return None
+        return duration * self.timeout_max_ratio
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Parameters
+        ----------
+        attempt: int
+            The number of failed attempts so far, starting from 1
+
+        Returns
+        -------
+        delay: float
+            The delay before the next attempt in seconds
+        """
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        return delay * (1 - self.jitter * random.random())
+
+
+class _WatchedDownload(object):
+    def __init__(self, handle: DownloadHandle, adaptation_set: AdaptationSet, representation_id: int,
+                 duration: float):
+        self.handle = handle
+        self.adaptation_set = adaptation_set
+        self.representation_id = representation_id
+        self.duration = duration
+        self.start_time: Optional[float] = None
+        self.fallback_id: Optional[int] = None
+
+
+class AbandonmentPolicy(DownloadEventListener):
+    log = logging.getLogger("AbandonmentPolicy")
+
+    def __init__(self, buffer_manager: BufferManager, min_elapsed: float, clock: Optional[Clock] = None):
+        """
+        Abandon a running segment download when it would drain the buffer, and pick a lower representation instead.
+
+        It listens to the progress of the watched downloads. The download is abandoned if the projected time to finish
+        it is longer than the buffer level, and a whole segment of a lower representation could be downloaded sooner
+        at the measured throughput.
+
+        Parameters
+        ----------
+        buffer_manager: BufferManager
+            The buffer manager providing the buffer level
+        min_elapsed: float
+            A download is never abandoned before it has run for this long, in seconds, so the throughput is measured
+            on enough bytes
+        clock: Clock, optional
+            The clock to time the downloads with. The system clock is used if it's None.
+        """
+        self.buffer_manager = buffer_manager
+        self.min_elapsed = min_elapsed
+        self.clock = clock if clock is not None else SystemClock()
+
+        self._watched: Dict[str, _WatchedDownload] = dict()
+
+    def watch(self, handle: DownloadHandle, adaptation_set: AdaptationSet, representation_id: int,
+              duration: float) -> None:
+        """
+        Watch the progress of one media segment download
+
+        Parameters
+        ----------
+        handle: DownloadHandle
+            The handle of the download
+        adaptation_set: AdaptationSet
+            The adaptation set of the segment
+        representation_id: int
+            The representation of the segment
+        duration: float
+            The duration of the segment in seconds
+        """
+        self._watched[handle.url] = _WatchedDownload(handle, adaptation_set, representation_id, duration)
+
+    def unwatch(self, handle: DownloadHandle) -> Optional[int]:
+        """
+        Stop watching a download
+
+        Returns
+        -------
+        fallback_id: int, optional
+            The representation to download instead if the download was abandoned. None otherwise.
+        """
+        watched = self._watched.get(handle.url)
+        if watched is None or watched.handle is not handle:
+            return None
+        del self._watched[handle.url]
+        return watched.fallback_id
+
+    async def on_transfer_start(self, url) -> None:
+        watched = self._watched.get(url)
+        if watched is not None:
+            watched.start_time = self.clock.time()
+
+    async def on_bytes_transferred(self, length: int, url: str, position: int, size: int) -> None:
+        watched = self._watched.get(url)
+        if watched is None or watched.start_time is None or watched.fallback_id is not None:
+            return
+        elapsed = self.clock.time() - watched.start_time
+        if elapsed < self.min_elapsed or position <= 0:
+            return
+
+        adaptation_set = watched.adaptation_set
+        representation = adaptation_set.representations[watched.representation_id]
+        if size is None:
+            size = representation.bandwidth * watched.duration / 8
+        rate = position / elapsed
+        remaining_time = max(size - position, 0) / rate
+        buffer_level = self.buffer_manager.buffer_level
+        if remaining_time <= buffer_level:
+            return
+
+        # Pick the highest lower representation which could be downloaded in the buffer, or the lowest one
+        ladder = adaptation_set.ladder
+        highest_lower = ladder.below(representation.bandwidth)
+        if highest_lower < 0:
+            return
+        position = min(ladder.at_most(buffer_level * rate * 8 / watched.duration), highest_lower)
+        fallback = adaptation_set.representations[ladder.ids[max(position, 0)]]
+        if fallback.bandwidth * watched.duration / 8 / rate >= remaining_time:
+            return
+
+        self.log.info("Abandon %s, remaining time %.3fs, buffer level %.3fs" % (url, remaining_time, buffer_level))
+        watched.fallback_id = fallback.id
+        watched.handle.cancel()
+
+    async def on_transfer_end(self, size: int, url: str) -> None:
+        pass
+
+    async def on_transfer_canceled(self, url: str, position: int, size: int) -> None:
+        pass
@@ -0,0 +1,129 @@
+from typing import Dict, Optional
+
+from dash_emulator.clock import Clock, SystemClock
+from dash_emulator.models import State, MPD
+from dash_emulator.player import PlayerEventListener
+from dash_emulator.scheduler import SchedulerEventListener
+
+
+class QoECollector(PlayerEventListener, SchedulerEventListener):
+    def __init__(self, mpd: MPD, clock: Optional[Clock] = None):
+        """
+        Collect the QoE metrics of one session. Add it to the listeners of both the player and the scheduler.
+
+        Parameters
+        ----------
+        mpd: MPD
+            The MPD object being played, to look up the bitrates of the selections
+        clock: Clock, optional
+            The clock of the player. The system clock is used if it's None.
+        """
+        self.mpd = mpd
+        self.clock = clock if clock is not None else SystemClock()
+
+        self.startup_delay: Optional[float] = None
+        """
+        The time from the start of the session to the start of the playback in seconds
+        """
+
+        self.rebuffer_count = 0
+        """
+        The number of stalls after the playback started
+        """
+
+        self.rebuffer_duration = 0.0
+        """
+        The total duration of the stalls in seconds
+        """
+
+        self.switches = 0
+        """
+        The number of representation switches of the video adaptation sets
+        """
+
+        self.session_duration: Optional[float] = None
+        """
+        The time from the start of the session to the end of the playback in seconds
+        """
+
+        self._start_time: Optional[float] = None
+        self._stall_start_time: Optional[float] = None
+        self._selections: Dict[int, int] = dict()
+        self._bitrates: Dict[int, int] = dict()
+
+    @property
+    def average_bitrate(self) -> float:
+        """
+        The average bitrate of the video segments in bps
+        """
+        if len(self._bitrates) == 0:
+            return 0.0
+        return sum(self._bitrates.values()) / len(self._bitrates)
+
+    def result(self) -> Dict[str, float]:
+        """
+        Returns
+        -------
+        result: Dict[str, float]
+            All the metrics, keyed by the name
+        """
+        return {
+            "startup_delay": self.startup_delay,
+            "rebuffer_count": self.rebuffer_count,
+            "rebuffer_duration": self.rebuffer_duration,
+            "average_bitrate": self.average_bitrate,
+            "switches": self.switches,
+            "session_duration": self.session_duration
+        }
+
+    def _video_bitrate(self, selections: Dict[int, int]) -> int:
+        bitrate = 0
+        for adaptation_set_id, representation_id in selections.items():
+            adaptation_set = self.mpd.adaptation_sets[adaptation_set_id]
+            if adaptation_set.content_type == "video":
+                bitrate += adaptation_set.representations[representation_id].bandwidth
+        return bitrate
+
+    async def on_state_change(self, position: float, old_state: State, new_state: State):
+        now = self.clock.time()
+        if self._start_time is None:
+            self._start_time = now
+        if new_state == State.READY:
+            if self.startup_delay is None:
+                self.startup_delay = now - self._start_time
+            elif self._stall_start_time is not None:
+                self.rebuffer_duration += now - self._stall_start_time
+            self._stall_start_time = None
+        elif new_state == State.BUFFERING and self.startup_delay is not None:
+            self.rebuffer_count += 1
+            self._stall_start_time = now
+        elif new_state == State.END:
+            self.session_duration = now - self._start_time
+
+    async def on_buffer_level_change(self, buffer_level):
+        pass
+
+    async def on_segment_download_start(self, index, selections):
+        if self._start_time is None:
+            self._start_time = self.clock.time()
+        for adaptation_set_id, representation_id in selections.items():
+            if self.mpd.adaptation_sets[adaptation_set_id].content_type != "video":
+                continue
+            last = self._selections.get(adaptation_set_id)
+            if last is not None and last != representation_id:
+                self.switches += 1
+            self._selections[adaptation_set_id] = representation_id
+        self._bitrates[index] = self._video_bitrate(selections)
+
+    async def on_segment_download_complete(self, index):
+        pass
+
+    async def on_segment_abandoned(self, index, adaptation_set_id, representation_id, fallback_representation_id):
+        adaptation_set = self.mpd.adaptation_sets[adaptation_set_id]
+        if adaptation_set.content_type != "video":
+            return
+        representations = adaptation_set.representations
+        self._bitrates[index] += representations[fallback_representation_id].bandwidth - \
+                                 representations[representation_id].bandwidth
+        self._selections[adaptation_set_id] = fallback_representation_id
+        self.switches += 1
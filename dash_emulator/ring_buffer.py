@@ -0,0 +1,76 @@
+from array import array
+from typing import Iterator, Optional
+
+
+class RingBuffer(object):
+    def __init__(self, capacity: int, typecode: str = 'd'):
+        """
+        A fixed-size ring buffer of numbers, backed by an array allocated once. Appending to a full ring buffer
+        overwrites the oldest value.
+
+        Parameters
+        ----------
+        capacity: int
+            The max number of values
+        typecode: str
+            The type code of the array, e.g. 'd' for floats or 'q' for integers
+        """
+        if capacity <= 0:
+            raise ValueError("The capacity of a ring buffer should be positive, not %d" % capacity)
+        self.capacity = capacity
+        """
+        The max number of values
+        """
+
+        self._values = array(typecode, [0]) * capacity
+        self._start = 0
+        self._size = 0
+
+    def append(self, value) -> Optional[float]:
+        """
+        Append a value
+
+        Parameters
+        ----------
+        value
+            The value to append
+
+        Returns
+        -------
+        evicted
+            The oldest value if the ring buffer was full and it is overwritten, None otherwise
+        """
+        if self._size < self.capacity:
+            self._values[(self._start + self._size) % self.capacity] = value
+            self._size += 1
+            return None
+        evicted = self._values[self._start]
+        self._values[self._start] = value
+        self._start = (self._start + 1) % self.capacity
+        return evicted
+
+    def clear(self) -> None:
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, index: int):
+        """
+        The index-th oldest value. Negative indexes count from the newest one.
+        """
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("Ring buffer index out of range")
+        return self._values[(self._start + index) % self.capacity]
+
+    def __iter__(self) -> Iterator:
+        """
+        Iterate over the values from the oldest one
+        """
+        end = self._start + self._size
+        if end <= self.capacity:
+            return iter(self._values[self._start:end])
+        return iter(self._values[self._start:] + self._values[:end - self.capacity])
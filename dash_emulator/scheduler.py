@@ -1,4 +1,5 @@
 import asyncio
+import logging
 from abc import abstractmethod, ABC
 from asyncio import Task
 from typing import Optional, Dict, Set, List
@@ -6,8 +7,11 @@ from typing import Optional, Dict, Set, List
 from dash_emulator.abr import ABRController
 from dash_emulator.bandwidth import BandwidthMeter
 from dash_emulator.buffer import BufferManager
-from dash_emulator.download import DownloadManager
+from dash_emulator.clock import Clock, SystemClock
+from dash_emulator.download import DownloadManager, DownloadError
 from dash_emulator.models import AdaptationSet
+from dash_emulator.policy import RetryPolicy, AbandonmentPolicy
+from dash_emulator.storage import SegmentStorage
 
 
 class SchedulerEventListener(ABC):
@@ -38,6 +42,64 @@ class SchedulerEventListener(ABC):
         """
         pass
 
+    async def on_segment_abandoned(self, index, adaptation_set_id, representation_id, fallback_representation_id):
+        """
+        Callback when one segment download is abandoned in favor of a lower representation
+
+        Parameters
+        ----------
+        index: int
+            The index of the downloading segment
+        adaptation_set_id: int
+            The adaptation set ID of the abandoned segment
+        representation_id: int
+            The representation ID of the abandoned segment
+        fallback_representation_id: int
+            The representation ID downloaded instead
+        """
+        pass
+
+    async def on_end(self):
+        """
+        Callback when all the segments are downloaded
+        """
+        pass
+
+
+class SegmentRequest(object):
+    def __init__(self, url: str, adaptation_set_id: int, representation_id: int, index: Optional[int],
+                 duration: Optional[float] = None, path: Optional[str] = None):
+        self.url = url
+        """
+        The URL of the segment
+        """
+
+        self.adaptation_set_id = adaptation_set_id
+        """
+        The adaptation set ID
+        """
+
+        self.representation_id = representation_id
+        """
+        The representation ID
+        """
+
+        self.index = index
+        """
+        The segment index. None for initialization segments.
+        """
+
+        self.duration = duration
+        """
+        The duration of the media segment in seconds. For initialization segments, the duration of the media segment
+        downloaded with it.
+        """
+
+        self.path = path
+        """
+        The path to save the segment to. None if it is not saved.
+        """
+
 
 class Scheduler(ABC):
     @abstractmethod
@@ -65,8 +127,29 @@ class Scheduler(ABC):
     def is_end(self):
         pass
 
+    @property
+    def error(self) -> Optional[Exception]:
+        """
+        The error which ended the stream early, None if the scheduler hasn't failed
+        """
+        return None
+
+    @abstractmethod
+    def add_listener(self, listener: SchedulerEventListener):
+        """
+        Add a listener to the scheduler
+
+        Parameters
+        ----------
+        listener
+            An instance of SchedulerEventListener
+        """
+        pass
+
 
 class SchedulerImpl(Scheduler):
+    log = logging.getLogger("SchedulerImpl")
+
     def __init__(self,
                  max_buffer_duration: float,
                  update_interval: float,
@@ -74,7 +157,13 @@ class SchedulerImpl(Scheduler):
                  bandwidth_meter: BandwidthMeter,
                  buffer_manager: BufferManager,
                  abr_controller: ABRController,
-                 listeners: List[SchedulerEventListener]):
+                 listeners: List[SchedulerEventListener],
+                 max_concurrent_downloads: int = 1,
+                 segment_storage: Optional[SegmentStorage] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 abandonment_policy: Optional[AbandonmentPolicy] = None,
+                 clock: Optional[Clock] = None,
+                 max_buffer_bytes: Optional[int] = None):
         """
         Parameters
         ----------
@@ -93,6 +182,22 @@ class SchedulerImpl(Scheduler):
             ABR Controller to update the representation selections.
         listeners
             A list of SchedulerEventHandler
+        max_concurrent_downloads
+            The maximum number of requests running at the same time for one segment index.
+            If it is 1, the initialization and media segments of all adaptation sets are downloaded one by one.
+        segment_storage
+            If it's not None, the downloaded segments are saved to the paths it decides.
+        retry_policy
+            If it's not None, every download gets a deadline, and failed downloads are retried with backoff.
+        abandonment_policy
+            If it's not None, media segment downloads which would drain the buffer are abandoned and replaced by a
+            lower representation. It has to be a listener of the download manager.
+        clock
+            The clock to sleep on. The system clock is used if it's None.
+        max_buffer_bytes
+            If it's not None, the maximum bytes of the buffer.
+            The scheduler won't start new segment transmissions which would bring the buffer over it, unless the buffer
+            is empty.
         """
 
         self.max_buffer_duration = max_buffer_duration
@@ -103,6 +208,12 @@ class SchedulerImpl(Scheduler):
         self.buffer_manager = buffer_manager
         self.abr_controller = abr_controller
         self.listeners = listeners
+        self.max_concurrent_downloads = max_concurrent_downloads
+        self.segment_storage = segment_storage
+        self.retry_policy = retry_policy
+        self.abandonment_policy = abandonment_policy
+        self.clock = clock if clock is not None else SystemClock()
+        self.max_buffer_bytes = max_buffer_bytes
 
         self.adaptation_sets: Optional[Dict[int, AdaptationSet]] = None
         self.started = False
@@ -110,39 +221,236 @@ class SchedulerImpl(Scheduler):
         self._task: Optional[Task] = None
         self._index = 0
         self._representation_initialized: Set[str] = set()
+        # The start time of the next segment of every adaptation set, in the presentation
+        self._segment_starts: Dict[int, float] = dict()
+        # The bytes received for the media segments of the current index, for every adaptation set
+        self._segment_bytes: Dict[int, int] = dict()
 
         self._end = False
+        self._error: Optional[Exception] = None
 
     async def loop(self):
+        try:
+            await self._download_segments()
+        except DownloadError as e:
+            # The player would wait for the next segment forever, end the stream where it is instead
+            self.log.error("Stop downloading segments: %s" % e)
+            self._error = e
+            await self._end_stream()
+        except Exception as e:
+            self.log.exception("Stop downloading segments on an unexpected error")
+            self._error = e
+            await self._end_stream()
+
+    async def _end_stream(self):
+        self._end = True
+        for listener in self.listeners:
+            await listener.on_end()
+
+    async def _download_segments(self):
         while True:
             # Check buffer level
-            if self.buffer_manager.buffer_level > self.max_buffer_duration:
-                await asyncio.sleep(self.update_interval)
+            buffer_level = self.buffer_manager.buffer_level
+            if buffer_level > self.max_buffer_duration:
+                # The buffer takes at least this long to drain below the max
+                await self.clock.sleep(max(buffer_level - self.max_buffer_duration, self.update_interval))
                 continue
 
             # Download one segment from each adaptation set
             selections = self.abr_controller.update_selection(self.adaptation_sets)
-            for listener in self.listeners:
-                await listener.on_segment_download_start(self._index, selections)
-            duration = 0
+            requests: List[SegmentRequest] = []
+            media_requests: Dict[int, SegmentRequest] = dict()
+            expected_bytes = 0
             for adaptation_set_id, selection in selections.items():
                 adaptation_set = self.adaptation_sets[adaptation_set_id]
                 representation = adaptation_set.representations.get(selection)
-                representation_str = "%d:%d" % (adaptation_set_id, representation.id)
-                if representation_str not in self._representation_initialized:
-                    await self.download_manager.download(representation.initialization)
-                    self._representation_initialized.add(representation_str)
                 try:
                     segment = representation.segments[self._index]
                 except IndexError:
-                    self._end = True
+                    await self._end_stream()
                     return
-                await self.download_manager.download(segment.url)
-                duration = segment.duration
+                representation_str = "%d:%d" % (adaptation_set_id, representation.id)
+                if representation_str not in self._representation_initialized:
+                    requests.append(SegmentRequest(representation.initialization, adaptation_set_id,
+                                                   representation.id, None, segment.duration))
+                    self._representation_initialized.add(representation_str)
+                media_request = SegmentRequest(segment.url, adaptation_set_id, representation.id, self._index,
+                                               segment.duration)
+                requests.append(media_request)
+                media_requests[adaptation_set_id] = media_request
+                if segment.size is not None:
+                    expected_bytes += segment.size
+                else:
+                    expected_bytes += int(representation.bandwidth * segment.duration / 8)
+            if self.max_buffer_bytes is not None:
+                buffer_bytes = self.buffer_manager.buffer_bytes
+                if buffer_bytes > 0 and buffer_bytes + expected_bytes > self.max_buffer_bytes:
+                    # Wait for the next played back segment to be evicted, and select the representations again
+                    time_to_eviction = self.buffer_manager.time_to_eviction
+                    await self.clock.sleep(max(time_to_eviction if time_to_eviction is not None else 0,
+                                               self.update_interval))
+                    continue
+            for listener in self.listeners:
+                await listener.on_segment_download_start(self._index, selections)
+            self._segment_bytes = dict()
+            failed = await self.download_all(requests)
+            failed_ids = set()
+            for request in failed:
+                if request.index is None:
+                    # Download the initialization segment again with the next media segment of the representation
+                    self._representation_initialized.discard("%d:%d" % (request.adaptation_set_id,
+                                                                        request.representation_id))
+                failed_ids.add(request.adaptation_set_id)
+            for adaptation_set_id in list(failed_ids):
+                media_request = media_requests[adaptation_set_id]
+                lowest_id = self.adaptation_sets[adaptation_set_id].ladder.ids[0]
+                if lowest_id != media_request.representation_id and await self.fall_back(media_request, lowest_id):
+                    failed_ids.discard(adaptation_set_id)
+            for adaptation_set_id, media_request in media_requests.items():
+                start = self._segment_starts.get(adaptation_set_id, 0.0)
+                if adaptation_set_id in failed_ids:
+                    # Nothing to play back for this segment, the playback stalls when it reaches it
+                    self.log.error("Skip segment %d of adaptation set %d" % (self._index, adaptation_set_id))
+                else:
+                    self.buffer_manager.enqueue_segment(adaptation_set_id, start, media_request.duration,
+                                                        self._segment_bytes.get(adaptation_set_id, 0))
+                self._segment_starts[adaptation_set_id] = start + media_request.duration
             for listener in self.listeners:
                 await listener.on_segment_download_complete(self._index)
             self._index += 1
-            self.buffer_manager.enqueue_buffer(duration)
+
+    async def download_all(self, requests: List[SegmentRequest]) -> List[SegmentRequest]:
+        """
+        Download all the segments, at most max_concurrent_downloads of them at the same time
+
+        Parameters
+        ----------
+        requests
+            The segments to download
+
+        Returns
+        -------
+        failed: List[SegmentRequest]
+            The requests which couldn't be downloaded
+        """
+        if self.max_concurrent_downloads <= 1:
+            failed = []
+            for request in requests:
+                if not await self.download(request):
+                    failed.append(request)
+            return failed
+
+        semaphore = asyncio.Semaphore(self.max_concurrent_downloads)
+
+        async def download(request):
+            async with semaphore:
+                return await self.download(request)
+
+        results = await asyncio.gather(*[download(request) for request in requests])
+        return [request for request, downloaded in zip(requests, results) if not downloaded]
+
+    async def download(self, request: SegmentRequest) -> bool:
+        """
+        Download one segment, retry it if it fails and replace it if it is abandoned
+
+        Returns
+        -------
+        downloaded: bool
+            False if the segment, or the segment replacing it, couldn't be downloaded
+        """
+        if self.segment_storage is not None:
+            if request.index is None:
+                request.path = self.segment_storage.init_path(request.adaptation_set_id, request.representation_id,
+                                                              request.url)
+            else:
+                request.path = self.segment_storage.segment_path(request.adaptation_set_id,
+                                                                 request.representation_id, request.index,
+                                                                 request.url)
+
+        attempt = 0
+        while True:
+            fallback_id = None
+            handle = self.download_manager.start_download(request.url, path=request.path)
+            if self.abandonment_policy is not None and request.index is not None:
+                self.abandonment_policy.watch(handle, self.adaptation_sets[request.adaptation_set_id],
+                                              request.representation_id, request.duration)
+            try:
+                if self.retry_policy is None:
+                    await handle
+                else:
+                    deadline = self.retry_policy.deadline(request.duration)
+                    await asyncio.wait_for(asyncio.shield(handle.wait()), deadline)
+            except asyncio.TimeoutError:
+                self.log.warning("Download timeout: %s" % request.url)
+                # The transfer could be stuck waiting for bytes, don't wait for the next chunk to stop it
+                handle.abort()
+                await asyncio.gather(handle.wait(), return_exceptions=True)
+            except DownloadError as e:
+                if self.retry_policy is None:
+                    raise
+                self.log.warning(str(e))
+            else:
+                if not handle.canceled:
+                    break
+            finally:
+                if self.abandonment_policy is not None:
+                    fallback_id = self.abandonment_policy.unwatch(handle)
+
+            if fallback_id is not None:
+                return await self.fall_back(request, fallback_id)
+            if self.retry_policy is None:
+                # Canceled by someone else
+                return False
+
+            attempt += 1
+            if attempt > self.retry_policy.max_retries:
+                self.log.error("Give up downloading %s after %d attempts" % (request.url, attempt))
+                return False
+            await self.clock.sleep(self.retry_policy.backoff(attempt))
+
+        if request.index is not None:
+            self._segment_bytes[request.adaptation_set_id] = (self._segment_bytes.get(request.adaptation_set_id, 0)
+                                                              + handle.position)
+        if request.path is not None:
+            await self.segment_storage.record(request.path, request.url, request.adaptation_set_id,
+                                              request.representation_id, request.index)
+        return True
+
+    async def fall_back(self, request: SegmentRequest, fallback_id: int) -> bool:
+        """
+        Download the segment of a lower representation instead of an abandoned or failed one
+
+        Parameters
+        ----------
+        request
+            The abandoned or failed request
+        fallback_id
+            The ID of the representation to download instead
+
+        Returns
+        -------
+        downloaded: bool
+            False if the segment of the lower representation couldn't be downloaded either
+        """
+        for listener in self.listeners:
+            await listener.on_segment_abandoned(request.index, request.adaptation_set_id, request.representation_id,
+                                                fallback_id)
+        representation = self.adaptation_sets[request.adaptation_set_id].representations[fallback_id]
+        try:
+            segment = representation.segments[request.index]
+        except IndexError:
+            self.log.error("Representation %d of adaptation set %d has no segment %d to fall back to" % (
+                fallback_id, request.adaptation_set_id, request.index))
+            return False
+        representation_str = "%d:%d" % (request.adaptation_set_id, representation.id)
+        if representation_str not in self._representation_initialized:
+            self._representation_initialized.add(representation_str)
+            if not await self.download(SegmentRequest(representation.initialization, request.adaptation_set_id,
+                                                      representation.id, None, request.duration)):
+                self._representation_initialized.discard(representation_str)
+                return False
+        return await self.download(SegmentRequest(segment.url, request.adaptation_set_id, representation.id,
+                                                  request.index, segment.duration))
 
     def start(self, adaptation_sets: Dict[int, AdaptationSet]):
         self.adaptation_sets = adaptation_sets
@@ -155,7 +463,17 @@ class SchedulerImpl(Scheduler):
         await self.download_manager.close()
         if self._task is not None:
             self._task.cancel()
+        if self.segment_storage is not None:
+            await self.segment_storage.close()
 
     @property
     def is_end(self):
         return self._end
+
+    @property
+    def error(self) -> Optional[Exception]:
+        return self._error
+
+    def add_listener(self, listener: SchedulerEventListener):
+        if listener not in self.listeners:
+            self.listeners.append(listener)
@@ -0,0 +1,186 @@
+import logging
+from types import SimpleNamespace
+from typing import Optional
+
+import aiohttp
+from aiohttp.tcp_helpers import tcp_nodelay
+
+
+class SessionPoolMetrics(object):
+    def __init__(self):
+        self.requests = 0
+        """
+        The number of requests sent through the pool
+        """
+
+        self.new_connections = 0
+        """
+        The number of connections established
+        """
+
+        self.reused_connections = 0
+        """
+        The number of requests served by a kept-alive connection
+        """
+
+        self.queued_requests = 0
+        """
+        The number of requests waiting for a free connection right now
+        """
+
+        self.total_queued_requests = 0
+        """
+        The number of requests which had to wait for a free connection
+        """
+
+        self.dns_cache_hits = 0
+        """
+        The number of DNS lookups answered by the cache
+        """
+
+        self.dns_cache_misses = 0
+        """
+        The number of DNS lookups sent to the resolver
+        """
+
+    @property
+    def reuse_ratio(self) -> float:
+        """
+        The ratio of connections reused among all connections acquired
+        """
+        total = self.new_connections + self.reused_connections
+        return self.reused_connections / total if total > 0 else 0.0
+
+    def __repr__(self):
+        return "SessionPoolMetrics(requests=%d, new=%d, reused=%d, reuse_ratio=%.3f, queued=%d, total_queued=%d)" % (
+            self.requests, self.new_connections, self.reused_connections, self.reuse_ratio, self.queued_requests,
+            self.total_queued_requests)
+
+
+class _TCPConnector(aiohttp.TCPConnector):
+    def __init__(self, nodelay: bool, **kwargs):
+        """
+        A connector setting TCP_NODELAY on every connection it creates, before the first request is written to it
+        """
+        super().__init__(**kwargs)
+        self.nodelay = nodelay
+
+    async def _create_connection(self, req, traces, timeout):
+        protocol = await super()._create_connection(req, traces, timeout)
+        if protocol.transport is not None:
+            tcp_nodelay(protocol.transport, self.nodelay)
+        return protocol
+
+
+class SessionPool(object):
+    log = logging.getLogger("SessionPool")
+
+    def __init__(self,
+                 limit: int = 100,
+                 limit_per_host: int = 0,
+                 keepalive_timeout: float = 15,
+                 dns_cache_ttl: Optional[int] = 10,
+                 tcp_nodelay: bool = True):
+        """
+        A pool of HTTP connections which could be shared by many download managers, even of different players.
+
+        Each user calls acquire() once and release() when it's done. The underlying session gets closed when the
+        last user releases it, and it is created again if someone uses the pool after that.
+
+        Parameters
+        ----------
+        limit: int
+            The maximum number of simultaneous connections. 0 means no limit.
+        limit_per_host: int
+            The maximum number of simultaneous connections to one host. 0 means no limit.
+        keepalive_timeout: float
+            How long an idle connection is kept alive for reuse, in seconds
+        dns_cache_ttl: int, optional
+            How long a DNS record is cached, in seconds. None means the records are cached forever.
+        tcp_nodelay: bool
+            Set TCP_NODELAY on the sockets
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.tcp_nodelay = tcp_nodelay
+
+        self.metrics = SessionPoolMetrics()
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._users = 0
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """
+        The shared client session. It is created on first use.
+        """
+        if self._session is None or self._session.closed:
+            connector = _TCPConnector(self.tcp_nodelay,
+                                      limit=self.limit,
+                                      limit_per_host=self.limit_per_host,
+                                      keepalive_timeout=self.keepalive_timeout,
+                                      use_dns_cache=True,
+                                      ttl_dns_cache=self.dns_cache_ttl)
+            self._session = aiohttp.ClientSession(connector=connector, trace_configs=[self._build_trace_config()])
+        return self._session
+
+    def acquire(self) -> 'SessionPool':
+        """
+        Register a user of the pool
+        """
+        self._users += 1
+        return self
+
+    async def release(self) -> None:
+        """
+        Unregister a user of the pool. The session gets closed if nobody uses it anymore.
+        """
+        self._users = max(self._users - 1, 0)
+        if self._users == 0:
+            await self.close()
+
+    async def close(self) -> None:
+        """
+        Close the session and all the kept-alive connections
+        """
+        if self._session is not None:
+            self.log.info(str(self.metrics))
+            await self._session.close()
+            self._session = None
+
+    def _build_trace_config(self) -> aiohttp.TraceConfig:
+        metrics = self.metrics
+
+        async def on_request_start(session, context: SimpleNamespace, params):
+            metrics.requests += 1
+
+        async def on_connection_queued_start(session, context: SimpleNamespace, params):
+            metrics.queued_requests += 1
+            metrics.total_queued_requests += 1
+
+        async def on_connection_queued_end(session, context: SimpleNamespace, params):
+            metrics.queued_requests -= 1
+
+        async def on_connection_create_end(session, context: SimpleNamespace, params):
+            metrics.new_connections += 1
+
+        async def on_connection_reuseconn(session, context: SimpleNamespace, params):
+            metrics.reused_connections += 1
+
+        async def on_dns_cache_hit(session, context: SimpleNamespace, params):
+            metrics.dns_cache_hits += 1
+
+        async def on_dns_cache_miss(session, context: SimpleNamespace, params):
+            metrics.dns_cache_misses += 1
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_queued_start.append(on_connection_queued_start)
+        trace_config.on_connection_queued_end.append(on_connection_queued_end)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace_config
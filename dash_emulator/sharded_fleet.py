@@ -0,0 +1,388 @@
+import bisect
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import time
+from multiprocessing.sharedctypes import RawArray
+from typing import Dict, List, Optional, Any, Callable
+
+from dash_emulator.clock import Clock, SystemClock
+from dash_emulator.config import Config
+from dash_emulator.download import DownloadEventListener
+from dash_emulator.event_loop import run_in_event_loop, resolve_event_loop
+from dash_emulator.fleet import Fleet, QoEAggregator
+from dash_emulator.models import MPD, State
+from dash_emulator.player import PlayerEventListener
+from dash_emulator.scheduler import SchedulerEventListener
+
+
+class FleetCounters(object):
+    # The columns of a row
+    STARTED = 0
+    FINISHED = 1
+    FAILED = 2
+    BYTES = 3
+    STALLS = 4
+    STALLED = 5
+    STALL_TIME = 6
+    PLAY_TIME = 7
+    SWITCHES = 8
+    # The first column of the bitrate histogram
+    BITRATE_BINS = 9
+
+    def __init__(self, num_rows: int, bitrate_bins: List[int]):
+        """
+        Counters of a fleet in shared memory. Every worker process owns one row and is the only one writing to it,
+        so the rows need no lock, and the parent process reads all of them at any time without any message passing.
+
+        Parameters
+        ----------
+        num_rows: int
+            The number of rows, one per worker
+        bitrate_bins: List[int]
+            The upper bounds of the bins of the bitrate histogram in bps, in ascending order.
+            One more bin holds the bitrates above the last bound.
+        """
+        self.num_rows = num_rows
+        self.bitrate_bins = list(bitrate_bins)
+        self.num_columns = self.BITRATE_BINS + len(self.bitrate_bins) + 1
+        self._array = RawArray('d', num_rows * self.num_columns)
+
+    def add(self, row: int, column: int, value: float) -> None:
+        """
+        Add a value to one counter of a row. Only the owner of the row should call it.
+        """
+        self._array[row * self.num_columns + column] += value
+
+    def bitrate_column(self, bitrate: float) -> int:
+        """
+        Returns
+        -------
+        column: int
+            The column of the histogram bin the bitrate falls in
+        """
+        return self.BITRATE_BINS + bisect.bisect_left(self.bitrate_bins, bitrate)
+
+    def totals(self) -> List[float]:
+        """
+        Returns
+        -------
+        totals: List[float]
+            The sum of every column over all the rows
+        """
+        totals = [0.0] * self.num_columns
+        for row in range(self.num_rows):
+            values = self._array[row * self.num_columns:(row + 1) * self.num_columns]
+            for column, value in enumerate(values):
+                totals[column] += value
+        return totals
+
+
+class SharedCountersListener(PlayerEventListener, SchedulerEventListener, DownloadEventListener):
+    def __init__(self, counters: FleetCounters, row: int, mpd: MPD, clock: Optional[Clock] = None):
+        """
+        Publish the events of one player into a row of the fleet counters
+
+        Parameters
+        ----------
+        counters: FleetCounters
+            The counters of the fleet
+        row: int
+            The row of the worker running the player
+        mpd: MPD
+            The MPD object being played, to look up the bitrates of the selections
+        clock: Clock, optional
+            The clock of the player. The system clock is used if it's None.
+        """
+        self.counters = counters
+        self.row = row
+        self.mpd = mpd
+        self.clock = clock if clock is not None else SystemClock()
+
+        self._state = State.IDLE
+        self._last_time = self.clock.time()
+        self._playback_started = False
+        self._stalled = False
+        self._selections: Dict[int, int] = dict()
+        self._bitrate_column: Optional[int] = None
+
+        self.counters.add(self.row, FleetCounters.STARTED, 1)
+
+    def _accumulate_time(self) -> None:
+        now = self.clock.time()
+        elapsed = now - self._last_time
+        self._last_time = now
+        if self._state == State.READY:
+            self.counters.add(self.row, FleetCounters.PLAY_TIME, elapsed)
+        elif self._stalled:
+            self.counters.add(self.row, FleetCounters.STALL_TIME, elapsed)
+
+    def _update_bitrate(self) -> None:
+        bitrate = 0
+        for adaptation_set_id, representation_id in self._selections.items():
+            bitrate += self.mpd.adaptation_sets[adaptation_set_id].representations[representation_id].bandwidth
+        column = self.counters.bitrate_column(bitrate)
+        if column != self._bitrate_column:
+            if self._bitrate_column is not None:
+                self.counters.add(self.row, self._bitrate_column, -1)
+            self.counters.add(self.row, column, 1)
+            self._bitrate_column = column
+
+    def close(self) -> None:
+        """
+        Take the player out of the live counters once it ends or fails
+        """
+        self._accumulate_time()
+        self._state = State.END
+        if self._stalled:
+            self._stalled = False
+            self.counters.add(self.row, FleetCounters.STALLED, -1)
+        if self._bitrate_column is not None:
+            self.counters.add(self.row, self._bitrate_column, -1)
+            self._bitrate_column = None
+
+    async def on_state_change(self, position: float, old_state: State, new_state: State):
+        self._accumulate_time()
+        if new_state == State.READY:
+            self._playback_started = True
+            if self._stalled:
+                self._stalled = False
+                self.counters.add(self.row, FleetCounters.STALLED, -1)
+        elif new_state == State.BUFFERING and self._playback_started:
+            self._stalled = True
+            self.counters.add(self.row, FleetCounters.STALLS, 1)
+            self.counters.add(self.row, FleetCounters.STALLED, 1)
+        self._state = new_state
+
+    async def on_buffer_level_change(self, buffer_level):
+        self._accumulate_time()
+
+    async def on_segment_download_start(self, index, selections):
+        for adaptation_set_id, representation_id in selections.items():
+            if self.mpd.adaptation_sets[adaptation_set_id].content_type != "video":
+                continue
+            last = self._selections.get(adaptation_set_id)
+            if last is not None and last != representation_id:
+                self.counters.add(self.row, FleetCounters.SWITCHES, 1)
+            self._selections[adaptation_set_id] = representation_id
+        self._update_bitrate()
+
+    async def on_segment_download_complete(self, index):
+        pass
+
+    async def on_segment_abandoned(self, index, adaptation_set_id, representation_id, fallback_representation_id):
+        if self.mpd.adaptation_sets[adaptation_set_id].content_type != "video":
+            return
+        self._selections[adaptation_set_id] = fallback_representation_id
+        self.counters.add(self.row, FleetCounters.SWITCHES, 1)
+        self._update_bitrate()
+
+    async def on_bytes_transferred(self, length: int, url: str, position: int, size: int) -> None:
+        self.counters.add(self.row, FleetCounters.BYTES, length)
+
+    async def on_transfer_end(self, size: int, url: str) -> None:
+        pass
+
+    async def on_transfer_start(self, url) -> None:
+        pass
+
+    async def on_transfer_canceled(self, url: str, position: int, size: int) -> None:
+        pass
+
+
+class ShardReporter(QoEAggregator):
+    def __init__(self, counters: FleetCounters, row: int):
+        """
+        The QoE sink of the fleet of one worker. It builds the SharedCountersListener of every player, and counts
+        the players which finish or fail into the row of the worker.
+
+        Parameters
+        ----------
+        counters: FleetCounters
+            The counters of the fleet
+        row: int
+            The row of the worker
+        """
+        super().__init__()
+        self.counters = counters
+        self.row = row
+        self._listeners: Dict[int, SharedCountersListener] = dict()
+
+    def build_listener(self, client_id: int, mpd: MPD) -> SharedCountersListener:
+        listener = SharedCountersListener(self.counters, self.row, mpd)
+        self._listeners[client_id] = listener
+        return listener
+
+    def _close(self, client_id: int) -> None:
+        listener = self._listeners.pop(client_id, None)
+        if listener is not None:
+            listener.close()
+
+    def add(self, client_id: int, result: Dict[str, Any]) -> None:
+        super().add(client_id, result)
+        self._close(client_id)
+        self.counters.add(self.row, FleetCounters.FINISHED, 1)
+
+    def add_error(self, client_id: int, error: str) -> None:
+        super().add_error(client_id, error)
+        self._close(client_id)
+        self.counters.add(self.row, FleetCounters.FAILED, 1)
+
+
+def _run_shard(mpd_url: str, counters: FleetCounters, row: int, num_clients: int, stagger: float, delay: float,
+               log_level: int, event_loop: str) -> None:
+    logging.basicConfig(level=log_level)
+    logging.getLogger().setLevel(log_level)
+    if delay > 0:
+        time.sleep(delay)
+    reporter = ShardReporter(counters, row)
+    fleet = Fleet(num_clients, stagger, reporter, listener_factory=reporter.build_listener)
+    run_in_event_loop(fleet.run(mpd_url), event_loop)
+
+
+class ShardedFleet(object):
+    log = logging.getLogger("ShardedFleet")
+
+    def __init__(self,
+                 num_clients: int,
+                 processes: Optional[int] = None,
+                 stagger: float = 0,
+                 report_interval: float = 1,
+                 bitrate_bins: Optional[List[int]] = None,
+                 worker_log_level: int = logging.WARNING,
+                 progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 event_loop: Optional[str] = None):
+        """
+        Run a fleet of players sharded over many worker processes, one event loop per worker.
+
+        The clients are dealt to the workers in turn, so the starts stay staggered over the whole fleet. Every worker
+        publishes the live counters of its players into its own row of a shared-memory array, and the parent process
+        aggregates the rows at every report without any message from the workers.
+
+        Parameters
+        ----------
+        num_clients: int
+            The number of players over all the workers
+        processes: int, optional
+            The number of worker processes. The number of CPUs is used if it's None.
+        stagger: float
+            The delay between the starts of two consecutive players of the fleet, in seconds
+        report_interval: float
+            The interval between two live reports, in seconds
+        bitrate_bins: List[int], optional
+            The upper bounds of the bins of the live bitrate histogram in bps. The bins of the config are used if it's
+            None.
+        worker_log_level: int
+            The logging level of the worker processes
+        progress: Callable[[Dict[str, Any]], None], optional
+            Called with the live report at every report interval
+        event_loop: str, optional
+            The event loop implementation of the workers. The event loop of the config is used if it's None.
+        """
+        self.num_clients = num_clients
+        self.processes = processes if processes is not None else os.cpu_count()
+        self.stagger = stagger
+        self.report_interval = report_interval
+        self.bitrate_bins = bitrate_bins if bitrate_bins is not None else Config.fleet_bitrate_bins
+        self.worker_log_level = worker_log_level
+        self.progress = progress
+        self.event_loop = resolve_event_loop(event_loop)
+
+        self._start_time = 0.0
+        self._last_report_time = 0.0
+        self._last_bytes = 0.0
+
+    def report(self, counters: FleetCounters) -> Dict[str, Any]:
+        """
+        Aggregate the counters of all the workers
+
+        Parameters
+        ----------
+        counters: FleetCounters
+            The counters of the fleet
+
+        Returns
+        -------
+        report: Dict[str, Any]
+            The fleet-wide numbers of players, bytes, stalls and switches, the rebuffer ratio, the throughput in bps
+            since the last report and on average, and the number of players in every bin of the bitrate histogram
+        """
+        totals = counters.totals()
+        now = time.time()
+        elapsed = now - self._start_time
+        interval = now - self._last_report_time
+        num_bytes = totals[FleetCounters.BYTES]
+        watch_time = totals[FleetCounters.PLAY_TIME] + totals[FleetCounters.STALL_TIME]
+        report = {
+            "elapsed": elapsed,
+            "started": int(totals[FleetCounters.STARTED]),
+            "running": int(totals[FleetCounters.STARTED] - totals[FleetCounters.FINISHED] -
+                           totals[FleetCounters.FAILED]),
+            "finished": int(totals[FleetCounters.FINISHED]),
+            "failed": int(totals[FleetCounters.FAILED]),
+            "bytes": int(num_bytes),
+            "throughput": 8 * (num_bytes - self._last_bytes) / interval if interval > 0 else 0.0,
+            "average_throughput": 8 * num_bytes / elapsed if elapsed > 0 else 0.0,
+            "stalls": int(totals[FleetCounters.STALLS]),
+            "stalled": int(totals[FleetCounters.STALLED]),
+            "rebuffer_ratio": totals[FleetCounters.STALL_TIME] / watch_time if watch_time > 0 else 0.0,
+            "switches": int(totals[FleetCounters.SWITCHES]),
+            "bitrate_bins": counters.bitrate_bins,
+            "bitrate_histogram": [int(value) for value in totals[FleetCounters.BITRATE_BINS:]]
+        }
+        self._last_report_time = now
+        self._last_bytes = num_bytes
+        return report
+
+    def run(self, mpd_url: str) -> Dict[str, Any]:
+        """
+        Start all the workers and wait for all of them to end
+
+        Parameters
+        ----------
+        mpd_url: str
+            The URL of the MPD file to play. Every worker downloads and parses it once.
+
+        Returns
+        -------
+        report: Dict[str, Any]
+            The final report, with the number of workers which crashed under "crashed_workers"
+        """
+        counters = FleetCounters(self.processes, self.bitrate_bins)
+        workers = []
+        for shard in range(self.processes):
+            num_clients = len(range(shard, self.num_clients, self.processes))
+            if num_clients == 0:
+                continue
+            worker = multiprocessing.Process(target=_run_shard,
+                                             args=(mpd_url, counters, shard, num_clients,
+                                                   self.stagger * self.processes, self.stagger * shard,
+                                                   self.worker_log_level, self.event_loop),
+                                             daemon=True)
+            worker.start()
+            workers.append(worker)
+
+        self._start_time = self._last_report_time = time.time()
+        self._last_bytes = 0.0
+        next_report = self._start_time + self.report_interval
+        while True:
+            alive = [worker for worker in workers if worker.is_alive()]
+            if len(alive) == 0:
+                break
+            multiprocessing.connection.wait([worker.sentinel for worker in alive],
+                                            max(0.0, next_report - time.time()))
+            if time.time() >= next_report:
+                next_report += self.report_interval
+                if self.progress is not None:
+                    self.progress(self.report(counters))
+
+        crashed = 0
+        for worker in workers:
+            worker.join()
+            if worker.exitcode != 0:
+                crashed += 1
+                self.log.error("Worker %d exited with code %d" % (worker.pid, worker.exitcode))
+        report = self.report(counters)
+        report["crashed_workers"] = crashed
+        return report
@@ -0,0 +1,314 @@
+import asyncio
+import logging
+import re
+from typing import Dict, List, Optional, Set, Mapping, Tuple, Iterator
+
+from dash_emulator.clock import Clock, EventLoopClock
+from dash_emulator.download import DownloadManager, DownloadEventListener, DownloadHandle, DownloadError, \
+    DownloadManagerImpl
+from dash_emulator.models import MPD, Representation, Segment, SegmentTimeline
+from dash_emulator.mpd.parser import MPDParser, StreamingMPDParser
+from dash_emulator.session import SessionPool
+from dash_emulator.trace import BandwidthTrace
+
+
+async def fetch_mpd(target: str, parser: Optional[MPDParser] = None,
+                    session_pool: Optional[SessionPool] = None) -> MPD:
+    """
+    Download and parse an MPD file once
+
+    Parameters
+    ----------
+    target: str
+        The URL of the MPD file, or a path to a local one
+    parser: MPDParser, optional
+        The parser to use. The StreamingMPDParser is used if it's None.
+    session_pool: SessionPool, optional
+        The connection pool to download the MPD file through. A private pool is used if it's None.
+
+    Returns
+    -------
+    mpd: MPD
+        The MPD object
+    """
+    parser = parser if parser is not None else StreamingMPDParser()
+    if re.match("^(http|https)://", target) is None:
+        if isinstance(parser, StreamingMPDParser):
+            return parser.parse_file(target, url=target)
+        with open(target, encoding="utf-8") as f:
+            return parser.parse(f.read(), url=target)
+    download_manager = DownloadManagerImpl([], session_pool=session_pool)
+    try:
+        content = await download_manager.download(target, save=True)
+    finally:
+        await download_manager.close()
+    return parser.parse(str(content, "utf-8"), url=target)
+
+
+def segment_sizes(mpd: MPD, init_size: int = 1000) -> 'SegmentSizes':
+    """
+    Estimate the size of every segment from the bitrate of its representation, unless the MPD tells it
+
+    Parameters
+    ----------
+    mpd: MPD
+        The MPD object
+    init_size: int
+        The size of the initialization segments in bytes
+
+    Returns
+    -------
+    sizes: SegmentSizes
+        The size in bytes of every segment, keyed by the URL
+    """
+    return SegmentSizes(mpd, init_size)
+
+
+# A field of the URL format of a SegmentTimeline, or an escaped "%"
+_MEDIA_FIELD = re.compile(r"%\((number|time)\)0?\d*d|%%")
+
+
+def _compile_media_format(media: str) -> Optional[re.Pattern]:
+    """
+    Compile the URL format of a SegmentTimeline into a regular expression matching the URLs of its segments
+
+    Returns
+    -------
+    pattern: re.Pattern, optional
+        The pattern capturing the "number" or the "time" of a segment, or None if the format has a field the
+        pattern can't capture
+    """
+    parts = []
+    fields = set()
+    position = 0
+    for match in _MEDIA_FIELD.finditer(media):
+        parts.append(media[position:match.start()])
+        field = match.group(1)
+        if field is None:
+            parts.append(re.escape("%"))
+        elif field in fields:
+            parts.append(r" *\d+")
+        else:
+            parts.append(r" *(?P<%s>\d+)" % field)
+            fields.add(field)
+        position = match.end()
+    parts.append(media[position:])
+    literals = parts[0::2]
+    if any("%" in literal for literal in literals) or len(fields) == 0:
+        return None
+    parts[0::2] = [re.escape(literal) for literal in literals]
+    return re.compile("".join(parts))
+
+
+class SegmentSizes(Mapping):
+    def __init__(self, mpd: MPD, init_size: int = 1000):
+        """
+        The sizes of the segments of an MPD, keyed by the URL. The sizes of the segments of a SegmentTimeline are
+        computed on lookup, from the index the URL is parsed into, so that they take no memory per segment.
+
+        Parameters
+        ----------
+        mpd: MPD
+            The MPD object
+        init_size: int
+            The size of the initialization segments in bytes
+        """
+        self.init_size = init_size
+        self._initializations: Set[str] = set()
+
+        self._timelines: List[Tuple[re.Pattern, Representation]] = []
+        """
+        The URL pattern and the representation of every SegmentTimeline
+        """
+
+        self._sizes: Dict[str, int] = dict()
+        """
+        The sizes of the segments listed one by one in the MPD, or with a URL format the patterns can't match
+        """
+
+        self._representations: List[Representation] = []
+        for adaptation_set in mpd.adaptation_sets.values():
+            for representation in adaptation_set.representations.values():
+                self._representations.append(representation)
+                self._initializations.add(representation.initialization)
+                segments = representation.segments
+                pattern = _compile_media_format(segments.media) if isinstance(segments, SegmentTimeline) else None
+                if pattern is not None:
+                    self._timelines.append((pattern, representation))
+                else:
+                    for segment in segments:
+                        self._sizes[segment.url] = self._size(representation, segment)
+
+    @staticmethod
+    def _size(representation: Representation, segment: Segment) -> int:
+        if segment.size is not None:
+            return segment.size
+        return int(representation.bandwidth * segment.duration / 8)
+
+    def __getitem__(self, url: str) -> int:
+        if url in self._sizes:
+            return self._sizes[url]
+        for pattern, representation in self._timelines:
+            match = pattern.fullmatch(url)
+            if match is None:
+                continue
+            segments: SegmentTimeline = representation.segments
+            fields = match.groupdict()
+            try:
+                if "number" in fields:
+                    index = int(fields["number"]) - segments.start_number
+                else:
+                    # Half a tick into the segment, so that the rounding of the division doesn't reach the previous one
+                    index = segments.index_at((int(fields["time"]) + 0.5) / segments.timescale)
+                if index >= 0:
+                    segment = segments[index]
+                    if segment.url == url:
+                        return self._size(representation, segment)
+            except IndexError:
+                pass
+        if url in self._initializations:
+            return self.init_size
+        raise KeyError(url)
+
+    def __len__(self) -> int:
+        return len(self._initializations) + sum(len(representation.segments)
+                                                for representation in self._representations)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._initializations
+        for representation in self._representations:
+            for segment in representation.segments:
+                yield segment.url
+
+
+class SimulatedDownloadManager(DownloadManager):
+    log = logging.getLogger("SimulatedDownloadManager")
+
+    def __init__(self,
+                 event_listeners: List[DownloadEventListener],
+                 trace: BandwidthTrace,
+                 sizes: Mapping[str, int],
+                 clock: Optional[Clock] = None,
+                 latency: float = 0,
+                 progress_interval: float = 0):
+        """
+        A download manager which doesn't touch the network. The time each transfer takes is computed from a bandwidth
+        trace, and the transfer sleeps on the clock for that long. Run it with a VirtualTimeEventLoop to simulate a
+        session faster than real time.
+
+        The transfers running at the same time share the bandwidth evenly. The share is updated at the end of every
+        step, so it is approximate when transfers start or end in the middle of a step.
+
+        Parameters
+        ----------
+        event_listeners: List[DownloadEventListener]
+            Listeners to events of some bytes downloaded
+        trace: BandwidthTrace
+            The bandwidth trace. It starts with the first transfer.
+        sizes: Mapping[str, int]
+            The size of every resource in bytes, keyed by the URL. Unknown URLs fail with a DownloadError.
+        clock: Clock, optional
+            The clock to sleep on. The clock of the running event loop is used if it's None.
+        latency: float
+            The time before the first byte of each transfer, in seconds
+        progress_interval: float
+            The max interval between two on_bytes_transferred events of one transfer, in seconds.
+            0 to deliver the progress only when the bandwidth of the trace changes.
+        """
+        self.event_listeners = event_listeners
+        self.trace = trace
+        self.sizes = sizes
+        self.clock = clock if clock is not None else EventLoopClock()
+        self.latency = latency
+        self.progress_interval = progress_interval
+
+        self._trace_start: Optional[float] = None
+        self._num_transferring = 0
+        self._handles: Set[DownloadHandle] = set()
+
+    @property
+    def is_busy(self) -> bool:
+        return len(self._handles) > 0
+
+    def start_download(self, url, save=False, path=None) -> DownloadHandle:
+        handle = DownloadHandle(url, save, path)
+        self._handles.add(handle)
+        handle.attach(asyncio.create_task(self._download(handle)))
+        return handle
+
+    async def download(self, url, save=False, path=None) -> Optional[memoryview]:
+        return await self.start_download(url, save, path)
+
+    async def _download(self, handle: DownloadHandle) -> Optional[memoryview]:
+        try:
+            return await self._transfer(handle)
+        except asyncio.CancelledError:
+            if not handle.stop_requested:
+                raise
+            # Aborted through the handle
+            handle.canceled = True
+            return None
+        finally:
+            self._handles.discard(handle)
+
+    async def _transfer(self, handle: DownloadHandle) -> Optional[memoryview]:
+        url = handle.url
+        size = self.sizes.get(url)
+        if size is None:
+            raise DownloadError("Failed to download %s: unknown size" % url)
+        handle.size = size
+        if self._trace_start is None:
+            self._trace_start = self.clock.time()
+
+        for listener in self.event_listeners:
+            await listener.on_transfer_start(url)
+        try:
+            if self.latency > 0:
+                await self.clock.sleep(self.latency)
+            self._num_transferring += 1
+            try:
+                while handle.position < size and not handle.stop_requested:
+                    bandwidth, step = self.trace.period_at(self.clock.time() - self._trace_start)
+                    if self.progress_interval > 0:
+                        step = min(step, self.progress_interval)
+                    bandwidth /= self._num_transferring
+                    remaining = size - handle.position
+                    if bandwidth * step >= remaining * 8:
+                        step = remaining * 8 / bandwidth
+                        length = remaining
+                    else:
+                        length = int(bandwidth * step / 8)
+                    await self.clock.sleep(step)
+                    handle.position += length
+                    if length > 0:
+                        for listener in self.event_listeners:
+                            await listener.on_bytes_transferred(length, url, handle.position, size)
+            finally:
+                self._num_transferring -= 1
+        except BaseException:
+            # Aborted while waiting, the listeners still have to know the transfer is over
+            for listener in self.event_listeners:
+                await listener.on_transfer_canceled(url, handle.position, size)
+            raise
+
+        if handle.position < size:
+            handle.canceled = True
+            for listener in self.event_listeners:
+                await listener.on_transfer_canceled(url, handle.position, size)
+            return None
+
+        for listener in self.event_listeners:
+            await listener.on_transfer_end(size, url)
+        return memoryview(bytes(size)) if handle.save else None
+
+    async def close(self):
+        pass
+
+    async def stop(self, url: str):
+        for handle in self._handles:
+            if handle.url == url:
+                handle.cancel()
+
+    def add_listener(self, listener: DownloadEventListener):
+        if listener not in self.event_listeners:
+            self.event_listeners.append(listener)
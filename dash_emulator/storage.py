@@ -0,0 +1,194 @@
+import asyncio
+import json
+import logging
+import os
+import pathlib
+from concurrent.futures import Executor
+from typing import Optional, Set
+from urllib.parse import urlparse
+
+
+class FileWriter(object):
+    log = logging.getLogger("FileWriter")
+
+    def __init__(self, path: str, block_size: int = 1 << 20, executor: Optional[Executor] = None):
+        """
+        Write a stream of chunks to a file without blocking the event loop.
+
+        Chunks are gathered into blocks of `block_size` bytes, and every block is written by a worker thread while the
+        next block is being received.
+
+        Parameters
+        ----------
+        path: str
+            The path of the file
+        block_size: int
+            The number of bytes written to the disk at once
+        executor: Executor, optional
+            The executor running the writes. The default executor of the event loop is used if it's None.
+        """
+        self.path = path
+        self.block_size = block_size
+        self.executor = executor
+
+        self._buffer = bytearray()
+        self._file = None
+        self._pending: Optional[asyncio.Future] = None
+
+    async def write(self, chunk: bytes) -> None:
+        self._buffer += chunk
+        if len(self._buffer) >= self.block_size:
+            await self._flush()
+
+    async def close(self) -> None:
+        """
+        Write the remaining bytes and close the file
+        """
+        await self._flush()
+        await self._wait_pending()
+        await asyncio.get_running_loop().run_in_executor(self.executor, self._close_file)
+
+    async def abort(self) -> None:
+        """
+        Close the file and remove it
+        """
+        self._buffer = bytearray()
+        await self._wait_pending()
+        await asyncio.get_running_loop().run_in_executor(self.executor, self._remove_file)
+
+    async def _flush(self) -> None:
+        if len(self._buffer) == 0:
+            return
+        # Only one block is written at a time, so the blocks land in the file in order
+        await self._wait_pending()
+        block, self._buffer = self._buffer, bytearray()
+        self._pending = asyncio.get_running_loop().run_in_executor(self.executor, self._write_block, block)
+
+    async def _wait_pending(self) -> None:
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            await pending
+
+    def _write_block(self, block: bytearray) -> None:
+        if self._file is None:
+            self._file = open(self.path, 'wb')
+        self._file.write(block)
+
+    def _close_file(self) -> None:
+        if self._file is None:
+            # Empty content, create an empty file
+            self._file = open(self.path, 'wb')
+        self._file.close()
+
+    def _remove_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class SegmentStorage(object):
+    log = logging.getLogger("SegmentStorage")
+
+    INDEX_FILE_NAME = "index.jsonl"
+
+    def __init__(self, output_folder: str, executor: Optional[Executor] = None):
+        """
+        Decide where the downloaded segments are saved, and keep an index mapping the files back to the URLs.
+
+        The index is a JSON Lines file in the output folder. Each line holds the file name, the URL, the adaptation set
+        ID, the representation ID and the segment index (null for initialization segments). The index is rewritten by
+        every run saving segments into the folder, and each file is listed once.
+
+        Parameters
+        ----------
+        output_folder: str
+            The folder to save the segments in. It is created if it doesn't exist.
+        executor: Executor, optional
+            The executor writing the index. The default executor of the event loop is used if it's None.
+        """
+        self.output_folder = pathlib.Path(output_folder)
+        self.output_folder.mkdir(parents=True, exist_ok=True)
+        self.executor = executor
+
+        self._index_file = None
+        # The names of the files in the index
+        self._recorded: Set[str] = set()
+        # Only one line is written at a time, so the lines land in the index in order
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _extension(url: str) -> str:
+        return os.path.splitext(urlparse(url).path)[1]
+
+    def init_path(self, adaptation_set_id: int, representation_id: int, url: str) -> str:
+        """
+        Returns
+        -------
+        path: str
+            The path to save the initialization segment of a representation
+        """
+        name = "as%d-rep%d-init%s" % (adaptation_set_id, representation_id, self._extension(url))
+        return str(self.output_folder / name)
+
+    def segment_path(self, adaptation_set_id: int, representation_id: int, index: int, url: str) -> str:
+        """
+        Returns
+        -------
+        path: str
+            The path to save one media segment of a representation
+        """
+        name = "as%d-rep%d-%05d%s" % (adaptation_set_id, representation_id, index, self._extension(url))
+        return str(self.output_folder / name)
+
+    async def record(self, path: str, url: str, adaptation_set_id: int, representation_id: int,
+                     index: Optional[int] = None) -> None:
+        """
+        Add one saved segment to the index
+
+        Parameters
+        ----------
+        path: str
+            The path returned by init_path or segment_path
+        url: str
+            The URL the segment is downloaded from
+        adaptation_set_id: int
+            The adaptation set ID
+        representation_id: int
+            The representation ID
+        index: int, optional
+            The segment index. None for initialization segments.
+        """
+        name = os.path.basename(path)
+        if name in self._recorded:
+            # Downloaded again, e.g. by a retry, into the same file
+            return
+        self._recorded.add(name)
+        entry = {
+            "file": name,
+            "url": url,
+            "adaptation_set": adaptation_set_id,
+            "representation": representation_id,
+            "index": index
+        }
+        async with self._lock:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self._write_line, json.dumps(entry) + "\n")
+
+    async def close(self) -> None:
+        """
+        Close the index
+        """
+        async with self._lock:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self._close_file)
+
+    def _write_line(self, line: str) -> None:
+        if self._index_file is None:
+            # The entries of a previous run are replaced
+            self._index_file = open(self.output_folder / self.INDEX_FILE_NAME, 'w')
+        self._index_file.write(line)
+        self._index_file.flush()
+
+    def _close_file(self) -> None:
+        if self._index_file is not None:
+            self._index_file.close()
+            self._index_file = None
@@ -0,0 +1,132 @@
+import bisect
+from typing import List, Tuple
+
+
+class BandwidthTrace(object):
+    # Times closer than this to the end of a period are treated as the start of the next one (s)
+    EPSILON = 1e-6
+
+    def __init__(self, periods: List[Tuple[float, float]]):
+        """
+        A piecewise constant bandwidth over time. The trace starts over when it reaches its end.
+
+        Parameters
+        ----------
+        periods: List[Tuple[float, float]]
+            A list of (duration, bandwidth) pairs. The duration is in seconds and the bandwidth is in bps
+            (bits per second).
+        """
+        periods = [(float(duration), float(bandwidth)) for duration, bandwidth in periods if duration > 0]
+        if len(periods) == 0:
+            raise ValueError("The trace has no period")
+        if all(bandwidth <= 0 for _, bandwidth in periods):
+            raise ValueError("The trace has no bandwidth")
+
+        self.durations = [duration for duration, _ in periods]
+        """
+        The duration of every period in seconds
+        """
+
+        self.bandwidths = [bandwidth for _, bandwidth in periods]
+        """
+        The bandwidth of every period in bps (bits per second)
+        """
+
+        self.starts = []
+        """
+        The start time of every period in seconds
+        """
+
+        start = 0.0
+        for duration in self.durations:
+            self.starts.append(start)
+            start += duration
+
+        self.length = start
+        """
+        The total duration of the trace in seconds
+        """
+
+    @classmethod
+    def constant(cls, bandwidth: float) -> 'BandwidthTrace':
+        """
+        Returns
+        -------
+        trace: BandwidthTrace
+            A trace with a constant bandwidth in bps (bits per second)
+        """
+        return cls([(3600, bandwidth)])
+
+    def period_at(self, t: float) -> Tuple[float, float]:
+        """
+        Parameters
+        ----------
+        t: float
+            The time since the start of the trace in seconds
+
+        Returns
+        -------
+        bandwidth: float
+            The bandwidth at the time in bps (bits per second)
+        remaining: float
+            How long the bandwidth stays the same from the time, in seconds
+        """
+        position = t % self.length
+        index = bisect.bisect_right(self.starts, position + self.EPSILON) - 1
+        remaining = self.starts[index] + self.durations[index] - position
+        if remaining <= self.EPSILON:
+            # The end of the trace, which is also its start
+            index = 0
+            remaining = self.durations[0] + remaining
+        return self.bandwidths[index], remaining
+
+    def transfer_time(self, t: float, size: int) -> float:
+        """
+        Parameters
+        ----------
+        t: float
+            The time when the transfer starts, since the start of the trace, in seconds
+        size: int
+            The size of the transfer in bytes
+
+        Returns
+        -------
+        duration: float
+            How long the transfer takes in seconds if it gets the whole bandwidth
+        """
+        bits = size * 8
+        elapsed = 0.0
+        while True:
+            bandwidth, remaining = self.period_at(t + elapsed)
+            if bandwidth * remaining >= bits:
+                return elapsed + bits / bandwidth
+            bits -= bandwidth * remaining
+            elapsed += remaining
+
+
+def load_trace(path: str) -> BandwidthTrace:
+    """
+    Load a bandwidth trace from a text file.
+
+    Each line holds the duration in seconds and the bandwidth in bps, separated by spaces, tabs or a comma.
+    Empty lines and lines starting with "#" are skipped.
+
+    Parameters
+    ----------
+    path: str
+        The path of the trace file
+
+    Returns
+    -------
+    trace: BandwidthTrace
+        The trace in the file
+    """
+    periods = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if len(line) == 0 or line.startswith("#"):
+                continue
+            duration, bandwidth = line.replace(",", " ").split()[:2]
+            periods.append((float(duration), float(bandwidth)))
+    return BandwidthTrace(periods)
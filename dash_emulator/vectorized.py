@@ -0,0 +1,385 @@
+import time
+from typing import Dict, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from dash_emulator.abr import ABRController, DashABRController
+from dash_emulator.config import Config
+from dash_emulator.models import MPD
+from dash_emulator.player import DASHPlayer
+from dash_emulator.simulation import segment_sizes
+from dash_emulator.trace import BandwidthTrace
+
+# The states of the player, as in dash_emulator.models.State
+_BUFFERING = 0
+_READY = 1
+_END = 2
+
+
+def _num_segments(mpd: MPD) -> int:
+    return min(len(representation.segments)
+               for adaptation_set in mpd.adaptation_sets.values()
+               for representation in adaptation_set.representations.values())
+
+
+class _TraceArrays(object):
+    def __init__(self, traces: Sequence[BandwidthTrace]):
+        num_periods = max(len(trace.starts) for trace in traces)
+        # The padding never matches: it starts at infinity
+        self.starts = np.full((len(traces), num_periods), np.inf)
+        self.durations = np.zeros((len(traces), num_periods))
+        self.bandwidths = np.zeros((len(traces), num_periods))
+        for i, trace in enumerate(traces):
+            self.starts[i, :len(trace.starts)] = trace.starts
+            self.durations[i, :len(trace.durations)] = trace.durations
+            self.bandwidths[i, :len(trace.bandwidths)] = trace.bandwidths
+        self.lengths = np.array([trace.length for trace in traces])
+        self.num_periods = num_periods
+        self.num_steps = int(np.ceil(np.log2(num_periods + 1)))
+        self.flat_starts = self.starts.ravel()
+        self.rows = np.arange(len(traces))
+
+    def bisect_right(self, x):
+        # A binary search on every row at once, comparing the same values as bisect.bisect_right
+        base = self.rows * self.num_periods
+        low = np.zeros(len(self.rows), dtype=int)
+        high = np.full(len(self.rows), self.num_periods)
+        for _ in range(self.num_steps):
+            middle = (low + high) // 2
+            searching = low < high
+            right = self.flat_starts[base + np.minimum(middle, self.num_periods - 1)] <= x
+            low = np.where(searching & right, middle + 1, low)
+            high = np.where(searching & ~right, middle, high)
+        return low
+
+    def period_at(self, t):
+        # The same steps as BandwidthTrace.period_at, for every session at once
+        position = np.remainder(t, self.lengths)
+        index = self.bisect_right(position + BandwidthTrace.EPSILON) - 1
+        remaining = self.starts[self.rows, index] + self.durations[self.rows, index] - position
+        wrap = remaining <= BandwidthTrace.EPSILON
+        index = np.where(wrap, 0, index)
+        remaining = np.where(wrap, self.durations[self.rows, 0] + remaining, remaining)
+        return self.bandwidths[self.rows, index], remaining
+
+
+class _Ladder(object):
+    def __init__(self, adaptation_set, num_segments: int, sizes):
+        # In the order of the bitrate ladder, so that the same representation as DashABRController is picked
+        ladder = adaptation_set.ladder
+        representations = [adaptation_set.representations[id_] for id_ in ladder.ids]
+        self.is_video = adaptation_set.content_type == "video"
+        self.ids = np.array(ladder.ids)
+        self.bandwidths = np.array(ladder.bandwidths, dtype=float)
+        self.init_sizes = np.array([sizes[representation.initialization] for representation in representations],
+                                   dtype=float)
+        self.sizes = np.array([[sizes[segment.url] for segment in representation.segments[:num_segments]]
+                               for representation in representations], dtype=float)
+        self.durations = np.array([[segment.duration for segment in representation.segments[:num_segments]]
+                                   for representation in representations])
+
+    def choose_ideal_selection(self, bw):
+        # The highest bandwidth strictly lower than the estimate, or the lowest one
+        return np.maximum(np.searchsorted(self.bandwidths, bw, side='left') - 1, 0)
+
+
+class _Sessions(object):
+    def __init__(self, mpd: MPD, traces: Sequence[BandwidthTrace], panic_buffers: Sequence[float],
+                 safe_buffers: Sequence[float], min_rebuffer_duration: float, min_start_buffer_duration: float):
+        """
+        The state of the components of build_simulated_dash_player, one array element per session
+        """
+        num_sessions = len(traces)
+        self.num_segments = _num_segments(mpd)
+        self.trace_arrays = _TraceArrays(traces)
+        sizes = segment_sizes(mpd, Config.simulation_init_segment_size)
+        self.ladders = [_Ladder(adaptation_set, self.num_segments, sizes)
+                        for adaptation_set in mpd.adaptation_sets.values()]
+        self.num_videos = mpd.adaptation_sets.num_videos
+        self.num_audios = mpd.adaptation_sets.num_audios
+        self.panic_buffers = np.asarray(panic_buffers, dtype=float)
+        self.safe_buffers = np.asarray(safe_buffers, dtype=float)
+        self.min_rebuffer_duration = min_rebuffer_duration
+        self.min_start_buffer_duration = min_start_buffer_duration
+        # The timers firing closer than this to the time of the event loop fire together
+        self.clock_resolution = time.get_clock_info('monotonic').resolution
+
+        # The event loop
+        self.t = np.zeros(num_sessions)
+
+        # DASHPlayer
+        self.state = np.full(num_sessions, _BUFFERING)
+        self.started = np.zeros(num_sessions, dtype=bool)
+        self.position = np.zeros(num_sessions)
+        self.timestamp = np.zeros(num_sessions)
+        self.next_sample = np.zeros(num_sessions)
+        # The time when the timer of the player fires, infinity without a timer
+        self.timer = np.full(num_sessions, np.inf)
+        # The player is woken up, and runs before the time moves forward
+        self.event = np.zeros(num_sessions, dtype=bool)
+
+        # TimelineBufferManager, whose buffered ranges are contiguous from the end of the last played range
+        self.update_time = np.zeros(num_sessions)
+        self.playable_end = np.zeros(num_sessions)
+        self.segment_ends = np.zeros((len(self.ladders), num_sessions))
+
+        # SchedulerImpl and SimulatedDownloadManager
+        self.is_end = False
+        self.initialized = [np.zeros((num_sessions, len(ladder.ids)), dtype=bool) for ladder in self.ladders]
+        self.trace_start = None
+
+        # BandwidthMeterImpl and DashABRController
+        self.bw = np.full(num_sessions, float(Config.max_initial_bitrate))
+        self.last_selections = None
+
+        # QoECollector
+        self.start_time = np.zeros(num_sessions)
+        self.qoe_selections = None
+        self.startup_delay = np.full(num_sessions, np.nan)
+        self.stall_start = np.full(num_sessions, np.nan)
+        self.rebuffer_count = np.zeros(num_sessions, dtype=int)
+        self.rebuffer_duration = np.zeros(num_sessions)
+        self.session_duration = np.full(num_sessions, np.nan)
+        self.bitrate_sum = np.zeros(num_sessions)
+        self.switches = np.zeros(num_sessions, dtype=int)
+
+    def run(self) -> Dict[str, 'np.ndarray']:
+        # The first iteration of the main loop of the player runs before the scheduler
+        self._wake(np.ones(len(self.t), dtype=bool))
+        for index in range(self.num_segments + 1):
+            # SchedulerImpl._download_segments
+            while True:
+                buffer_level = self._buffer_level()
+                waiting = buffer_level > Config.max_buffer_duration
+                if not waiting.any():
+                    break
+                self._sleep(np.maximum(buffer_level - Config.max_buffer_duration, Config.update_interval), waiting,
+                            direct=True)
+            if index == self.num_segments:
+                break
+            selections = self._update_selection(buffer_level)
+            self._on_segment_download_start(selections)
+            for i, ladder in enumerate(self.ladders):
+                new = ~self.initialized[i][self.trace_arrays.rows, selections[i]]
+                if new.any():
+                    self.initialized[i][self.trace_arrays.rows, selections[i]] = True
+                    self._transfer(ladder.init_sizes[selections[i]], new)
+                self._transfer(ladder.sizes[selections[i], index], np.ones(len(self.t), dtype=bool))
+            for i, ladder in enumerate(self.ladders):
+                self.segment_ends[i] = self.segment_ends[i] + ladder.durations[selections[i], index]
+            self.playable_end = np.maximum(self.segment_ends.min(axis=0), self.position)
+            self.event[:] = True
+
+        # The scheduler ends, and the player plays the rest of the buffer out
+        self.is_end = True
+        self.event[:] = True
+        self._wake(self.event)
+        while (self.state != _END).any():
+            playing = self.state != _END
+            self.t = np.where(playing, self.t + (self.timer - self.t), self.t)
+            self._wake(playing)
+
+        return {
+            "startup_delay": self.startup_delay,
+            "rebuffer_count": self.rebuffer_count,
+            "rebuffer_duration": self.rebuffer_duration,
+            "average_bitrate": self.bitrate_sum / self.num_segments,
+            "switches": self.switches,
+            "session_duration": self.session_duration
+        }
+
+    def _buffer_level(self):
+        # TimelineBufferManager.buffer_level
+        current = np.where(self.state == _READY, self.position + (self.t - self.update_time), self.position)
+        return self.playable_end - current
+
+    def _update_selection(self, buffer_level):
+        # DashABRController.update_selection
+        available_bandwidth = np.floor(self.bw * DashABRController.BANDWIDTH_SAFETY_FACTOR)
+        if self.num_videos == 0 or self.num_audios == 0:
+            video_bandwidth = audio_bandwidth = available_bandwidth / (self.num_videos + self.num_audios)
+        else:
+            video_bandwidth = (available_bandwidth * ABRController.VIDEO_BANDWIDTH_SHARE) / self.num_videos
+            audio_bandwidth = (available_bandwidth * ABRController.AUDIO_BANDWIDTH_SHARE) / self.num_audios
+        ideal = [ladder.choose_ideal_selection(video_bandwidth if ladder.is_video else audio_bandwidth)
+                 for ladder in self.ladders]
+        if self.last_selections is None:
+            selections = ideal
+        else:
+            selections = []
+            for ladder, last_selection, ideal_selection in zip(self.ladders, self.last_selections, ideal):
+                last_bandwidth = ladder.bandwidths[last_selection]
+                ideal_bandwidth = ladder.bandwidths[ideal_selection]
+                panic = np.where(last_bandwidth < ideal_bandwidth, last_selection, ideal_selection)
+                safe = np.where(last_bandwidth > ideal_bandwidth, last_selection, ideal_selection)
+                selections.append(np.where(buffer_level < self.panic_buffers, panic,
+                                           np.where(buffer_level > self.safe_buffers, safe, ideal_selection)))
+        self.last_selections = selections
+        return selections
+
+    def _on_segment_download_start(self, selections):
+        # QoECollector.on_segment_download_start
+        if self.qoe_selections is None:
+            self.start_time = self.t.copy()
+        bitrate = np.zeros(len(self.t))
+        for i, ladder in enumerate(self.ladders):
+            if ladder.is_video:
+                bitrate = bitrate + ladder.bandwidths[selections[i]]
+                if self.qoe_selections is not None:
+                    self.switches += self.qoe_selections[i] != selections[i]
+        self.bitrate_sum = self.bitrate_sum + bitrate
+        self.qoe_selections = selections
+
+    def _transfer(self, size, mask):
+        # SimulatedDownloadManager._transfer and BandwidthMeterImpl, for the sessions in the mask
+        if self.trace_start is None:
+            self.trace_start = self.t.copy()
+        start = self.t
+        if Config.simulation_latency > 0:
+            self._sleep(np.full(len(self.t), float(Config.simulation_latency)), mask)
+        position = np.zeros(len(self.t))
+        transferring = mask & (position < size)
+        while transferring.any():
+            bandwidth, step = self.trace_arrays.period_at(self.t - self.trace_start)
+            if Config.simulation_progress_interval > 0:
+                step = np.minimum(step, Config.simulation_progress_interval)
+            remaining = size - position
+            last = bandwidth * step >= remaining * 8
+            with np.errstate(divide='ignore', invalid='ignore'):
+                step = np.where(last, remaining * 8 / bandwidth, step)
+            length = np.where(last, remaining, np.floor(bandwidth * step / 8))
+            self._sleep(step, transferring)
+            position = np.where(transferring, position + length, position)
+            transferring = transferring & (position < size)
+        sf = Config.smoothing_factor
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.bw = np.where(mask, self.bw * sf + (8 * size) / (self.t - start) * (1 - sf), self.bw)
+
+    def _sleep(self, delay, mask, direct=False):
+        """
+        Sleep on the event loop of the sessions in the mask, running the player when its timer fires in between.
+        The player runs first if it was woken up before.
+
+        direct is True if the caller is the scheduler itself. It then runs before the player when its timer fires
+        first in the same iteration of the event loop. A download runs in its own task, which the scheduler waits
+        for, so the player always runs before the scheduler goes on.
+        """
+        self._wake(mask & self.event)
+        when = self.t + delay
+        sleeping = mask.copy()
+        while sleeping.any():
+            # Jump to the first timer, and fire the timers up to the resolution of the clock after it
+            self.t = np.where(sleeping, self.t + (np.minimum(when, self.timer) - self.t), self.t)
+            end_time = self.t + self.clock_resolution
+            fired = sleeping & (when < end_time)
+            player_fired = sleeping & (self.timer < end_time)
+            if direct:
+                # Run once the scheduler yields
+                deferred = player_fired & fired & (when < self.timer)
+                self.event = self.event | deferred
+                self.timer = np.where(deferred, np.inf, self.timer)
+                player_fired = player_fired & ~deferred
+            if player_fired.any():
+                self._wake(player_fired)
+            sleeping = sleeping & ~fired
+
+    def _wake(self, mask):
+        # An iteration of the event driven main loop of DASHPlayer for the sessions in the mask
+        now = self.t
+        interval = now - self.timestamp
+        self.timestamp = np.where(mask, now, self.timestamp)
+        ready = mask & (self.state == _READY)
+        buffering = mask & (self.state == _BUFFERING)
+        self.position = np.where(ready, self.position + interval, self.position)
+        # TimelineBufferManager.update_buffer drops the ranges played out
+        self.playable_end = np.where(mask, np.maximum(self.segment_ends.min(axis=0), self.position),
+                                     self.playable_end)
+        buffer_level = self.playable_end - self.position
+
+        sample_interval = Config.buffer_sample_interval
+        if sample_interval is not None:
+            self.next_sample = np.where(mask & (now >= self.next_sample), now + sample_interval, self.next_sample)
+
+        # DASHPlayer._update_state
+        stall = ready & (buffer_level <= 0)
+        end = stall & self.is_end
+        stall = stall & ~end
+        start = buffering & ~self.started & (buffer_level > self.min_start_buffer_duration)
+        resume = buffering & (self.is_end | start |
+                              (self.started & (buffer_level > self.min_rebuffer_duration)))
+        self.started = self.started | start
+        self.state = np.where(end, _END, np.where(stall, _BUFFERING, np.where(resume, _READY, self.state)))
+
+        # QoECollector.on_state_change
+        self.session_duration = np.where(end, now - self.start_time, self.session_duration)
+        self.rebuffer_count += stall
+        self.stall_start = np.where(stall, now, self.stall_start)
+        first_start = resume & np.isnan(self.startup_delay)
+        self.startup_delay = np.where(first_start, now - self.start_time, self.startup_delay)
+        stalled = resume & ~first_start & ~np.isnan(self.stall_start)
+        self.rebuffer_duration = np.where(stalled, self.rebuffer_duration + (now - self.stall_start),
+                                          self.rebuffer_duration)
+        self.stall_start = np.where(resume, np.nan, self.stall_start)
+
+        # Sleep until the buffer runs out, the next sample, or the next event of the scheduler
+        playing = mask & (self.state == _READY)
+        self.update_time = np.where(playing, now, self.update_time)
+        timeout = np.where(playing, buffer_level, np.inf)
+        if sample_interval is not None and sample_interval > 0:
+            timeout = np.where(playing, np.minimum(timeout, self.next_sample - now), self.next_sample - now)
+        timer = np.where(np.isinf(timeout), np.inf, now + np.maximum(timeout, DASHPlayer.MIN_SLEEP))
+        self.timer = np.where(mask, np.where(self.state == _END, np.inf, timer), self.timer)
+        self.event = self.event & ~mask
+
+
+def simulate_sessions(mpd: MPD, traces: Sequence[BandwidthTrace], panic_buffers: Sequence[float],
+                      safe_buffers: Sequence[float], min_rebuffer_duration: float = 1,
+                      min_start_buffer_duration: float = 2) -> Dict[str, 'np.ndarray']:
+    """
+    Simulate many sessions of the player built by build_simulated_dash_player with the DashABRController and the
+    event driven main loop, in lockstep with NumPy, one segment index at a time.
+
+    The state of every component of a session is kept in arrays, and the steps of SchedulerImpl, DASHPlayer,
+    TimelineBufferManager, SimulatedDownloadManager, BandwidthMeterImpl, DashABRController and QoECollector are
+    applied to all the sessions at once, in the order the VirtualTimeEventLoop runs them. The virtual time moves
+    forward timer by timer with the same float operations as the event loop, so the QoE metrics are the same bit for
+    bit as running every player in virtual time.
+
+    The parameters are read from the config like build_simulated_dash_player does. The bandwidth meter has to be
+    "ewma", the segments are downloaded one at a time without retries nor abandonment, and the buffer isn't limited
+    in bytes. The bitrates of an adaptation set are expected to be distinct for the representation IDs to be the same.
+    When the timers of the scheduler and the player fire at the very same time, the player is run first, which the
+    event loop doesn't guarantee.
+
+    Parameters
+    ----------
+    mpd: MPD
+        The MPD object played by all the sessions
+    traces: Sequence[BandwidthTrace]
+        The bandwidth trace of every session
+    panic_buffers: Sequence[float]
+        The panic buffer of the DashABRController of every session
+    safe_buffers: Sequence[float]
+        The safe buffer of the DashABRController of every session
+    min_rebuffer_duration: float
+        The buffer level needed to resume the playback from stalls, in seconds, as in build_simulated_dash_player
+    min_start_buffer_duration: float
+        The buffer level needed to start the playback, in seconds, as in build_simulated_dash_player
+
+    Returns
+    -------
+    qoe: Dict[str, np.ndarray]
+        The QoE metrics of every session, with the same keys as QoECollector.result(). A startup delay or a session
+        duration which is None in QoECollector is NaN.
+    """
+    if np is None:
+        raise ImportError("NumPy is required by the vectorized simulator")
+    if Config.bandwidth_estimator != "ewma" or Config.max_concurrent_downloads > 1 or Config.retry_downloads or \
+            Config.abandon_slow_downloads or Config.max_buffer_bytes is not None:
+        raise ValueError("The vectorized simulator only supports the ewma bandwidth meter, one download at a time "
+                         "without retries nor abandonment, and no max buffer in bytes")
+    return _Sessions(mpd, traces, panic_buffers, safe_buffers, min_rebuffer_duration,
+                     min_start_buffer_duration).run()
@@ -0,0 +1,56 @@
+Feature: Choose representations with the ABR algorithms
+
+  Scenario: BOLA chooses representations by buffer level
+    Given We have an MPD of 1 video and 1 audio adaptation sets
+    When The "bola" ABR controller chooses the video representation from an empty buffer to the buffer target
+    Then The lowest representation is chosen from an empty buffer
+    And The highest representation is chosen at the buffer target
+    And The chosen representations never go down as the buffer fills
+
+  Scenario: BOLA-O starts from the representation chosen by throughput
+    Given We have an MPD of 1 video and 1 audio adaptation sets
+    When The "bola-o" ABR controller chooses the video representation at 2 Mbps as the buffer fills up to 1 second
+    Then The 1 Mbps representation is chosen from an empty buffer
+    And The 1 Mbps representation is kept as the buffer fills
+
+  Scenario: MPC plans with the segment sizes in the MPD
+    Given We have an MPD of 1 video and 1 audio adaptation sets
+    When The "mpc" ABR controller chooses the video representation at 5 Mbps with 4 seconds of buffer
+    And The MPD tells that the segments of the highest representation are 3 MB
+    And The "mpc" ABR controller chooses the video representation at 5 Mbps with 4 seconds of buffer
+    Then The highest representation is chosen without the sizes, and a lower one with them
+
+  Scenario: MPC memoizes its decisions
+    Given We have an MPD of 1 video and 1 audio adaptation sets
+    When The "mpc" ABR controller chooses the video representation at 5 Mbps with 4 seconds of buffer
+    And The "mpc" ABR controller chooses the video representation twice more
+    Then The last decision is looked up in the decision table
+
+  Scenario: MPC keeps a bounded number of decisions
+    Given We have an MPD of 1 video and 1 audio adaptation sets
+    When The "mpc" ABR controller chooses the video representation at 5 Mbps with 4 seconds of buffer
+    And The "mpc" ABR controller chooses the video representation at 50 other bandwidths, with memo tables of 8 entries
+    Then The memo tables are capped at 8 entries
+
+  Scenario: ABR controllers are built by name
+    Given We have the names of all the ABR algorithms
+    Then An ABR controller is built for every name
+    And An unknown name raises a ValueError
+
+  Scenario: MPC takes numbers of segments given as floats
+    Given We have an MPD of 60 segments of 2 seconds
+    When The session is simulated with the "robust-mpc" ABR algorithm over a 10 Mbps trace, with a horizon of 3.0 segments
+    Then The session ends without rebuffering at more than 1 Mbps on average
+
+  Scenario Outline: Simulate a session with an ABR algorithm
+    Given We have an MPD of 60 segments of 2 seconds
+    When The session is simulated with the "<abr>" ABR algorithm over a 10 Mbps trace
+    Then The session ends without rebuffering at more than 1 Mbps on average
+
+    Examples:
+      | abr        |
+      | dash       |
+      | bola       |
+      | bola-o     |
+      | mpc        |
+      | robust-mpc |
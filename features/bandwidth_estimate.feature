@@ -14,4 +14,55 @@ Feature: Estimate the bandwidth correctly
   Scenario: Estimate a mock bandwidth profile with more than one transmissions
     Given We have a default bandwidth meter
     When The two transmissions complete
-    Then The bandwidth should be estimated correctly for 2 transmissions
\ No newline at end of file
+    Then The bandwidth should be estimated correctly for 2 transmissions
+
+  Scenario: A ring buffer keeps the last values
+    Given We have a ring buffer of 3 values
+    When 5 values are appended to the ring buffer
+    Then The ring buffer holds the last 3 values from the oldest one
+    And The evicted values are returned
+
+  Scenario: The harmonic mean estimator averages the last transfers
+    Given We have a harmonic mean bandwidth meter of 2 transfers
+    When Transfers at 1 Mbps, 4 Mbps and 8 Mbps complete
+    Then The bandwidth is the harmonic mean of 4 Mbps and 8 Mbps
+
+  Scenario: The dual EWMA estimator drops quickly
+    Given We have a dual EWMA bandwidth meter
+    When Transfers at 10 Mbps for 10 seconds then at 1 Mbps for 2 seconds complete
+    Then The bandwidth drops to the fast average
+
+  Scenario: The dual EWMA estimator rises slowly
+    Given We have a dual EWMA bandwidth meter
+    When Transfers at 1 Mbps for 10 seconds then at 10 Mbps for 2 seconds complete
+    Then The bandwidth rises to the slow average
+
+  Scenario: The sample estimator times the progress of the transfers
+    Given We have a sample bandwidth meter
+    When A transfer receives 1 MB at 8 Mbps then 1 MB at 2 Mbps
+    Then The bandwidth is the bytes of the samples over their durations
+    And The percentiles of the samples are the throughputs of the slow and the fast halves
+
+  Scenario: The concurrent estimator measures the link while any transfer runs
+    Given We have a concurrent bandwidth meter
+    When Two overlapping transfers of 1 MB and a later one of 1 MB share an 8 Mbps link
+    Then The bandwidth is the bandwidth of the link
+    And A meter timing each transfer on its own underestimates it
+
+  Scenario: The concurrent estimator counts the bytes of the transfers of the same URL apart
+    Given We have a concurrent bandwidth meter
+    When Two overlapping transfers of the same 1 MB segment, one without progress, and a later one of 1 MB share an 8 Mbps link
+    Then The bandwidth is the bandwidth of the link
+
+  Scenario Outline: Simulate a session with a bandwidth estimator
+    Given We have an MPD of 30 segments of 2 seconds
+    When The session is simulated with the "<estimator>" bandwidth estimator over a 10 Mbps trace
+    Then The session ends without rebuffering at more than 1 Mbps on average
+
+    Examples:
+      | estimator     |
+      | ewma          |
+      | harmonic-mean |
+      | dual-ewma     |
+      | sample        |
+      | concurrent    |
@@ -0,0 +1,25 @@
+Feature: Run sweeps of simulated sessions
+
+  Scenario: Run every combination of the inputs on a process pool
+    Given We have an MPD file, 2 bandwidth traces and 2 values of panic buffer
+    When The sweep runs on 2 processes
+    Then There is one result with QoE metrics for each of the 4 sessions
+
+  Scenario: Resume an interrupted sweep
+    Given We have an MPD file, 2 bandwidth traces and 2 values of panic buffer
+    And The sweep was interrupted after 2 sessions
+    When The sweep runs on 2 processes
+    Then Only the 2 remaining sessions are run
+    And There is one result with QoE metrics for each of the 4 sessions
+
+  Scenario: Record the error of a session whose scheduler fails
+    Given We have an MPD file, 2 bandwidth traces and 2 values of panic buffer
+    And One of the values of panic buffer is not a number
+    When The sweep runs on 2 processes
+    Then The sessions with that value have an error result, and the others have QoE metrics
+
+  Scenario: Stop a session running past the virtual time limit
+    Given We have an MPD file, 2 bandwidth traces and 2 values of panic buffer
+    When The first session runs with a limit of 5 seconds of virtual time
+    Then Its result is a timeout error
+    And No task of the session is left pending
@@ -0,0 +1,13 @@
+Feature: Pick representations from the bitrate ladder
+
+  Scenario: The ladder picks the same representations as a scan of the sorted representations
+    Given We have 200 random adaptation sets with repeated bitrates
+    When Representations are picked for random bandwidths
+    Then The ladder picks the highest representation under the bandwidth, the first listed among equal ones
+    And The ladder picks the lowest representation, the last listed among equal ones, under every bandwidth
+
+  Scenario: The adaptation sets are counted by content type when the MPD is built
+    Given We have an MPD of 1 video and 1 audio adaptation sets
+    When The ABR controller updates the selections 3 times
+    Then The MPD counts 1 video and 1 audio adaptation sets
+    And The ABR controller splits the bandwidth by the counts of the MPD
@@ -0,0 +1,40 @@
+Feature: Track the buffered ranges of every adaptation set
+
+  Scenario: Overlapping and adjacent ranges are merged
+    Given We have an empty interval set
+    When The ranges 4-6, 0-2, 2-4, 8-10 and 9-12 are added
+    Then The interval set holds the ranges 0-6 and 8-12
+
+  Scenario: The interval set finds the same ranges as a bisection of sorted lists
+    Given We have an empty interval set with a tolerance of 0.01
+    When 2000 random ranges are added, and removed before a moving position
+    Then The interval set holds the same ranges as the sorted lists after every change
+
+  Scenario: The buffer level is the least buffered adaptation set
+    Given We have a timeline buffer manager
+    When 2 video segments of 2 seconds and 2 audio segments of 1.92 seconds are enqueued
+    Then The buffer level is 3.84 seconds
+
+  Scenario: Playback can't go past a gap
+    Given We have a timeline buffer manager
+    When Video segments from 0 to 2 seconds and from 4 to 6 seconds are enqueued
+    Then The buffer level is 2 seconds
+    When The position moves to 4 seconds
+    Then The buffer level is 2 seconds
+
+  Scenario: Played ranges are pruned on a long session
+    Given We have a timeline buffer manager
+    When 24 hours of segments are enqueued and played
+    Then At most 1 range per adaptation set is kept
+
+  Scenario: The bytes of a segment are evicted once it is played back
+    Given We have a timeline buffer manager
+    When 3 video segments of 2 seconds and 1000 bytes are enqueued
+    And The playback goes on for 3 seconds
+    Then The buffer holds 2000 bytes and the next eviction is in 1 second
+
+  Scenario: The scheduler keeps the buffer within a byte budget
+    Given We have an MPD of 30 segments of 2 seconds
+    When The session is simulated with a budget of 2000000 bytes and 30 seconds over a 20 Mbps trace
+    Then The buffer never goes over 2000000 bytes
+    And The buffer level stays below 6 seconds
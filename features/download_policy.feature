@@ -0,0 +1,41 @@
+Feature: Retry and abandon segment downloads
+
+  Scenario: Retry a failed segment download
+    Given We have a scheduler whose download manager fails the first 2 attempts of each request
+    When The scheduler downloads the first segment index
+    Then Each request is retried until it succeeds
+
+  Scenario: Abort and retry a segment download stalling past its deadline
+    Given We have a scheduler downloading from a local server which stalls the first request of each path
+    When The scheduler downloads the first segment index from the stalling server
+    Then Each stalled request is aborted and retried until it succeeds
+
+  Scenario: Abandon a segment download which would drain the buffer
+    Given We have an abandonment policy watching a download of a 1000000 bytes segment
+    When The download progresses at 100000 bytes per second with 1 second of buffer
+    Then The download is abandoned in favor of a lower representation
+
+  Scenario: Give up a segment download after the last retry
+    Given We have a scheduler whose download manager fails the first 10 attempts of each request
+    When The scheduler runs until the end
+    Then The buffer does not grow
+
+  Scenario: Fall back to the lowest representation when a segment download fails
+    Given We have a scheduler whose download manager always fails the requests of the highest representation
+    When The scheduler downloads the first segment index
+    Then The segment is downloaded from the lowest representation
+
+  Scenario: Skip a segment the lowest representation doesn't have
+    Given We have a scheduler whose download manager always fails the requests of the highest representation, whose lowest one has 0 segments
+    When The scheduler runs until the end
+    Then The segments are skipped without an error
+
+  Scenario: End the stream when a segment download fails without a retry policy
+    Given We have a scheduler without a retry policy whose download manager fails every request
+    When The scheduler runs until the end
+    Then The stream ends on the download error
+
+  Scenario: Build players with the retry and abandonment policies only when they are configured
+    Given We have an MPD of 2 segments
+    When Players are built with the default config and with the policies enabled
+    Then Only the players built with the policies enabled retry and abandon downloads
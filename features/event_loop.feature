@@ -0,0 +1,16 @@
+Feature: Select the event loop implementation
+
+  Scenario Outline: Download a segment on the selected event loop
+    Given We have a local server serving 100000 bytes
+    When The segment is downloaded on the <loop> event loop
+    Then The download runs on the <loop> event loop
+    And The whole segment is downloaded
+
+    Examples:
+      | loop    |
+      | asyncio |
+      | uvloop  |
+
+  Scenario: Select uvloop automatically when it is installed
+    Given The event loop of the config is auto
+    Then The event loop resolves to uvloop if it is installed and to asyncio otherwise
@@ -0,0 +1,22 @@
+Feature: Run many players in one process
+
+  Scenario: A fleet of players shares one MPD and one connection pool
+    Given We have a local origin serving an MPD of 4 segments of 0.5 seconds
+    When A fleet of 20 players plays it with staggered starts
+    Then All the players finish without errors
+    And The MPD is downloaded only once
+    And The players reuse the connections of the pool
+    And The QoE of every player is written to the sink
+
+  Scenario: A fleet sharded over worker processes reports live counters from shared memory
+    Given We have a local origin serving an MPD of 4 segments of 0.5 seconds
+    When A fleet of 20 players sharded over 2 processes plays it
+    Then All the players are counted as finished
+    And The bytes of all the segments are counted
+    And Live reports are delivered while the players run
+    And No player is left in the bitrate histogram
+
+  Scenario: A player of the fleet whose scheduler fails is counted as failed
+    Given We have a local origin serving an MPD of 4 segments of 0.5 seconds
+    When A fleet of 4 players plays it, and the scheduler of the second player fails
+    Then 3 players finish and the second player fails
@@ -2,4 +2,33 @@ Feature: Download using HTTP GET requests
   Scenario: Download Google's Logo
     Given We have an HTTP download manager
     When The HTTP download manager starts to download Google's Logo
-    Then It is downloaded and also called listeners
\ No newline at end of file
+    Then It is downloaded and also called listeners
+
+  Scenario: Cancel one of two concurrent downloads
+    Given We have an HTTP download manager and a local HTTP server
+    When Two downloads start and the first one gets canceled
+    Then Only the first download is canceled
+
+
+  Scenario: Receive the content into a preallocated buffer
+    Given We have receive buffers with a right, a wrong and no size hint
+    When The same chunks are written into the buffers
+    Then All the buffers hold the same content
+
+
+  Scenario: Coalesce the progress events
+    Given We have an HTTP download manager delivering progress every 50000 bytes
+    When A download of 200000 bytes completes
+    Then The progress events are coalesced and add up to the content length
+
+
+  Scenario: Clean up a download whose connection drops
+    Given We have an HTTP download manager writing to the disk and a cache, measured by a concurrent bandwidth meter
+    When A download of 100000 bytes loses its connection after 20000 bytes
+    Then The download fails and leaves no partial files or running transfers behind
+
+
+  Scenario: Set the socket options when a pooled connection is created
+    Given We have a local HTTP server
+    When A request is sent through a session pool with TCP_NODELAY on and another one with it off
+    Then The sockets of both pools have TCP_NODELAY as configured
@@ -13,4 +13,51 @@ Feature: Parse MPD files
   Scenario: Parse a simple Representation
     Given We have the XML tree of a representation
     When nothing
-    Then The Representation gets parsed right
\ No newline at end of file
+    Then The Representation gets parsed right
+
+  Scenario: The streaming parser gives the same MPD as the default parser
+    Given We have the MPD file content
+    When The MPD is parsed by both parsers, the streaming one in chunks of 100 characters
+    Then The MPDs are the same
+
+  Scenario: Compile the identifiers of a SegmentTemplate
+    Given We have the media pattern "$RepresentationID$/$Bandwidth$/%20$Time$-$Number%05d$$$.m4s"
+    When The media pattern is compiled for the representation "v1" of 500000 bps
+    Then The URL of the segment 7 at 12000 is "v1/500000/%2012000-00007$.m4s"
+
+  Scenario: Parse an MPD with a prefixed namespace and a SegmentTemplate in the AdaptationSet
+    Given We have the content of an MPD with a prefixed namespace and a segment duration in the AdaptationSet
+    When The MPD is parsed by the streaming parser
+    Then The representations share the SegmentTemplate of the AdaptationSet
+
+  Scenario: Reject a segment duration in an MPD without a presentation duration
+    Given We have the content of an MPD with a prefixed namespace and a segment duration in the AdaptationSet
+    And The MPD has no presentation duration
+    Then The streaming parser rejects the MPD
+
+  Scenario: A segment timeline computes the segments on access
+    Given We have a segment timeline of 3 and 2 segments of 2 seconds, then 2 segments of 1 second after a gap
+    Then The segments are computed from their index
+    And The segments are found by their time
+    And Indexes and times past the end are out of range
+
+  Scenario: The sizes of the segments of a timeline are computed on lookup
+    Given We have the MPD file content
+    When The MPD is parsed by the streaming parser
+    Then The segment sizes are computed on lookup
+
+  Scenario: The sizes of the segments of a template by time are computed on lookup
+    Given We have the content of an MPD with a prefixed namespace and a segment duration in the AdaptationSet
+    When The MPD is parsed by the streaming parser
+    Then The segment sizes are computed on lookup
+
+  Scenario: Play an MPD with segment timelines
+    Given We have the MPD file content
+    When The MPD parsed by the streaming parser is played in a simulation
+    Then All the segments of the MPD are downloaded
+
+  Scenario: A parsed MPD is read-only and doesn't keep the raw content
+    Given We have the MPD file content
+    When The MPD is parsed by the streaming parser
+    Then The MPD doesn't keep the raw content
+    And The MPD objects can't be changed
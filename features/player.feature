@@ -0,0 +1,17 @@
+Feature: Drive the playback
+
+  Scenario: The event driven player switches states like the polling player
+    Given We have an MPD of 30 segments of 2 seconds and a trace with an outage
+    When The session is simulated with a polling player and with an event driven player
+    Then Both players switch states in the same order at about the same time
+    And The event driven player wakes up far less often
+
+  Scenario: Sample the buffer level at a fixed interval
+    Given We have an MPD of 30 segments of 2 seconds and a trace with an outage
+    When The session is simulated with an event driven player sampling the buffer level every 1 second
+    Then The buffer level events are 1 second apart
+
+  Scenario: The polling player is the default and delivers the buffer level on every wake-up
+    Given We have an MPD of 30 segments of 2 seconds and a trace with an outage
+    When The session is simulated with the player of the default config
+    Then The player polls and delivers the buffer level every update interval
@@ -0,0 +1,24 @@
+Feature: Schedule segment downloads
+
+  Scenario: Download the segments of all adaptation sets concurrently
+    Given We have a scheduler with 2 adaptation sets and 4 concurrent downloads
+    When The scheduler downloads the first segment index
+    Then All the requests of the segment index run at the same time
+
+  Scenario: Download the segments of all adaptation sets one by one
+    Given We have a scheduler with 2 adaptation sets and 1 concurrent downloads
+    When The scheduler downloads the first segment index
+    Then The requests of the segment index run one by one
+
+
+  Scenario: Save the downloaded segments to the output folder
+    Given We have a scheduler saving segments to an output folder
+    When The scheduler downloads the first segment index
+    Then The segments and the index file are in the output folder
+
+  Scenario: Replace the index of a previous run in the same output folder
+    Given We have a scheduler saving segments to an output folder
+    When The scheduler downloads the first segment index
+    And A new scheduler saving to the same output folder downloads the first segment index
+    Then The segments and the index file are in the output folder
+    And The index file lists every file once
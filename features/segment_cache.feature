@@ -0,0 +1,12 @@
+Feature: Cache the segments on the disk
+
+  Scenario: Serve a repeated request from the cache at the emulated throughput
+    Given We have an HTTP download manager with a segment cache replaying at 8000000 bps
+    When The same segment of 100000 bytes is downloaded twice
+    Then The second download is served from the cache at the emulated throughput
+
+  Scenario: Evict the least recently used segments and survive a restart
+    Given We have a segment cache of 250000 bytes
+    When 3 segments of 100000 bytes are added to the cache
+    Then The least recently used segment is evicted
+    Then The cache is restored after a restart
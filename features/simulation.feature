@@ -0,0 +1,18 @@
+Feature: Simulate sessions in virtual time
+
+  Scenario: Transfer times follow the bandwidth trace
+    Given We have a simulated download manager over a trace of 4 Mbps for 1 second then 8 Mbps
+    When A 1500000 bytes segment is downloaded in virtual time
+    Then The download takes 2 seconds of virtual time
+
+  Scenario: Simulate a 1-hour session in virtual time
+    Given We have an MPD of 1800 segments of 2 seconds
+    When The session is simulated over a 5 Mbps trace in virtual time
+    Then The session ends after 1 hour of virtual time
+    And The simulation takes a few seconds of wall time
+
+  Scenario: Virtual time gives the same state transitions as real time
+    Given We have an MPD of 6 segments of 0.2 seconds
+    When The session is simulated over a 2 Mbps trace in virtual time
+    And The session is simulated over a 2 Mbps trace in real time
+    Then Both sessions have the same state transitions
@@ -0,0 +1,298 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from behave import *
+
+from dash_emulator.clock import run_in_virtual_time, EventLoopClock
+from dash_emulator.config import Config
+from dash_emulator.models import MPD, AdaptationSet, Representation, Segment
+from dash_emulator.player_factory import ABR_CONTROLLERS, build_abr_controller, build_simulated_dash_player
+from dash_emulator.qoe import QoECollector
+from dash_emulator.trace import BandwidthTrace
+
+use_step_matcher("re")
+
+
+def build_controller(name, bandwidth, buffer_level):
+    bandwidth_meter = MagicMock()
+    bandwidth_meter.bandwidth = bandwidth
+    buffer_manager = MagicMock()
+    buffer_manager.buffer_level = buffer_level
+    return build_abr_controller(name, bandwidth_meter, buffer_manager), buffer_manager
+
+
+@when("The \"(?P<name>[\\w-]+)\" ABR controller chooses the video representation from an empty buffer to the buffer "
+      "target")
+def step_impl(context, name):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    name : str
+    """
+    controller, buffer_manager = build_controller(name, 0, 0)
+    context.args.selections = []
+    for i in range(int(Config.bola_buffer_target * 10) + 1):
+        buffer_manager.buffer_level = i / 10
+        context.args.selections.append(controller.update_selection(context.args.mpd.adaptation_sets)[0])
+
+
+@then("The lowest representation is chosen from an empty buffer")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.selections[0] == 0
+
+
+@then("The highest representation is chosen at the buffer target")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.selections[-1] == 2
+
+
+@then("The chosen representations never go down as the buffer fills")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.selections == sorted(context.args.selections)
+    assert 1 in context.args.selections
+
+
+@when("The \"(?P<name>[\\w-]+)\" ABR controller chooses the video representation at 2 Mbps as the buffer fills up "
+      "to 1 second")
+def step_impl(context, name):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    name : str
+    """
+    controller, buffer_manager = build_controller(name, 2000000, 0)
+    context.args.selections = []
+    for i in range(11):
+        buffer_manager.buffer_level = i / 10
+        context.args.selections.append(controller.update_selection(context.args.mpd.adaptation_sets)[0])
+
+
+@then("The 1 Mbps representation is chosen from an empty buffer")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    # 70% of 2 Mbps, 80% of it for the video
+    assert context.args.selections[0] == 1
+
+
+@then("The 1 Mbps representation is kept as the buffer fills")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert set(context.args.selections) == {1}
+
+
+@when("The \"(?P<name>[\\w-]+)\" ABR controller chooses the video representation at (?P<bandwidth>\\d+) Mbps with "
+      "(?P<buffer_level>\\d+) seconds of buffer")
+def step_impl(context, name, bandwidth, buffer_level):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    name : str
+    bandwidth : str
+    buffer_level : str
+    """
+    controller, _ = build_controller(name, int(bandwidth) * 1000000, int(buffer_level))
+    context.args.controller = controller
+    context.args.selections = getattr(context.args, "selections", [])
+    context.args.selections.append(controller.update_selection(context.args.mpd.adaptation_sets)[0])
+
+
+@when("The MPD tells that the segments of the highest representation are (?P<size>\\d+) MB")
+def step_impl(context, size):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    size : str
+    """
+    # The MPD objects are immutable, so the MPD is built again with the sizes
+    mpd = context.args.mpd
+    video = mpd.adaptation_sets[0]
+    representations = dict(video.representations)
+    highest = representations[2]
+    representations[2] = Representation(highest.id, highest.mime_type, highest.codecs, highest.bandwidth,
+                                        highest.width, highest.height, highest.initialization,
+                                        [Segment(segment.url, segment.duration, int(size) * 1000000)
+                                         for segment in highest.segments])
+    adaptation_sets = dict(mpd.adaptation_sets)
+    adaptation_sets[0] = AdaptationSet(video.id, video.content_type, video.frame_rate, video.max_width,
+                                       video.max_height, video.par, representations)
+    context.args.mpd = MPD(mpd.content, mpd.url, mpd.type, mpd.media_presentation_duration, mpd.max_segment_duration,
+                           mpd.min_buffer_time, adaptation_sets)
+
+
+@then("The highest representation is chosen without the sizes, and a lower one with them")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.selections[0] == 2
+    assert context.args.selections[1] < 2
+
+
+@when("The \"(?P<name>[\\w-]+)\" ABR controller chooses the video representation twice more")
+def step_impl(context, name):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    name : str
+    """
+    # The first decision had no last representation
+    context.args.controller.update_selection(context.args.mpd.adaptation_sets)
+    planner = context.args.controller._planners[0]
+    context.args.num_decisions = len(planner._decisions)
+    solve = planner._solve
+    calls = []
+
+    def count_solve(*args):
+        calls.append(args)
+        return solve(*args)
+
+    planner._solve = count_solve
+    context.args.selections.append(context.args.controller.update_selection(context.args.mpd.adaptation_sets)[0])
+    context.args.solve_calls = calls
+
+
+@when("The \"(?P<name>[\\w-]+)\" ABR controller chooses the video representation at (?P<num>\\d+) other bandwidths, "
+      "with memo tables of (?P<size>\\d+) entries")
+def step_impl(context, name, num, size):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    name : str
+    num : str
+    size : str
+    """
+    controller = context.args.controller
+    planner = controller._planners[0]
+    planner.MEMO_SIZE = int(size)
+    for i in range(int(num)):
+        controller.bandwidth_meter.bandwidth = 100000 * (i + 1)
+        controller.update_selection(context.args.mpd.adaptation_sets)
+
+
+@then("The memo tables are capped at (?P<size>\\d+) entries")
+def step_impl(context, size):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    size : str
+    """
+    planner = context.args.controller._planners[0]
+    assert len(planner._decisions) == int(size)
+    assert len(planner._values) == int(size)
+
+
+@then("The last decision is looked up in the decision table")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.solve_calls == []
+    assert len(context.args.controller._planners[0]._decisions) == context.args.num_decisions
+    assert context.args.selections[0] == context.args.selections[1]
+
+
+@given("We have the names of all the ABR algorithms")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args = SimpleNamespace()
+    context.args.names = list(ABR_CONTROLLERS)
+
+
+@then("An ABR controller is built for every name")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert {"dash", "bola", "bola-o", "mpc", "robust-mpc"} <= set(context.args.names)
+    for name in context.args.names:
+        controller, _ = build_controller(name, 0, 0)
+        assert controller is not None
+    controller, _ = build_controller("bola-o", 0, 0)
+    assert controller.placeholder and controller.oscillation_control
+    controller, _ = build_controller("robust-mpc", 0, 0)
+    assert controller.robust
+
+
+@then("An unknown name raises a ValueError")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    try:
+        build_controller("foo", 0, 0)
+    except ValueError:
+        return
+    assert False
+
+
+@when("The session is simulated with the \"(?P<abr>[\\w-]+)\" ABR algorithm over a (?P<bandwidth>\\d+) Mbps trace"
+      "(?:, with a horizon of (?P<horizon>[\\d.]+) segments)?")
+def step_impl(context, abr, bandwidth, horizon=None):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    abr : str
+    bandwidth : str
+    horizon : str, optional
+    """
+    mpd = context.args.mpd
+    qoe = QoECollector(mpd, EventLoopClock())
+    abr_params = {"horizon": float(horizon), "error_window": float(horizon)} if horizon is not None else None
+    player = build_simulated_dash_player(mpd, BandwidthTrace.constant(int(bandwidth) * 1000000), [qoe], abr_params,
+                                         abr=abr)
+    run_in_virtual_time(player.start(mpd.url))
+    context.args.qoe = qoe.result()
+
+
+@then("The session ends without rebuffering at more than 1 Mbps on average")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.qoe["rebuffer_count"] == 0
+    assert context.args.qoe["average_bitrate"] > 1000000
@@ -3,7 +3,14 @@ from types import SimpleNamespace
 
 from behave import *
 
-from dash_emulator.bandwidth import BandwidthMeterImpl, BandwidthUpdateListener
+from dash_emulator.bandwidth import BandwidthMeterImpl, BandwidthUpdateListener, HarmonicMeanBandwidthMeter, \
+    DualEwmaBandwidthMeter, SampleBandwidthMeter, ConcurrentBandwidthMeter
+from dash_emulator.clock import ManualClock, EventLoopClock, run_in_virtual_time
+from dash_emulator.config import Config
+from dash_emulator.player_factory import build_simulated_dash_player
+from dash_emulator.qoe import QoECollector
+from dash_emulator.ring_buffer import RingBuffer
+from dash_emulator.trace import BandwidthTrace
 
 use_step_matcher("re")
 
@@ -130,3 +137,327 @@ def step_impl(context):
     """
     bandwidth_meter: BandwidthMeterImpl = context.args.bandwidth_meter
     assert abs(bandwidth_meter.bandwidth - 60000) < 1000
+
+
+@given("We have a ring buffer of (?P<capacity>\\d+) values")
+def step_impl(context, capacity):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    capacity : str
+    """
+    context.args = SimpleNamespace()
+    context.args.ring_buffer = RingBuffer(int(capacity))
+
+
+@when("(?P<num>\\d+) values are appended to the ring buffer")
+def step_impl(context, num):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    num : str
+    """
+    context.args.evicted = [context.args.ring_buffer.append(i) for i in range(int(num))]
+
+
+@then("The ring buffer holds the last 3 values from the oldest one")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    ring_buffer = context.args.ring_buffer
+    assert len(ring_buffer) == 3
+    assert list(ring_buffer) == [2, 3, 4]
+    assert ring_buffer[0] == 2 and ring_buffer[-1] == 4
+
+
+@then("The evicted values are returned")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.evicted == [None, None, None, 0, 1]
+
+
+def transfer(bandwidth_meter, clock, bandwidth, duration, url="http://foo.bar"):
+    """
+    Feed a transfer at a constant bandwidth to a bandwidth meter, in 10 progress events
+    """
+
+    async def feed():
+        await bandwidth_meter.on_transfer_start(url)
+        size = int(bandwidth * duration / 8)
+        for i in range(10):
+            clock.advance(duration / 10)
+            await bandwidth_meter.on_bytes_transferred(size // 10, url, (i + 1) * (size // 10), size)
+        await bandwidth_meter.on_transfer_end(size, url)
+
+    asyncio.run(feed())
+
+
+@given("We have a harmonic mean bandwidth meter of (?P<window>\\d+) transfers")
+def step_impl(context, window):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    window : str
+    """
+    context.args = SimpleNamespace()
+    context.args.clock = ManualClock()
+    context.args.bandwidth_meter = HarmonicMeanBandwidthMeter(1000000, int(window), [], context.args.clock)
+
+
+@when("Transfers at 1 Mbps, 4 Mbps and 8 Mbps complete")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    for bandwidth in [1000000, 4000000, 8000000]:
+        transfer(context.args.bandwidth_meter, context.args.clock, bandwidth, 1)
+
+
+@then("The bandwidth is the harmonic mean of 4 Mbps and 8 Mbps")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert abs(context.args.bandwidth_meter.bandwidth - 2 / (1 / 4000000 + 1 / 8000000)) < 1
+
+
+@given("We have a dual EWMA bandwidth meter")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args = SimpleNamespace()
+    context.args.clock = ManualClock()
+    context.args.bandwidth_meter = DualEwmaBandwidthMeter(1000000, 2, 5, 5, [], context.args.clock)
+
+
+@when("Transfers at (?P<first>\\d+) Mbps for (?P<first_duration>\\d+) seconds then at (?P<second>\\d+) Mbps for "
+      "(?P<second_duration>\\d+) seconds complete")
+def step_impl(context, first, first_duration, second, second_duration):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    first : str
+    first_duration : str
+    second : str
+    second_duration : str
+    """
+    transfer(context.args.bandwidth_meter, context.args.clock, int(first) * 1000000, int(first_duration))
+    transfer(context.args.bandwidth_meter, context.args.clock, int(second) * 1000000, int(second_duration))
+
+
+@then("The bandwidth drops to the fast average")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    # Half of the fast average comes from the last 2 seconds
+    assert abs(context.args.bandwidth_meter.bandwidth - 5500000) < 200000
+
+
+@then("The bandwidth rises to the slow average")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    # The fast average is at 5.5 Mbps, but a quarter of the slow one only comes from the last 2 seconds
+    assert 1000000 < context.args.bandwidth_meter.bandwidth < 4000000
+
+
+@given("We have a sample bandwidth meter")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args = SimpleNamespace()
+    context.args.clock = ManualClock()
+    context.args.bandwidth_meter = SampleBandwidthMeter(1000000, 100, [], clock=context.args.clock)
+
+
+@when("A transfer receives 1 MB at 8 Mbps then 1 MB at 2 Mbps")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    bandwidth_meter = context.args.bandwidth_meter
+    clock = context.args.clock
+    url = "http://foo.bar"
+
+    async def feed():
+        await bandwidth_meter.on_transfer_start(url)
+        position = 0
+        for bandwidth in [8000000, 2000000]:
+            for _ in range(10):
+                clock.advance(100000 * 8 / bandwidth)
+                position += 100000
+                await bandwidth_meter.on_bytes_transferred(100000, url, position, 2000000)
+                # Another progress event at the same time counts in the next sample
+                await bandwidth_meter.on_bytes_transferred(0, url, position, 2000000)
+        await bandwidth_meter.on_transfer_end(2000000, url)
+
+    asyncio.run(feed())
+
+
+@then("The bandwidth is the bytes of the samples over their durations")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    # 2 MB in 1 + 4 seconds
+    assert abs(context.args.bandwidth_meter.bandwidth - 3200000) < 1
+    assert len(context.args.bandwidth_meter.durations) == 20
+
+
+@then("The percentiles of the samples are the throughputs of the slow and the fast halves")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    bandwidth_meter = context.args.bandwidth_meter
+    bandwidth_meter.percentile = 25
+    bandwidth_meter._update_bandwidth()
+    assert abs(bandwidth_meter.bandwidth - 2000000) < 1
+    bandwidth_meter.percentile = 75
+    bandwidth_meter._update_bandwidth()
+    assert abs(bandwidth_meter.bandwidth - 8000000) < 1
+
+
+@given("We have a concurrent bandwidth meter")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args = SimpleNamespace()
+    context.args.clock = ManualClock()
+    context.args.bandwidth_meter = ConcurrentBandwidthMeter(1000000, 10, [], clock=context.args.clock)
+
+
+@when("Two overlapping transfers of 1 MB and a later one of 1 MB share an 8 Mbps link")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    # A runs alone for 0.5 s, then shares the link with B until it ends at 1.5 s, then B runs alone until 2 s.
+    # The link is idle for 1 s, then C runs alone for 1 s.
+    events = [(0, "start", "A", 0), (0.5, "bytes", "A", 500000), (0.5, "start", "B", 0),
+              (1, "bytes", "A", 250000), (1, "bytes", "B", 250000), (1.5, "bytes", "A", 250000), (1.5, "end", "A", 0),
+              (1.5, "bytes", "B", 250000), (2, "bytes", "B", 500000), (2, "end", "B", 0),
+              (3, "start", "C", 0), (3.5, "bytes", "C", 500000), (4, "bytes", "C", 500000), (4, "end", "C", 0)]
+
+    async def feed(bandwidth_meter, clock):
+        for time_, event, url, length in events:
+            clock.advance(time_ - clock.time())
+            if event == "start":
+                await bandwidth_meter.on_transfer_start(url)
+            elif event == "bytes":
+                await bandwidth_meter.on_bytes_transferred(length, url, 0, 1000000)
+            else:
+                await bandwidth_meter.on_transfer_end(1000000, url)
+
+    asyncio.run(feed(context.args.bandwidth_meter, context.args.clock))
+    context.args.default_clock = ManualClock()
+    context.args.default_bandwidth_meter = BandwidthMeterImpl(1000000, 0.5, [], context.args.default_clock)
+    asyncio.run(feed(context.args.default_bandwidth_meter, context.args.default_clock))
+
+
+@when("Two overlapping transfers of the same 1 MB segment, one without progress, and a later one of 1 MB share an "
+      "8 Mbps link")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    # The same timeline as the overlapping transfers, but B downloads the same URL as A, e.g. a retry, and reports no
+    # progress until it ends
+    events = [(0, "start", "A", 0, 0), (0.5, "bytes", "A", 500000, 500000), (0.5, "start", "A", 0, 0),
+              (1, "bytes", "A", 250000, 750000), (1.5, "bytes", "A", 250000, 1000000), (1.5, "end", "A", 0, 0),
+              (2, "end", "A", 0, 0), (3, "start", "C", 0, 0), (3.5, "bytes", "C", 500000, 500000),
+              (4, "bytes", "C", 500000, 1000000), (4, "end", "C", 0, 0)]
+
+    async def feed(bandwidth_meter, clock):
+        for time_, event, url, length, position in events:
+            clock.advance(time_ - clock.time())
+            if event == "start":
+                await bandwidth_meter.on_transfer_start(url)
+            elif event == "bytes":
+                await bandwidth_meter.on_bytes_transferred(length, url, position, 1000000)
+            else:
+                await bandwidth_meter.on_transfer_end(1000000, url)
+
+    asyncio.run(feed(context.args.bandwidth_meter, context.args.clock))
+
+
+@then("The bandwidth is the bandwidth of the link")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert abs(context.args.bandwidth_meter.bandwidth - 8000000) < 1
+
+
+@then("A meter timing each transfer on its own underestimates it")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.default_bandwidth_meter.bandwidth < 0.8 * 8000000
+
+
+@when("The session is simulated with the \"(?P<estimator>[\\w-]+)\" bandwidth estimator over a (?P<bandwidth>\\d+) "
+      "Mbps trace")
+def step_impl(context, estimator, bandwidth):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    estimator : str
+    bandwidth : str
+    """
+    mpd = context.args.mpd
+    qoe = QoECollector(mpd, EventLoopClock())
+    bandwidth_estimator = Config.bandwidth_estimator
+    Config.bandwidth_estimator = estimator
+    try:
+        player = build_simulated_dash_player(mpd, BandwidthTrace.constant(int(bandwidth) * 1000000), [qoe])
+        run_in_virtual_time(player.start(mpd.url))
+    finally:
+        Config.bandwidth_estimator = bandwidth_estimator
+    context.args.qoe = qoe.result()
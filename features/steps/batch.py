@@ -0,0 +1,181 @@
+import gc
+import json
+import logging
+import os
+import tempfile
+from inspect import cleandoc
+from types import SimpleNamespace
+
+from behave import *
+
+from dash_emulator.batch import BatchRunner, build_sessions, run_session
+from dash_emulator.config import Config
+from features.steps.mpd_parsing import mpd_content_using_segment_template
+
+use_step_matcher("re")
+
+
+def read_results(output):
+    results = dict()
+    with open(output) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            results[result["key"]] = result
+    return results
+
+
+@given("We have an MPD file, 2 bandwidth traces and 2 values of panic buffer")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args = SimpleNamespace()
+    context.args.folder = tempfile.TemporaryDirectory()
+    folder = context.args.folder.name
+    mpd_path = os.path.join(folder, "output.mpd")
+    with open(mpd_path, 'w') as f:
+        f.write(cleandoc(mpd_content_using_segment_template))
+    traces = []
+    for name, content in [("fast.txt", "10 5000000\n"), ("slow.txt", "# duration bandwidth\n2 300000\n2 1000000\n")]:
+        traces.append(os.path.join(folder, name))
+        with open(traces[-1], 'w') as f:
+            f.write(content)
+    context.args.sessions = build_sessions([mpd_path], traces, {"panic_buffer": [1, 2]})
+    context.args.output = os.path.join(folder, "results.jsonl")
+    context.args.progress = []
+
+
+@given("One of the values of panic buffer is not a number")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    # The DASH ABR controller only compares the buffer level to it after the first segment, in the scheduler
+    for session in context.args.sessions:
+        if session["abr_params"]["panic_buffer"] == 2:
+            session["abr_params"]["panic_buffer"] = "two"
+
+
+@given("The sweep was interrupted after 2 sessions")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    BatchRunner(context.args.output, 1).run(context.args.sessions[:2])
+    with open(context.args.output, 'a') as f:
+        f.write('{"key": "torn')
+
+
+@when("The sweep runs on 2 processes")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    runner = BatchRunner(context.args.output, 2, progress=lambda done, total: context.args.progress.append(total))
+    context.args.num_failed = runner.run(context.args.sessions)
+
+
+@then("Only the 2 remaining sessions are run")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.progress == [2, 2]
+
+
+@then("There is one result with QoE metrics for each of the 4 sessions")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.num_failed == 0
+    results = read_results(context.args.output)
+    assert set(results.keys()) == set(session["key"] for session in context.args.sessions)
+    for result in results.values():
+        assert "error" not in result
+        assert result["qoe"]["startup_delay"] > 0
+        assert result["qoe"]["average_bitrate"] > 0
+        # The segments last 18.97s in total
+        assert result["qoe"]["session_duration"] > 18.9
+    context.args.folder.cleanup()
+
+
+@then("The sessions with that value have an error result, and the others have QoE metrics")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.num_failed == 2
+    results = read_results(context.args.output)
+    assert len(results) == 4
+    for result in results.values():
+        if result["abr_params"]["panic_buffer"] == "two":
+            assert result["error"].startswith("TypeError")
+            assert "qoe" not in result
+        else:
+            assert "error" not in result
+            assert result["qoe"]["session_duration"] > 18.9
+    context.args.folder.cleanup()
+
+
+@when("The first session runs with a limit of (?P<limit>\\d+) seconds of virtual time")
+def step_impl(context, limit):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    limit : str
+    """
+    # The tasks left pending are reported through the asyncio logger when they are garbage collected
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logging.getLogger("asyncio").addHandler(handler)
+    max_session_duration = Config.simulation_max_session_duration
+    Config.simulation_max_session_duration = int(limit)
+    try:
+        context.args.result = run_session(context.args.sessions[0])
+        gc.collect()
+    finally:
+        Config.simulation_max_session_duration = max_session_duration
+        logging.getLogger("asyncio").removeHandler(handler)
+    context.args.asyncio_messages = [record.getMessage() for record in records]
+
+
+@then("Its result is a timeout error")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.result["error"].startswith("TimeoutError")
+    assert "qoe" not in context.args.result
+    context.args.folder.cleanup()
+
+
+@then("No task of the session is left pending")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert not any("Task was destroyed but it is pending" in message for message in context.args.asyncio_messages)
@@ -0,0 +1,133 @@
+import pickle
+import random
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from behave import *
+
+from dash_emulator.abr import DashABRController
+from dash_emulator.models import AdaptationSet, Representation
+from features.steps.simulation import build_mpd
+
+use_step_matcher("re")
+
+
+def scan(adaptation_set, bw):
+    """
+    Pick a representation by scanning the representations sorted by descending bandwidth
+    """
+    representations = sorted(adaptation_set.representations.values(), key=lambda x: x.bandwidth, reverse=True)
+    representation = None
+    for representation in representations:
+        if representation.bandwidth < bw:
+            return representation.id
+    return representation.id
+
+
+@given("We have 200 random adaptation sets with repeated bitrates")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args = SimpleNamespace()
+    rng = random.Random(16)
+    context.args.rng = rng
+    context.args.adaptation_sets = []
+    for _ in range(200):
+        ids = rng.sample(range(100), rng.randint(1, 8))
+        representations = {id_: Representation(id_, "video/mp4", "avc1", rng.choice([100, 200, 300, 400]) * 1000,
+                                               640, 360, "init.m4s", []) for id_ in ids}
+        context.args.adaptation_sets.append(AdaptationSet(0, "video", "30/1", 640, 360, "16:9", representations))
+
+
+@when("Representations are picked for random bandwidths")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    rng = context.args.rng
+    context.args.picks = []
+    for adaptation_set in context.args.adaptation_sets:
+        for bw in [rng.choice([100, 200, 300, 400, 500]) * 1000, rng.uniform(0, 500000)]:
+            context.args.picks.append((adaptation_set, bw, adaptation_set.ladder.select(bw)))
+
+
+@then("The ladder picks the highest representation under the bandwidth, the first listed among equal ones")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    for adaptation_set, bw, picked in context.args.picks:
+        assert picked == scan(adaptation_set, bw)
+        assert DashABRController.choose_ideal_selection(adaptation_set, bw) == picked
+
+
+@then("The ladder picks the lowest representation, the last listed among equal ones, under every bandwidth")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    for adaptation_set in context.args.adaptation_sets:
+        assert adaptation_set.ladder.select(0) == scan(adaptation_set, 0)
+        assert list(adaptation_set.ladder.bandwidths) == sorted(adaptation_set.ladder.bandwidths)
+
+
+@given("We have an MPD of 1 video and 1 audio adaptation sets")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args = SimpleNamespace()
+    context.args.mpd = build_mpd(10, 2.0)
+
+
+@when("The ABR controller updates the selections 3 times")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    bandwidth_meter = MagicMock()
+    bandwidth_meter.bandwidth = 2000000
+    buffer_manager = MagicMock()
+    buffer_manager.buffer_level = 3
+    controller = DashABRController(2, 4, bandwidth_meter, buffer_manager)
+    context.args.selections = [controller.update_selection(context.args.mpd.adaptation_sets) for _ in range(3)]
+    # The same adaptation sets, without the counts of the MPD
+    context.args.dict_selections = controller.update_selection(dict(context.args.mpd.adaptation_sets))
+
+
+@then("The MPD counts 1 video and 1 audio adaptation sets")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    adaptation_sets = context.args.mpd.adaptation_sets
+    assert (adaptation_sets.num_videos, adaptation_sets.num_audios) == (1, 1)
+    copy = pickle.loads(pickle.dumps(context.args.mpd))
+    assert (copy.adaptation_sets.num_videos, copy.adaptation_sets.num_audios) == (1, 1)
+
+
+@then("The ABR controller splits the bandwidth by the counts of the MPD")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    # 70% of 2 Mbps, 80% of it for the video: the 1 Mbps representation
+    assert context.args.selections[-1] == {0: 1, 1: 0}
+    assert context.args.dict_selections == {0: 1, 1: 0}
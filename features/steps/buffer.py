@@ -0,0 +1,340 @@
+import bisect
+import random
+from types import SimpleNamespace
+
+from behave import *
+
+from dash_emulator.buffer import TimelineBufferManager
+from dash_emulator.clock import ManualClock, run_in_virtual_time
+from dash_emulator.config import Config
+from dash_emulator.intervals import IntervalSet
+from dash_emulator.player import PlayerEventListener
+from dash_emulator.player_factory import build_simulated_dash_player
+from dash_emulator.scheduler import SchedulerEventListener
+from dash_emulator.trace import BandwidthTrace
+
+use_step_matcher("re")
+
+
+@given("We have an empty interval set")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args = SimpleNamespace()
+    context.args.intervals = IntervalSet()
+
+
+@when("The ranges 4-6, 0-2, 2-4, 8-10 and 9-12 are added")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    for start, end in [(4, 6), (0, 2), (2, 4), (8, 10), (9, 12)]:
+        context.args.intervals.add(start, end)
+
+
+@then("The interval set holds the ranges 0-6 and 8-12")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    intervals = context.args.intervals
+    assert list(intervals) == [(0, 6), (8, 12)]
+    assert intervals.end_from(3) == 6
+    assert intervals.end_from(7) is None
+    assert intervals.end == 12
+
+
+class SortedListIntervals(object):
+    """
+    Disjoint ranges kept in two sorted lists of starts and ends, changed by slicing
+    """
+
+    def __init__(self, tolerance):
+        self.tolerance = tolerance
+        self.starts = []
+        self.ends = []
+
+    def add(self, start, end):
+        if end <= start:
+            return
+        first = bisect.bisect_left(self.ends, start - self.tolerance)
+        last = bisect.bisect_right(self.starts, end + self.tolerance)
+        if first < last:
+            start = min(start, self.starts[first])
+            end = max(end, self.ends[last - 1])
+        self.starts[first:last] = [start]
+        self.ends[first:last] = [end]
+
+    def remove_before(self, position):
+        index = bisect.bisect_right(self.ends, position)
+        del self.starts[:index]
+        del self.ends[:index]
+        if len(self.starts) > 0 and self.starts[0] < position:
+            self.starts[0] = position
+
+    def end_from(self, position):
+        index = bisect.bisect_right(self.starts, position + self.tolerance) - 1
+        if index >= 0 and self.ends[index] + self.tolerance >= position:
+            return self.ends[index]
+        return None
+
+
+@given("We have an empty interval set with a tolerance of (?P<tolerance>[\\d.]+)")
+def step_impl(context, tolerance):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    tolerance : str
+    """
+    context.args = SimpleNamespace()
+    context.args.intervals = IntervalSet(float(tolerance))
+    context.args.reference = SortedListIntervals(float(tolerance))
+
+
+@when("(?P<num>\\d+) random ranges are added, and removed before a moving position")
+def step_impl(context, num):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    num : str
+    """
+    rand = random.Random(7)
+    intervals = context.args.intervals
+    reference = context.args.reference
+    context.args.mismatches = []
+    position = 0.0
+    for i in range(int(num)):
+        if rand.random() < 0.1:
+            position += rand.uniform(0, 20)
+            intervals.remove_before(position)
+            reference.remove_before(position)
+        else:
+            # Out of order, overlapping, touching within the tolerance, or empty
+            start = position + rand.uniform(0, 1000)
+            end = start + rand.choice([0, 0.005, rand.uniform(0, 10)])
+            intervals.add(start, end)
+            reference.add(start, end)
+        probe = position + rand.uniform(0, 1000)
+        if list(intervals) != list(zip(reference.starts, reference.ends)) or len(intervals) != len(reference.starts) \
+                or intervals.end != (reference.ends[-1] if len(reference.ends) > 0 else None) \
+                or intervals.end_from(probe) != reference.end_from(probe):
+            context.args.mismatches.append(i)
+
+
+@then("The interval set holds the same ranges as the sorted lists after every change")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.mismatches == []
+    assert len(context.args.intervals) > 100
+
+
+@given("We have a timeline buffer manager")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args = SimpleNamespace()
+    context.args.clock = ManualClock()
+    context.args.buffer_manager = TimelineBufferManager(context.args.clock)
+
+
+@when("2 video segments of 2 seconds and 2 audio segments of 1.92 seconds are enqueued")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    buffer_manager = context.args.buffer_manager
+    for i in range(2):
+        buffer_manager.enqueue_segment(0, i * 2, 2)
+        buffer_manager.enqueue_segment(1, i * 1.92, 1.92)
+
+
+@then("The buffer level is (?P<level>[\\d.]+) seconds")
+def step_impl(context, level):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    level : str
+    """
+    assert abs(context.args.buffer_manager.buffer_level - float(level)) < 1e-9
+
+
+@when("Video segments from 0 to 2 seconds and from 4 to 6 seconds are enqueued")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args.buffer_manager.enqueue_segment(0, 0, 2)
+    context.args.buffer_manager.enqueue_segment(0, 4, 2)
+
+
+@when("The position moves to (?P<position>[\\d.]+) seconds")
+def step_impl(context, position):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    position : str
+    """
+    context.args.buffer_manager.update_buffer(float(position))
+
+
+@when("24 hours of segments are enqueued and played")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    buffer_manager = context.args.buffer_manager
+    clock = context.args.clock
+    context.args.max_ranges = 0
+    position = 0.0
+    for i in range(24 * 3600 // 2):
+        buffer_manager.enqueue_segment(0, i * 2, 2)
+        buffer_manager.enqueue_segment(1, i * 2, 2)
+        # Play one segment behind the download
+        buffer_manager.update_buffer(position, True)
+        clock.advance(2)
+        position += 2
+        context.args.max_ranges = max(context.args.max_ranges, *[len(r) for r in buffer_manager.ranges.values()])
+    assert abs(buffer_manager.buffer_level) < 1e-9
+
+
+@then("At most 1 range per adaptation set is kept")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.max_ranges == 1
+    assert all(len(ranges) <= 1 for ranges in context.args.buffer_manager.ranges.values())
+
+
+@when("3 video segments of 2 seconds and 1000 bytes are enqueued")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    for i in range(3):
+        context.args.buffer_manager.enqueue_segment(0, i * 2, 2, 1000)
+    assert context.args.buffer_manager.buffer_bytes == 3000
+
+
+@when("The playback goes on for 3 seconds")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args.buffer_manager.update_buffer(0, True)
+    context.args.clock.advance(3)
+
+
+@then("The buffer holds 2000 bytes and the next eviction is in 1 second")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.buffer_manager.buffer_bytes == 2000
+    assert abs(context.args.buffer_manager.time_to_eviction - 1) < 1e-9
+
+
+class BufferRecorder(PlayerEventListener, SchedulerEventListener):
+    def __init__(self, mpd):
+        self.mpd = mpd
+        self.buffer_manager = None
+        self.max_bytes = 0
+        self.max_level = 0
+
+    async def on_state_change(self, position, old_state, new_state):
+        pass
+
+    async def on_buffer_level_change(self, buffer_level):
+        self.max_level = max(self.max_level, buffer_level)
+
+    async def on_segment_download_start(self, index, selections):
+        # The bytes in the buffer once the segment is downloaded, if nothing is played back meanwhile
+        size = 0
+        for adaptation_set_id, representation_id in selections.items():
+            representation = self.mpd.adaptation_sets[adaptation_set_id].representations[representation_id]
+            size += int(representation.bandwidth * representation.segments[index].duration / 8)
+        self.max_bytes = max(self.max_bytes, self.buffer_manager.buffer_bytes + size)
+
+    async def on_segment_download_complete(self, index):
+        pass
+
+
+@when("The session is simulated with a budget of (?P<max_bytes>\\d+) bytes and (?P<max_duration>\\d+) seconds over a "
+      "(?P<bandwidth>\\d+) Mbps trace")
+def step_impl(context, max_bytes, max_duration, bandwidth):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    max_bytes : str
+    max_duration : str
+    bandwidth : str
+    """
+    mpd = context.args.mpd
+    max_buffer_bytes, max_buffer_duration = Config.max_buffer_bytes, Config.max_buffer_duration
+    Config.max_buffer_bytes, Config.max_buffer_duration = int(max_bytes), int(max_duration)
+    try:
+        recorder = BufferRecorder(mpd)
+        player = build_simulated_dash_player(mpd, BandwidthTrace.constant(int(bandwidth) * 1000000), [recorder])
+        recorder.buffer_manager = player.buffer_manager
+        run_in_virtual_time(player.start(mpd.url))
+    finally:
+        Config.max_buffer_bytes, Config.max_buffer_duration = max_buffer_bytes, max_buffer_duration
+    context.args.recorder = recorder
+    context.args.player = player
+
+
+@then("The buffer never goes over (?P<max_bytes>\\d+) bytes")
+def step_impl(context, max_bytes):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    max_bytes : str
+    """
+    assert context.args.player.scheduler.is_end
+    assert 0 < context.args.recorder.max_bytes <= int(max_bytes)
+
+
+@then("The buffer level stays below (?P<level>\\d+) seconds")
+def step_impl(context, level):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    level : str
+    """
+    assert context.args.recorder.max_level < int(level)
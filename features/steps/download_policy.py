@@ -0,0 +1,350 @@
+import asyncio
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+from behave import *
+
+from dash_emulator.buffer import BufferManagerImpl
+from dash_emulator.config import Config
+from dash_emulator.download import DownloadError, DownloadHandle, DownloadEventListener, DownloadManagerImpl
+from dash_emulator.models import AdaptationSet, Representation, Segment
+from dash_emulator.player_factory import build_dash_player, build_simulated_dash_player
+from dash_emulator.policy import RetryPolicy, AbandonmentPolicy
+from dash_emulator.scheduler import SchedulerImpl
+from dash_emulator.trace import BandwidthTrace
+from features.steps.local_server import start_stalling_server
+from features.steps.scheduler import MockDownloadManager, MockABRController, build_adaptation_set
+from features.steps.simulation import build_mpd
+
+use_step_matcher("re")
+
+
+class FlakyDownloadManager(MockDownloadManager):
+    def __init__(self, failures, only=None):
+        super().__init__()
+        self.failures = failures
+        self.only = only
+        self.attempts = dict()
+
+    def start_download(self, url, save: bool = False, path=None) -> DownloadHandle:
+        handle = DownloadHandle(url, save, path)
+        handle.attach(asyncio.create_task(self.attempt(handle)))
+        return handle
+
+    async def attempt(self, handle: DownloadHandle):
+        url = handle.url
+        self.attempts[url] = self.attempts.get(url, 0) + 1
+        if self.attempts[url] <= self.failures and (self.only is None or self.only in url):
+            raise DownloadError("Failed to download %s" % url)
+        await self.download(url, handle.save, handle.path)
+
+
+def build_scheduler(context, download_manager, retry_policy=RetryPolicy(0.1, 3, 0.01, 0.05)):
+    context.args = SimpleNamespace()
+    context.args.download_manager = download_manager
+    context.args.buffer_manager = BufferManagerImpl()
+    context.args.scheduler = SchedulerImpl(1.5, 0.01, download_manager, None, context.args.buffer_manager,
+                                           MockABRController(), [], retry_policy=retry_policy)
+    context.args.adaptation_sets = {0: build_adaptation_set(0, "video"), 1: build_adaptation_set(1, "audio")}
+
+
+@given("We have a scheduler whose download manager fails the first (?P<failures>\\d+) attempts of each request")
+def step_impl(context, failures):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    failures : str
+    """
+    build_scheduler(context, FlakyDownloadManager(int(failures)))
+
+
+class CancelCounter(DownloadEventListener):
+    def __init__(self):
+        self.canceled = []
+
+    async def on_bytes_transferred(self, length: int, url: str, position: int, size: int) -> None:
+        pass
+
+    async def on_transfer_end(self, size: int, url: str) -> None:
+        pass
+
+    async def on_transfer_start(self, url) -> None:
+        pass
+
+    async def on_transfer_canceled(self, url: str, position: int, size: int) -> None:
+        self.canceled.append(url)
+
+
+@given("We have a scheduler without a retry policy whose download manager fails every request")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    build_scheduler(context, FlakyDownloadManager(100), None)
+
+
+@given("We have a scheduler whose download manager always fails the requests of the highest representation"
+       "(?:, whose lowest one has (?P<low_segments>\\d+) segments)?")
+def step_impl(context, low_segments):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    low_segments : str, optional
+    """
+    build_scheduler(context, FlakyDownloadManager(100, only="/high-"))
+    representations = dict()
+    num_low_segments = int(low_segments) if low_segments is not None else 2
+    for id_, name, bandwidth, num_segments in ((0, "high", 1000000, 2), (1, "low", 100000, num_low_segments)):
+        segments = [Segment("http://foo.bar/%s-%d.m4s" % (name, i), 1.0) for i in range(num_segments)]
+        representations[id_] = Representation(id_, "video/mp4", "avc1", bandwidth, 640, 360,
+                                              "http://foo.bar/init-%s.m4s" % name, segments)
+    context.args.adaptation_sets = {0: AdaptationSet(0, "video", "30/1", 640, 360, "16:9", representations)}
+
+
+@given("We have a scheduler downloading from a local server which stalls the first request of each path")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    listener = CancelCounter()
+    build_scheduler(context, DownloadManagerImpl([listener], False, 1024))
+    context.args.listener = listener
+
+
+@when("The scheduler downloads the first segment index from the stalling server")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+
+    async def run():
+        runner, base_url, context.args.requests = await start_stalling_server(30000, 1000)
+        context.args.adaptation_sets = {0: build_adaptation_set(0, "video", base_url),
+                                        1: build_adaptation_set(1, "audio", base_url)}
+        scheduler = context.args.scheduler
+        scheduler.start(context.args.adaptation_sets)
+        try:
+            # A deadline of 0.1 s, so the stalled requests must not take much longer
+            for _ in range(2000):
+                if context.args.buffer_manager.buffer_level >= 1:
+                    break
+                await asyncio.sleep(0.001)
+        finally:
+            await scheduler.stop()
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+@then("Each stalled request is aborted and retried until it succeeds")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.buffer_manager.buffer_level >= 1
+    # The requests of the next segment index could be stalled too when the scheduler stops
+    canceled_paths = [urlparse(url).path for url in context.args.listener.canceled]
+    for path in ("/init-0.m4s", "/0-0.m4s", "/init-1.m4s", "/1-0.m4s"):
+        assert context.args.requests[path] == 2
+        assert canceled_paths.count(path) == 1
+
+
+@then("Each request is retried until it succeeds")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    download_manager = context.args.download_manager
+    for url in ("http://foo.bar/init-0.m4s", "http://foo.bar/0-0.m4s", "http://foo.bar/init-1.m4s",
+                "http://foo.bar/1-0.m4s"):
+        assert download_manager.attempts[url] == download_manager.failures + 1
+        assert url in download_manager.urls
+    assert context.args.buffer_manager.buffer_level >= 1
+
+
+@given("We have an abandonment policy watching a download of a (?P<size>\\d+) bytes segment")
+def step_impl(context, size):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    size : str
+    """
+    context.args = SimpleNamespace()
+    context.args.size = int(size)
+    context.args.buffer_manager = BufferManagerImpl()
+    context.args.policy = AbandonmentPolicy(context.args.buffer_manager, 0.05)
+    segments = [Segment("http://foo.bar/%d.m4s" % i, 2.0) for i in range(2)]
+    representations = {
+        0: Representation(0, "video/mp4", "avc1", 4000000, 1920, 1080, "http://foo.bar/init-0.m4s", segments),
+        1: Representation(1, "video/mp4", "avc1", 1000000, 1280, 720, "http://foo.bar/init-1.m4s", segments),
+        2: Representation(2, "video/mp4", "avc1", 200000, 640, 360, "http://foo.bar/init-2.m4s", segments),
+    }
+    context.args.adaptation_set = AdaptationSet(0, "video", "30/1", 1920, 1080, "16:9", representations)
+    context.args.handle = DownloadHandle("http://foo.bar/0.m4s")
+    context.args.policy.watch(context.args.handle, context.args.adaptation_set, 0, 2.0)
+
+
+@when("The download progresses at (?P<rate>\\d+) bytes per second with (?P<buffer_level>\\d+) second of buffer")
+def step_impl(context, rate, buffer_level):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    rate : str
+    buffer_level : str
+    """
+    context.args.buffer_manager.enqueue_buffer(float(buffer_level))
+    policy: AbandonmentPolicy = context.args.policy
+    url = context.args.handle.url
+
+    async def feed():
+        await policy.on_transfer_start(url)
+        position = 0
+        for _ in range(5):
+            await asyncio.sleep(0.02)
+            position += int(rate) // 50
+            await policy.on_bytes_transferred(int(rate) // 50, url, position, context.args.size)
+
+    asyncio.run(feed())
+
+
+@then("The download is abandoned in favor of a lower representation")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.handle.stop_requested is True
+    # 200 kbps x 2s = 50000 bytes could be downloaded within the buffer, 1 Mbps x 2s = 250000 bytes could not
+    assert context.args.policy.unwatch(context.args.handle) == 2
+
+
+@when("The scheduler runs until the end")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+
+    async def run():
+        scheduler = context.args.scheduler
+        scheduler.start(context.args.adaptation_sets)
+        while not scheduler.is_end:
+            await asyncio.sleep(0.001)
+        await scheduler.stop()
+
+    asyncio.run(asyncio.wait_for(run(), 10))
+
+
+@then("The buffer does not grow")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    download_manager = context.args.download_manager
+    for url in ("http://foo.bar/0-0.m4s", "http://foo.bar/1-0.m4s", "http://foo.bar/0-1.m4s",
+                "http://foo.bar/1-1.m4s"):
+        assert download_manager.attempts[url] == context.args.scheduler.retry_policy.max_retries + 1
+    assert download_manager.urls == []
+    assert context.args.buffer_manager.buffer_level == 0
+
+
+@then("The segment is downloaded from the lowest representation")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    urls = context.args.download_manager.urls
+    assert "http://foo.bar/high-0.m4s" not in urls
+    assert urls.index("http://foo.bar/init-low.m4s") < urls.index("http://foo.bar/low-0.m4s")
+    assert context.args.buffer_manager.buffer_level >= 1
+
+
+@then("The segments are skipped without an error")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.scheduler.is_end is True
+    assert context.args.scheduler.error is None
+    assert not any("-low" in url for url in context.args.download_manager.urls)
+    assert context.args.buffer_manager.buffer_level == 0
+
+
+@then("The stream ends on the download error")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.scheduler.is_end is True
+    assert isinstance(context.args.scheduler.error, DownloadError)
+    assert context.args.download_manager.attempts == {"http://foo.bar/init-0.m4s": 1}
+    assert context.args.buffer_manager.buffer_level == 0
+
+
+@given("We have an MPD of 2 segments")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args = SimpleNamespace()
+    context.args.mpd = build_mpd(2, 1.0)
+
+
+@when("Players are built with the default config and with the policies enabled")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    mpd = context.args.mpd
+    trace = BandwidthTrace([(1, 1000000)])
+    context.args.default = [build_dash_player(mpd=mpd), build_simulated_dash_player(mpd, trace)]
+    retry_downloads, abandon_slow_downloads = Config.retry_downloads, Config.abandon_slow_downloads
+    Config.retry_downloads, Config.abandon_slow_downloads = True, True
+    try:
+        context.args.enabled = [build_dash_player(mpd=mpd), build_simulated_dash_player(mpd, trace)]
+    finally:
+        Config.retry_downloads, Config.abandon_slow_downloads = retry_downloads, abandon_slow_downloads
+
+
+@then("Only the players built with the policies enabled retry and abandon downloads")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    for player in context.args.default:
+        assert player.scheduler.retry_policy is None
+        assert player.scheduler.abandonment_policy is None
+    for player in context.args.enabled:
+        assert isinstance(player.scheduler.retry_policy, RetryPolicy)
+        assert isinstance(player.scheduler.abandonment_policy, AbandonmentPolicy)
+        assert player.scheduler.abandonment_policy in player.scheduler.download_manager.event_listeners
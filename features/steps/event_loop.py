@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+
+from behave import *
+
+from dash_emulator.config import Config
+from dash_emulator.download import DownloadManagerImpl
+from dash_emulator.event_loop import run_in_event_loop, resolve_event_loop, uvloop
+from features.steps.local_server import start_local_server
+
+use_step_matcher("re")
+
+
+@given("We have a local server serving 100000 bytes")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args = SimpleNamespace()
+    context.args.size = 100000
+
+
+@when("The segment is downloaded on the (?P<loop>\\w+) event loop")
+def step_impl(context, loop):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    loop : str
+    """
+    if loop == "uvloop" and uvloop is None:
+        context.scenario.skip("uvloop is not installed")
+        return
+
+    async def main():
+        runner, base_url = await start_local_server(context.args.size)
+        download_manager = DownloadManagerImpl([])
+        try:
+            content = await download_manager.download(base_url + "/segment.m4s", save=True)
+        finally:
+            await download_manager.close()
+            await runner.cleanup()
+        return type(asyncio.get_running_loop()).__module__, content
+
+    context.args.loop_module, context.args.content = run_in_event_loop(main(), loop)
+
+
+@then("The download runs on the (?P<loop>\\w+) event loop")
+def step_impl(context, loop):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    loop : str
+    """
+    assert context.args.loop_module.split(".")[0] == loop
+
+
+@then("The whole segment is downloaded")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert len(context.args.content) == context.args.size
+
+
+@given("The event loop of the config is auto")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert Config.event_loop == "auto"
+
+
+@then("The event loop resolves to uvloop if it is installed and to asyncio otherwise")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert resolve_event_loop() == ("uvloop" if uvloop is not None else "asyncio")
+    assert resolve_event_loop("asyncio") == "asyncio"
@@ -0,0 +1,230 @@
+import asyncio
+import io
+import json
+import threading
+from types import SimpleNamespace
+
+from behave import *
+
+from dash_emulator.fleet import Fleet, QoEAggregator
+from dash_emulator.player import PlayerEventListener
+from dash_emulator.scheduler import SchedulerEventListener
+from dash_emulator.sharded_fleet import ShardedFleet
+from features.steps.local_server import start_local_origin
+
+use_step_matcher("re")
+
+
+@given("We have a local origin serving an MPD of 4 segments of 0.5 seconds")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args = SimpleNamespace()
+    context.args.num_segments = 4
+    context.args.duration = 0.5
+
+
+@when("A fleet of 20 players plays it with staggered starts")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args.output = io.StringIO()
+
+    async def main():
+        runner, mpd_url, requests = await start_local_origin(context.args.num_segments, context.args.duration)
+        try:
+            fleet = Fleet(20, 0.01, QoEAggregator(context.args.output))
+            context.args.sink = await fleet.run(mpd_url)
+            context.args.metrics = fleet.session_pool.metrics
+            context.args.requests = requests
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(main())
+
+
+@then("All the players finish without errors")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    summary = context.args.sink.summary()
+    assert summary["finished"] == 20
+    assert summary["failed"] == 0
+    assert summary["session_duration"]["max"] > context.args.num_segments * context.args.duration - 0.1
+
+
+@then("The MPD is downloaded only once")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.requests["/manifest.mpd"] == 1
+    assert context.args.requests["/chunk-0-00001.m4s"] == 20
+
+
+@then("The players reuse the connections of the pool")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    metrics = context.args.metrics
+    assert metrics.requests == 1 + 20 * (1 + context.args.num_segments)
+    assert metrics.new_connections < metrics.requests / 2
+
+
+@then("The QoE of every player is written to the sink")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    records = [json.loads(line) for line in context.args.output.getvalue().splitlines()]
+    assert sorted(record["client"] for record in records) == list(range(20))
+    assert all("qoe" in record for record in records)
+
+
+@when("A fleet of 20 players sharded over 2 processes plays it")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    # The origin runs in its own thread, as the parent process blocks while the workers play
+    loop = asyncio.new_event_loop()
+    runner, mpd_url, requests = loop.run_until_complete(
+        start_local_origin(context.args.num_segments, context.args.duration))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    context.args.reports = []
+    try:
+        fleet = ShardedFleet(20, 2, 0.01, report_interval=0.2, progress=context.args.reports.append)
+        context.args.report = fleet.run(mpd_url)
+    finally:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+@then("All the players are counted as finished")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    report = context.args.report
+    assert report["crashed_workers"] == 0
+    assert report["started"] == 20
+    assert report["finished"] == 20
+    assert report["running"] == 0
+    assert report["stalled"] == 0
+
+
+@then("The bytes of all the segments are counted")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    segment_size = int(100000 * context.args.duration / 8)
+    assert context.args.report["bytes"] == 20 * (1 + context.args.num_segments) * segment_size
+
+
+@then("Live reports are delivered while the players run")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    reports = context.args.reports
+    assert len(reports) > 0
+    assert any(report["running"] > 0 for report in reports)
+    assert any(report["throughput"] > 0 for report in reports)
+
+
+@then("No player is left in the bitrate histogram")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert sum(context.args.report["bitrate_histogram"]) == 0
+    assert any(sum(report["bitrate_histogram"]) > 0 for report in context.args.reports)
+
+
+class FailingListener(PlayerEventListener, SchedulerEventListener):
+    def __init__(self, fail):
+        self.fail = fail
+
+    async def on_state_change(self, position: float, old_state, new_state):
+        pass
+
+    async def on_buffer_level_change(self, buffer_level):
+        pass
+
+    async def on_segment_download_start(self, index, selections):
+        if self.fail and index == 1:
+            raise RuntimeError("The listener failed")
+
+    async def on_segment_download_complete(self, index):
+        pass
+
+
+@when("A fleet of 4 players plays it, and the scheduler of the second player fails")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args.output = io.StringIO()
+
+    def listener_factory(client_id, mpd):
+        return FailingListener(client_id == 1)
+
+    async def main():
+        runner, mpd_url, requests = await start_local_origin(context.args.num_segments, context.args.duration)
+        try:
+            fleet = Fleet(4, 0.01, QoEAggregator(context.args.output), listener_factory=listener_factory)
+            context.args.sink = await asyncio.wait_for(fleet.run(mpd_url), 30)
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(main())
+
+
+@then("3 players finish and the second player fails")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    summary = context.args.sink.summary()
+    assert summary["finished"] == 3
+    assert summary["failed"] == 1
+    results = [json.loads(line) for line in context.args.output.getvalue().splitlines()]
+    errors = [result for result in results if "error" in result]
+    assert len(errors) == 1
+    assert errors[0]["client"] == 1
+    assert errors[0]["error"] == "RuntimeError: The listener failed"
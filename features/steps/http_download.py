@@ -1,9 +1,16 @@
 import asyncio
+import os
+import socket
+import tempfile
 from types import SimpleNamespace
 
 from behave import *
 
-from dash_emulator.download import DownloadManagerImpl, DownloadEventListener
+from dash_emulator.bandwidth import ConcurrentBandwidthMeter
+from dash_emulator.cache import SegmentCache
+from dash_emulator.download import DownloadManagerImpl, DownloadEventListener, ReceiveBuffer, DownloadError
+from dash_emulator.session import SessionPool
+from features.steps.local_server import start_local_server
 
 use_step_matcher("re")
 
@@ -74,3 +81,262 @@ def step_impl(context):
         assert context.args.download_manager.is_busy is False
 
     asyncio.run(run())
+
+
+@given("We have an HTTP download manager and a local HTTP server")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args = SimpleNamespace()
+    context.args.download_manager = DownloadManagerImpl([], False, 1024)
+
+
+@when("Two downloads start and the first one gets canceled")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+
+    async def run():
+        runner, base_url = await start_local_server(200000, chunk_delay=0.01)
+        download_manager = context.args.download_manager
+        first = download_manager.start_download(base_url + "/first", save=True)
+        second = download_manager.start_download(base_url + "/second", save=True)
+        while first.position == 0:
+            await asyncio.sleep(0.001)
+        context.args.in_flight = download_manager.num_in_flight
+        await download_manager.stop(base_url + "/first")
+        context.args.first_content = await first
+        context.args.second_content = await second
+        context.args.first, context.args.second = first, second
+        await download_manager.close()
+        await runner.cleanup()
+
+    asyncio.run(run())
+
+
+@then("Only the first download is canceled")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.in_flight == 2
+    assert context.args.first.canceled is True
+    assert context.args.first_content is None
+    assert 0 < context.args.first.position < 200000
+    assert context.args.second.canceled is False
+    assert len(context.args.second_content) == 200000
+    assert context.args.download_manager.is_busy is False
+
+
+@given("We have receive buffers with a right, a wrong and no size hint")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args = SimpleNamespace()
+    context.args.chunks = [bytes([i]) * 1000 for i in range(10)]
+    context.args.buffers = [ReceiveBuffer(10000), ReceiveBuffer(4500), ReceiveBuffer(None)]
+
+
+@when("The same chunks are written into the buffers")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    for buffer in context.args.buffers:
+        for chunk in context.args.chunks:
+            buffer.write(chunk)
+
+
+@then("All the buffers hold the same content")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    expected = b''.join(context.args.chunks)
+    for buffer in context.args.buffers:
+        assert len(buffer) == len(expected)
+        assert buffer.getbuffer() == expected
+
+
+class CountingListener(DownloadEventListener):
+    def __init__(self):
+        self.lengths = []
+        self.ended = False
+        self.canceled = False
+
+    async def on_transfer_start(self, url) -> None:
+        pass
+
+    async def on_transfer_end(self, size: int, url: str) -> None:
+        self.ended = True
+
+    async def on_bytes_transferred(self, length: int, url: str, position: int, size: int) -> None:
+        self.lengths.append(length)
+
+    async def on_transfer_canceled(self, url: str, position: int, size: int) -> None:
+        self.canceled = True
+
+
+@given("We have an HTTP download manager delivering progress every (?P<progress_bytes>\\d+) bytes")
+def step_impl(context, progress_bytes):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    progress_bytes : str
+    """
+    context.args = SimpleNamespace()
+    context.args.listener = CountingListener()
+    context.args.download_manager = DownloadManagerImpl([context.args.listener], False, 1024,
+                                                        progress_bytes=int(progress_bytes))
+
+
+@when("A download of (?P<size>\\d+) bytes completes")
+def step_impl(context, size):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    size : str
+    """
+    context.args.size = int(size)
+
+    async def run():
+        runner, base_url = await start_local_server(context.args.size)
+        await context.args.download_manager.download(base_url + "/segment")
+        await context.args.download_manager.close()
+        await runner.cleanup()
+
+    asyncio.run(run())
+
+
+@then("The progress events are coalesced and add up to the content length")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    lengths = context.args.listener.lengths
+    assert context.args.listener.ended is True
+    assert sum(lengths) == context.args.size
+    assert len(lengths) <= context.args.size // 50000 + 1
+    assert all(length >= 50000 for length in lengths[:-1])
+
+
+@given("We have an HTTP download manager writing to the disk and a cache, measured by a concurrent bandwidth meter")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args = SimpleNamespace()
+    context.args.folder = tempfile.mkdtemp()
+    context.args.cache = SegmentCache(tempfile.mkdtemp(), 1 << 20)
+    context.args.meter = ConcurrentBandwidthMeter(1000000, 10, [])
+    context.args.listener = CountingListener()
+    context.args.download_manager = DownloadManagerImpl([context.args.meter, context.args.listener], True, 1024,
+                                                        cache=context.args.cache)
+
+
+@when("A download of (?P<size>\\d+) bytes loses its connection after (?P<drop_after>\\d+) bytes")
+def step_impl(context, size, drop_after):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    size : str
+    drop_after : str
+    """
+
+    async def run():
+        runner, base_url = await start_local_server(int(size), drop_after=int(drop_after))
+        try:
+            await context.args.download_manager.download(base_url + "/segment",
+                                                         path=os.path.join(context.args.folder, "segment"))
+        except DownloadError as e:
+            context.args.error = e
+        await context.args.download_manager.close()
+        await runner.cleanup()
+
+    context.args.error = None
+    asyncio.run(run())
+
+
+@then("The download fails and leaves no partial files or running transfers behind")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.error is not None
+    assert context.args.listener.canceled is True
+    assert sum(context.args.listener.lengths) > 0
+    assert os.listdir(context.args.folder) == []
+    assert not any(name.endswith(".part") for name in os.listdir(context.args.cache.folder))
+    assert context.args.meter._num_running == 0
+    assert context.args.meter._transfers == dict()
+    assert context.args.download_manager.is_busy is False
+
+
+@given("We have a local HTTP server")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args = SimpleNamespace()
+    context.args.size = 1000
+
+
+@when("A request is sent through a session pool with TCP_NODELAY on and another one with it off")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+
+    async def run():
+        runner, base_url = await start_local_server(context.args.size)
+        context.args.nodelay = dict()
+        for nodelay in [True, False]:
+            session_pool = SessionPool(tcp_nodelay=nodelay)
+            async with session_pool.session.get(base_url + "/segment") as resp:
+                # Nothing touches the socket once the connection is created, so the option is the one set then
+                sock = resp.connection.transport.get_extra_info("socket")
+                context.args.nodelay[nodelay] = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+                await resp.read()
+            await session_pool.close()
+        await runner.cleanup()
+
+    asyncio.run(run())
+
+
+@then("The sockets of both pools have TCP_NODELAY as configured")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.nodelay[True] != 0
+    assert context.args.nodelay[False] == 0
@@ -0,0 +1,132 @@
+import asyncio
+
+from aiohttp import web
+
+
+async def start_local_server(size, chunk_size=10000, chunk_delay=0.001, drop_after=None):
+    """
+    Start an HTTP server on localhost which streams `size` bytes for any path, pausing `chunk_delay` seconds
+    between chunks. If `drop_after` is given, the connection is dropped once that many bytes are sent.
+
+    Returns
+    -------
+    runner, base_url
+    """
+
+    async def handler(request):
+        resp = web.StreamResponse()
+        resp.enable_chunked_encoding()
+        await resp.prepare(request)
+        try:
+            for i in range(0, size, chunk_size):
+                if drop_after is not None and i >= drop_after:
+                    request.transport.close()
+                    return resp
+                await resp.write(b'\0' * min(chunk_size, size - i))
+                await asyncio.sleep(chunk_delay)
+            await resp.write_eof()
+        except ConnectionError:
+            pass
+        return resp
+
+    app = web.Application()
+    app.router.add_get('/{name:.*}', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, "http://127.0.0.1:%d" % port
+
+
+
+async def start_stalling_server(size, stall_after):
+    """
+    Start an HTTP server on localhost which sends `size` bytes for any path. The first request of every path stalls
+    once `stall_after` bytes are sent, and only ends when the server stops. The number of requests of every path is
+    counted in `requests`.
+
+    Returns
+    -------
+    runner, base_url, requests
+    """
+    requests = dict()
+    stopped = asyncio.Event()
+
+    async def handler(request):
+        requests[request.path] = requests.get(request.path, 0) + 1
+        resp = web.StreamResponse()
+        resp.content_length = size
+        await resp.prepare(request)
+        try:
+            if requests[request.path] == 1:
+                await resp.write(b'\0' * stall_after)
+                await stopped.wait()
+                return resp
+            await resp.write(b'\0' * size)
+            await resp.write_eof()
+        except ConnectionError:
+            pass
+        return resp
+
+    async def on_shutdown(app):
+        stopped.set()
+
+    app = web.Application()
+    app.router.add_get('/{name:.*}', handler)
+    app.on_shutdown.append(on_shutdown)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, "http://127.0.0.1:%d" % port, requests
+
+MPD_TEMPLATE = """<?xml version="1.0" encoding="utf-8"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" mediaPresentationDuration="PT{total}S"
+     minBufferTime="PT{duration}S" maxSegmentDuration="PT{duration}S">
+  <Period id="0" start="PT0.0S">
+    <AdaptationSet id="0" contentType="video" frameRate="30/1" maxWidth="640" maxHeight="360" par="16:9">
+      <Representation id="0" mimeType="video/mp4" codecs="avc1" bandwidth="{bandwidth}" width="640" height="360">
+        <SegmentTemplate timescale="1000" initialization="init-$RepresentationID$.m4s"
+                         media="chunk-$RepresentationID$-$Number%05d$.m4s" startNumber="1">
+          <SegmentTimeline>
+            <S t="0" d="{duration_ms}" r="{num_segments}"/>
+          </SegmentTimeline>
+        </SegmentTemplate>
+      </Representation>
+    </AdaptationSet>
+  </Period>
+</MPD>
+"""
+
+
+async def start_local_origin(num_segments, duration, bandwidth=100000):
+    """
+    Start an HTTP server on localhost which serves /manifest.mpd, a static MPD of one representation, and its
+    segments sized after the bandwidth. The number of requests of every path is counted in `requests`.
+
+    Returns
+    -------
+    runner, mpd_url, requests
+    """
+    requests = dict()
+    mpd_text = MPD_TEMPLATE.format(total=num_segments * duration, duration=duration,
+                                   duration_ms=int(duration * 1000), num_segments=num_segments,
+                                   bandwidth=bandwidth)
+    segment = b'\0' * int(bandwidth * duration / 8)
+
+    async def handler(request):
+        requests[request.path] = requests.get(request.path, 0) + 1
+        if request.path == "/manifest.mpd":
+            return web.Response(text=mpd_text)
+        return web.Response(body=segment)
+
+    app = web.Application()
+    app.router.add_get('/{name:.*}', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, "http://127.0.0.1:%d/manifest.mpd" % port, requests
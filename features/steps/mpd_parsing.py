@@ -1,10 +1,16 @@
+import pickle
 from inspect import cleandoc
 from xml.etree import ElementTree
 
 from behave import *
 
-from dash_emulator.models import MPD
-from dash_emulator.mpd.parser import MPDParser, DefaultMPDParser
+from dash_emulator.clock import run_in_virtual_time
+from dash_emulator.models import MPD, SegmentTimeline
+from dash_emulator.mpd.parser import MPDParser, MPDParsingException, DefaultMPDParser, StreamingMPDParser, compile_segment_template
+from dash_emulator.player_factory import build_simulated_dash_player
+from dash_emulator.scheduler import SchedulerEventListener
+from dash_emulator.simulation import segment_sizes
+from dash_emulator.trace import BandwidthTrace
 
 use_step_matcher("re")
 
@@ -79,6 +85,213 @@ def step_impl(context):
     assert representation.segments[18].duration == 29.0 / 30
 
 
+
+def dump(mpd):
+    return (mpd.url, mpd.type, mpd.media_presentation_duration, mpd.max_segment_duration, mpd.min_buffer_time,
+            [(id_, adaptation_set.content_type, adaptation_set.frame_rate, adaptation_set.max_width,
+              adaptation_set.max_height, adaptation_set.par,
+              [(representation.id, representation.mime_type, representation.codecs, representation.bandwidth,
+                representation.width, representation.height, representation.initialization,
+                [(segment.url, segment.duration) for segment in representation.segments])
+               for representation in adaptation_set.representations.values()])
+             for id_, adaptation_set in mpd.adaptation_sets.items()])
+
+
+@when("The MPD is parsed by both parsers, the streaming one in chunks of 100 characters")
+def step_impl(context):
+    context.default_mpd = DefaultMPDParser().parse(context.mpd_content, context.url)
+    context.streaming_mpd = StreamingMPDParser(chunk_size=100, keep_content=True).parse(context.mpd_content,
+                                                                                 context.url)
+
+
+@then("The MPDs are the same")
+def step_impl(context):
+    assert dump(context.streaming_mpd) == dump(context.default_mpd)
+    assert len(context.streaming_mpd.adaptation_sets[0].representations[6].segments) == 19
+    assert context.streaming_mpd.content == context.mpd_content
+
+
+@given("We have the media pattern \"(?P<pattern>.+)\"")
+def step_impl(context, pattern):
+    context.pattern = pattern
+
+
+@when("The media pattern is compiled for the representation \"(?P<id_>\\w+)\" of (?P<bandwidth>\\d+) bps")
+def step_impl(context, id_, bandwidth):
+    context.format = compile_segment_template(context.pattern, id_, int(bandwidth))
+
+
+@then("The URL of the segment (?P<number>\\d+) at (?P<time>\\d+) is \"(?P<url>.+)\"")
+def step_impl(context, number, time, url):
+    assert context.format % {"number": int(number), "time": int(time)} == url
+
+
+@given("We have the content of an MPD with a prefixed namespace and a segment duration in the AdaptationSet")
+def step_impl(context):
+    context.mpd_content = cleandoc(mpd_content_with_prefixed_namespace)
+    context.url = "http://127.0.0.1/videos/BBB/output.mpd"
+
+
+@when("The MPD is parsed by the streaming parser")
+def step_impl(context):
+    context.streaming_mpd = StreamingMPDParser().parse(context.mpd_content, context.url)
+
+
+@given("The MPD has no presentation duration")
+def step_impl(context):
+    context.mpd_content = context.mpd_content.replace('type="static" mediaPresentationDuration="PT39.0S"',
+                                                      'type="dynamic"')
+
+
+@then("The streaming parser rejects the MPD")
+def step_impl(context):
+    try:
+        StreamingMPDParser().parse(context.mpd_content, context.url)
+    except MPDParsingException as e:
+        assert "mediaPresentationDuration" in str(e)
+        return
+    assert False
+
+
+@then("The representations share the SegmentTemplate of the AdaptationSet")
+def step_impl(context):
+    mpd = context.streaming_mpd
+    assert mpd.type == "static"
+    assert list(mpd.adaptation_sets) == [0]
+    representations = mpd.adaptation_sets[0].representations
+    assert sorted(representations) == [0, 1]
+    for id_, representation in representations.items():
+        assert representation.mime_type == "video/mp4"
+        assert representation.width == 1280
+        assert representation.initialization == "http://127.0.0.1/videos/BBB/init-%d.m4s" % id_
+        # 9 segments of 4 seconds and a last one of 3 seconds
+        assert len(representation.segments) == 10
+        assert representation.segments[0].url == "http://127.0.0.1/videos/BBB/%d-0.m4s" % id_
+        assert representation.segments[9].url == "http://127.0.0.1/videos/BBB/%d-36000.m4s" % id_
+        assert representation.segments[8].duration == 4
+        assert representation.segments[9].duration == 3
+
+
+@then("The segment sizes are computed on lookup")
+def step_impl(context):
+    mpd = context.streaming_mpd
+    sizes = segment_sizes(mpd, 1234)
+    # No size is kept per segment
+    assert len(sizes._sizes) == 0
+    urls = []
+    for adaptation_set in mpd.adaptation_sets.values():
+        for representation in adaptation_set.representations.values():
+            assert sizes[representation.initialization] == 1234
+            segments = representation.segments
+            for segment in segments:
+                assert sizes[segment.url] == int(representation.bandwidth * segment.duration / 8)
+            urls += [representation.initialization] + [segment.url for segment in segments]
+            # URLs of the pattern past the end, or between two segments, are unknown
+            assert segments.media % {"number": segments.start_number + len(segments), "time": 10 ** 9} not in sizes
+            assert segments.media % {"number": 10 ** 6, "time": 1} not in sizes
+    assert "http://127.0.0.1/unknown.m4s" not in sizes
+    assert len(sizes) == len(urls)
+    assert sorted(sizes) == sorted(urls)
+
+
+@given("We have a segment timeline of 3 and 2 segments of 2 seconds, then 2 segments of 1 second after a gap")
+def step_impl(context):
+    context.segments = SegmentTimeline("seg-%(number)d-%(time)d.m4s", 1000, 1,
+                                       [(0, 2000, 3), (None, 2000, 2), (12000, 1000, 2)])
+
+
+@then("The segments are computed from their index")
+def step_impl(context):
+    segments = context.segments
+    assert len(segments) == 7
+    assert segments[4].url == "seg-5-8000.m4s"
+    assert segments[4].duration == 2
+    assert segments[5].url == "seg-6-12000.m4s"
+    assert segments[5].duration == 1
+    assert segments[-1].url == "seg-7-13000.m4s"
+    assert [segment.url for segment in segments[1:6:2]] == ["seg-2-2000.m4s", "seg-4-6000.m4s", "seg-6-12000.m4s"]
+    assert [segment.url for segment in segments] == [segments[i].url for i in range(7)]
+    assert segments.start_time(5) == 12
+
+
+@then("The segments are found by their time")
+def step_impl(context):
+    segments = context.segments
+    assert segments.index_at(0) == 0
+    assert segments.index_at(3.9) == 1
+    assert segments.index_at(9.5) == 4
+    # In the gap
+    assert segments.index_at(11) == 5
+    assert segments.index_at(13.5) == 6
+
+
+@then("Indexes and times past the end are out of range")
+def step_impl(context):
+    segments = context.segments
+    for lookup in (lambda: segments[7], lambda: segments[-8], lambda: segments.index_at(14)):
+        try:
+            lookup()
+        except IndexError:
+            pass
+        else:
+            assert False
+    assert segments[7:] == []
+
+
+@when("The MPD parsed by the streaming parser is played in a simulation")
+def step_impl(context):
+    mpd = StreamingMPDParser().parse(context.mpd_content, context.url)
+    context.segment_downloads = 0
+
+    class SegmentCounter(SchedulerEventListener):
+        async def on_segment_download_start(self, index, selections):
+            pass
+
+        async def on_segment_download_complete(self, index):
+            context.segment_downloads += 1
+
+    player = build_simulated_dash_player(mpd, BandwidthTrace.constant(10000000))
+    player.scheduler.add_listener(SegmentCounter())
+    run_in_virtual_time(player.start(mpd.url))
+    context.player = player
+
+
+@then("All the segments of the MPD are downloaded")
+def step_impl(context):
+    assert context.player.scheduler.is_end
+    assert context.segment_downloads == 19
+
+
+@then("The MPD doesn't keep the raw content")
+def step_impl(context):
+    assert context.streaming_mpd.content is None
+
+
+@then("The MPD objects can't be changed")
+def step_impl(context):
+    mpd = context.streaming_mpd
+    adaptation_set = mpd.adaptation_sets[0]
+    representation = adaptation_set.representations[0]
+    segment = representation.segments[0]
+    for obj, name in ((mpd, "url"), (adaptation_set, "representations"), (representation, "segments"),
+                      (segment, "size"), (representation.segments, "media"), (adaptation_set.ladder, "ids")):
+        assert not hasattr(obj, "__dict__")
+        try:
+            setattr(obj, name, None)
+        except AttributeError:
+            pass
+        else:
+            assert False
+    for mapping in (mpd.adaptation_sets, adaptation_set.representations):
+        try:
+            mapping[1] = None
+        except TypeError:
+            pass
+        else:
+            assert False
+    copy = pickle.loads(pickle.dumps(mpd))
+    assert dump(copy) == dump(mpd)
+
 mpd_content_using_segment_template = """
     <?xml version="1.0" encoding="utf-8"?>
     <MPD xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
@@ -229,3 +442,21 @@ adaptation_content_using_segment_template = """
         </AdaptationSet>
 
 """
+
+mpd_content_with_prefixed_namespace = """
+    <?xml version="1.0" encoding="utf-8"?>
+    <mpd:MPD xmlns:mpd="urn:mpeg:dash:schema:mpd:2011" type="static" mediaPresentationDuration="PT39.0S"
+        minBufferTime="PT2.0S" maxSegmentDuration="PT4.0S">
+        <mpd:Period id="0">
+            <mpd:AdaptationSet id="0" contentType="video" mimeType="video/mp4" codecs="avc1" width="1280" height="720">
+                <mpd:SegmentTemplate timescale="1000" duration="4000" initialization="init-$RepresentationID$.m4s"
+                    media="$RepresentationID$-$Time$.m4s" startNumber="0" />
+                <mpd:Representation id="0" bandwidth="1000000" />
+                <mpd:Representation id="1" bandwidth="500000" />
+            </mpd:AdaptationSet>
+        </mpd:Period>
+        <mpd:Period id="1">
+            <mpd:AdaptationSet id="1" contentType="audio" />
+        </mpd:Period>
+    </mpd:MPD>
+    """
@@ -0,0 +1,138 @@
+import asyncio
+from types import SimpleNamespace
+
+from behave import *
+
+from dash_emulator.clock import run_in_virtual_time
+from dash_emulator.config import Config
+from dash_emulator.models import State
+from dash_emulator.player import PlayerEventListener
+from dash_emulator.player_factory import build_simulated_dash_player
+from dash_emulator.trace import BandwidthTrace
+from features.steps.simulation import build_mpd
+
+use_step_matcher("re")
+
+
+class PlayerRecorder(PlayerEventListener):
+    def __init__(self):
+        self.transitions = []
+        self.samples = []
+
+    async def on_state_change(self, position: float, old_state: State, new_state: State):
+        self.transitions.append((asyncio.get_running_loop().time(), new_state))
+
+    async def on_buffer_level_change(self, buffer_level):
+        self.samples.append(asyncio.get_running_loop().time())
+
+
+def simulate(mpd, trace, event_driven, buffer_sample_interval):
+    event_driven_player, sample_interval = Config.event_driven_player, Config.buffer_sample_interval
+    Config.event_driven_player, Config.buffer_sample_interval = event_driven, buffer_sample_interval
+    try:
+        recorder = PlayerRecorder()
+        player = build_simulated_dash_player(mpd, trace, [recorder])
+        run_in_virtual_time(player.start(mpd.url))
+        return recorder
+    finally:
+        Config.event_driven_player, Config.buffer_sample_interval = event_driven_player, sample_interval
+
+
+@given("We have an MPD of 30 segments of 2 seconds and a trace with an outage")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args = SimpleNamespace()
+    context.args.mpd = build_mpd(30, 2.0)
+    context.args.trace = BandwidthTrace([(10, 2000000), (8, 0), (100, 2000000)])
+
+
+@when("The session is simulated with a polling player and with an event driven player")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    # Sample the buffer level on every wake-up to count them
+    context.args.polling = simulate(context.args.mpd, context.args.trace, False, 0)
+    context.args.event_driven = simulate(context.args.mpd, context.args.trace, True, 0)
+
+
+@then("Both players switch states in the same order at about the same time")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    polling = context.args.polling.transitions
+    event_driven = context.args.event_driven.transitions
+    assert [state for _, state in polling] == [state for _, state in event_driven]
+    assert State.BUFFERING in [state for _, state in polling]
+    for (polling_time, _), (event_driven_time, _) in zip(polling, event_driven):
+        assert abs(polling_time - event_driven_time) <= 2 * Config.update_interval
+
+
+@then("The event driven player wakes up far less often")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert len(context.args.event_driven.samples) * 10 < len(context.args.polling.samples)
+
+
+@when("The session is simulated with an event driven player sampling the buffer level every 1 second")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args.event_driven = simulate(context.args.mpd, context.args.trace, True, 1)
+
+
+@then("The buffer level events are 1 second apart")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    samples = context.args.event_driven.samples
+    assert len(samples) > 50
+    for previous, current in zip(samples, samples[1:]):
+        assert abs(current - previous - 1) < 1e-6
+
+
+@when("The session is simulated with the player of the default config")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    mpd = context.args.mpd
+    context.args.recorder = PlayerRecorder()
+    context.args.player = build_simulated_dash_player(mpd, context.args.trace, [context.args.recorder])
+    run_in_virtual_time(context.args.player.start(mpd.url))
+
+
+@then("The player polls and delivers the buffer level every update interval")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.player.event_driven is False
+    samples = context.args.recorder.samples
+    for previous, current in zip(samples, samples[1:]):
+        assert current - previous <= Config.update_interval + 1e-6
+    # Every wake-up of a session of about a minute
+    assert len(samples) > 60 / Config.update_interval
@@ -0,0 +1,193 @@
+import asyncio
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+from typing import Dict
+
+from behave import *
+
+from dash_emulator.abr import ABRController
+from dash_emulator.buffer import BufferManagerImpl
+from dash_emulator.download import DownloadManager, DownloadEventListener, DownloadHandle, DownloadManagerImpl
+from dash_emulator.models import AdaptationSet, Representation, Segment
+from dash_emulator.scheduler import SchedulerImpl
+from dash_emulator.storage import SegmentStorage
+from features.steps.local_server import start_local_server
+
+use_step_matcher("re")
+
+
+class MockDownloadManager(DownloadManager):
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.urls = []
+
+    @property
+    def is_busy(self):
+        return self.running > 0
+
+    def start_download(self, url, save: bool = False, path=None) -> DownloadHandle:
+        handle = DownloadHandle(url, save, path)
+        handle.attach(asyncio.create_task(self.download(url, save, path)))
+        return handle
+
+    async def download(self, url, save: bool = False, path=None):
+        self.urls.append(url)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+
+    async def close(self):
+        pass
+
+    async def stop(self, url: str):
+        pass
+
+    def add_listener(self, listener: DownloadEventListener):
+        pass
+
+
+class MockABRController(ABRController):
+    def update_selection(self, adaptation_sets: Dict[int, AdaptationSet]) -> Dict[int, int]:
+        return {id_: 0 for id_ in adaptation_sets}
+
+
+def build_adaptation_set(id_, content_type, base_url="http://foo.bar"):
+    segments = [Segment("%s/%d-%d.m4s" % (base_url, id_, i), 1.0) for i in range(2)]
+    representation = Representation(0, "video/mp4", "avc1", 100000, 640, 360, "%s/init-%d.m4s" % (base_url, id_),
+                                    segments)
+    return AdaptationSet(id_, content_type, "30/1", 640, 360, "16:9", {0: representation})
+
+
+@given("We have a scheduler with 2 adaptation sets and (?P<concurrency>\\d+) concurrent downloads")
+def step_impl(context, concurrency):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    concurrency : str
+    """
+    context.args = SimpleNamespace()
+    context.args.download_manager = MockDownloadManager()
+    context.args.buffer_manager = BufferManagerImpl()
+    context.args.scheduler = SchedulerImpl(1.5, 0.01, context.args.download_manager, None,
+                                           context.args.buffer_manager, MockABRController(), [],
+                                           max_concurrent_downloads=int(concurrency))
+    context.args.adaptation_sets = {0: build_adaptation_set(0, "video"), 1: build_adaptation_set(1, "audio")}
+
+
+@when("The scheduler downloads the first segment index")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+
+    async def run():
+        runner = None
+        if getattr(context.args, "serve", False):
+            runner, base_url = await start_local_server(30000)
+            context.args.adaptation_sets = {0: build_adaptation_set(0, "video", base_url),
+                                            1: build_adaptation_set(1, "audio", base_url)}
+        scheduler = context.args.scheduler
+        scheduler.start(context.args.adaptation_sets)
+        while context.args.buffer_manager.buffer_level < 1:
+            await asyncio.sleep(0.001)
+        await scheduler.stop()
+        if runner is not None:
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+@then("All the requests of the segment index run at the same time")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.download_manager.max_running == 4
+    assert set(context.args.download_manager.urls[:4]) == {"http://foo.bar/init-0.m4s", "http://foo.bar/0-0.m4s",
+                                                          "http://foo.bar/init-1.m4s", "http://foo.bar/1-0.m4s"}
+
+
+@then("The requests of the segment index run one by one")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.download_manager.max_running == 1
+    assert context.args.download_manager.urls[:4] == ["http://foo.bar/init-0.m4s", "http://foo.bar/0-0.m4s",
+                                                      "http://foo.bar/init-1.m4s", "http://foo.bar/1-0.m4s"]
+
+
+@given("We have a scheduler saving segments to an output folder")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args = SimpleNamespace()
+    context.args.serve = True
+    context.args.output = tempfile.mkdtemp()
+    context.args.download_manager = DownloadManagerImpl([], write_to_disk=True, write_block_size=8192)
+    context.args.buffer_manager = BufferManagerImpl()
+    context.args.scheduler = SchedulerImpl(0.5, 0.01, context.args.download_manager, None,
+                                           context.args.buffer_manager, MockABRController(), [],
+                                           max_concurrent_downloads=4,
+                                           segment_storage=SegmentStorage(context.args.output))
+
+
+@when("A new scheduler saving to the same output folder downloads the first segment index")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args.download_manager = DownloadManagerImpl([], write_to_disk=True, write_block_size=8192)
+    context.args.buffer_manager = BufferManagerImpl()
+    context.args.scheduler = SchedulerImpl(0.5, 0.01, context.args.download_manager, None,
+                                           context.args.buffer_manager, MockABRController(), [],
+                                           max_concurrent_downloads=4,
+                                           segment_storage=SegmentStorage(context.args.output))
+    context.execute_steps("When The scheduler downloads the first segment index")
+
+
+@then("The index file lists every file once")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    with open(os.path.join(context.args.output, SegmentStorage.INDEX_FILE_NAME)) as f:
+        files = [json.loads(line)["file"] for line in f]
+    assert len(files) == len(set(files))
+    assert "as0-rep0-00000.m4s" in files
+
+
+@then("The segments and the index file are in the output folder")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    output = context.args.output
+    for name in ("as0-rep0-init.m4s", "as0-rep0-00000.m4s", "as1-rep0-init.m4s", "as1-rep0-00000.m4s"):
+        assert os.path.getsize(os.path.join(output, name)) == 30000
+    with open(os.path.join(output, SegmentStorage.INDEX_FILE_NAME)) as f:
+        entries = [json.loads(line) for line in f]
+    files = {entry["file"]: entry for entry in entries}
+    assert files["as1-rep0-00000.m4s"]["url"].endswith("/1-0.m4s")
+    assert files["as1-rep0-00000.m4s"]["index"] == 0
+    assert files["as0-rep0-init.m4s"]["index"] is None
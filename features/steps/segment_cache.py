@@ -0,0 +1,132 @@
+import asyncio
+import tempfile
+import time
+from types import SimpleNamespace
+
+from behave import *
+
+from dash_emulator.cache import SegmentCache
+from dash_emulator.download import DownloadManagerImpl
+from features.steps.local_server import start_local_server
+
+use_step_matcher("re")
+
+
+@given("We have an HTTP download manager with a segment cache replaying at (?P<throughput>\\d+) bps")
+def step_impl(context, throughput):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    throughput : str
+    """
+    context.args = SimpleNamespace()
+    context.args.throughput = int(throughput)
+    context.args.cache = SegmentCache(tempfile.mkdtemp(), 1 << 20, context.args.throughput)
+    context.args.download_manager = DownloadManagerImpl([], False, 1024, cache=context.args.cache)
+
+
+@when("The same segment of (?P<size>\\d+) bytes is downloaded twice")
+def step_impl(context, size):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    size : str
+    """
+    context.args.size = int(size)
+
+    async def run():
+        runner, base_url = await start_local_server(context.args.size)
+        download_manager = context.args.download_manager
+        context.args.first = await download_manager.download(base_url + "/segment", save=True)
+        await runner.cleanup()
+
+        # The server is gone, so the second download could only be served by the cache
+        start = time.time()
+        context.args.second = await download_manager.download(base_url + "/segment", save=True)
+        context.args.second_time = time.time() - start
+        await download_manager.close()
+
+    asyncio.run(run())
+
+
+@then("The second download is served from the cache at the emulated throughput")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.cache.hits == 1
+    assert context.args.cache.misses == 1
+    assert len(context.args.first) == context.args.size
+    assert context.args.first == context.args.second
+    expected_time = context.args.size * 8 / context.args.throughput
+    assert abs(context.args.second_time - expected_time) < 0.05
+
+
+@given("We have a segment cache of (?P<max_size>\\d+) bytes")
+def step_impl(context, max_size):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    max_size : str
+    """
+    context.args = SimpleNamespace()
+    context.args.folder = tempfile.mkdtemp()
+    context.args.max_size = int(max_size)
+    context.args.cache = SegmentCache(context.args.folder, context.args.max_size)
+
+
+@when("(?P<num>\\d+) segments of (?P<size>\\d+) bytes are added to the cache")
+def step_impl(context, num, size):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    num : str
+    size : str
+    """
+    cache: SegmentCache = context.args.cache
+    for i in range(int(num)):
+        url = "http://foo.bar/%d.m4s" % i
+        path = cache.temp_path(url)
+        with open(path, 'wb') as f:
+            f.write(b'\0' * int(size))
+        cache.commit(url, path)
+        if i == 1:
+            # Use the first segment again, so the second one becomes the least recently used
+            assert cache.lookup("http://foo.bar/0.m4s") is not None
+
+
+@then("The least recently used segment is evicted")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    cache: SegmentCache = context.args.cache
+    assert len(cache) == 2
+    assert cache.size <= context.args.max_size
+    assert cache.lookup("http://foo.bar/0.m4s") is not None
+    assert cache.lookup("http://foo.bar/1.m4s") is None
+    assert cache.lookup("http://foo.bar/2.m4s") is not None
+
+
+@then("The cache is restored after a restart")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args.cache.close()
+    cache = SegmentCache(context.args.folder, context.args.max_size)
+    assert len(cache) == 2
+    assert cache.size == 200000
+    assert cache.lookup("http://foo.bar/0.m4s") is not None
+    assert cache.lookup("http://foo.bar/2.m4s") is not None
+    cache.close()
@@ -0,0 +1,151 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from behave import *
+
+from dash_emulator.clock import run_in_virtual_time
+from dash_emulator.models import MPD, AdaptationSet, Representation, Segment, State
+from dash_emulator.player import PlayerEventListener
+from dash_emulator.player_factory import build_simulated_dash_player
+from dash_emulator.simulation import SimulatedDownloadManager
+from dash_emulator.trace import BandwidthTrace
+
+use_step_matcher("re")
+
+
+class StateRecorder(PlayerEventListener):
+    def __init__(self):
+        self.transitions = []
+
+    async def on_state_change(self, position: float, old_state: State, new_state: State):
+        self.transitions.append((asyncio.get_running_loop().time(), old_state, new_state))
+
+    async def on_buffer_level_change(self, buffer_level):
+        pass
+
+
+def build_mpd(num_segments, duration):
+    adaptation_sets = dict()
+    for id_, content_type, bitrates in [(0, "video", [300000, 1000000, 3000000]), (1, "audio", [64000])]:
+        representations = dict()
+        for representation_id, bitrate in enumerate(bitrates):
+            segments = [Segment("http://foo.bar/%d-%d-%d.m4s" % (id_, representation_id, i), duration)
+                        for i in range(num_segments)]
+            representations[representation_id] = Representation(representation_id, "video/mp4", "avc1", bitrate, 640,
+                                                                360, "http://foo.bar/%d-%d-init.m4s" %
+                                                                (id_, representation_id), segments)
+        adaptation_sets[id_] = AdaptationSet(id_, content_type, "30/1", 640, 360, "16:9", representations)
+    return MPD("", "http://foo.bar/manifest.mpd", "static", num_segments * duration, duration, duration,
+               adaptation_sets)
+
+
+@given("We have a simulated download manager over a trace of 4 Mbps for 1 second then 8 Mbps")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    context.args = SimpleNamespace()
+    context.args.trace = BandwidthTrace([(1, 4000000), (10, 8000000)])
+
+
+@when("A (?P<size>\\d+) bytes segment is downloaded in virtual time")
+def step_impl(context, size):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    size : str
+    """
+    url = "http://foo.bar/segment.m4s"
+
+    async def main():
+        download_manager = SimulatedDownloadManager([], context.args.trace, {url: int(size)})
+        start = asyncio.get_running_loop().time()
+        await download_manager.download(url)
+        return asyncio.get_running_loop().time() - start
+
+    context.args.elapsed = run_in_virtual_time(main())
+
+
+@then("The download takes 2 seconds of virtual time")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    # 0.5 MB in the first second, 1 MB in the next one
+    assert abs(context.args.elapsed - 2) < 1e-6
+
+
+@given("We have an MPD of (?P<num>\\d+) segments of (?P<duration>[\\d.]+) seconds")
+def step_impl(context, num, duration):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    num : str
+    duration : str
+    """
+    context.args = SimpleNamespace()
+    context.args.mpd = build_mpd(int(num), float(duration))
+
+
+@when("The session is simulated over a (?P<bandwidth>\\d+) Mbps trace in (?P<mode>virtual|real) time")
+def step_impl(context, bandwidth, mode):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    bandwidth : str
+    mode : str
+    """
+    recorder = StateRecorder()
+    player = build_simulated_dash_player(context.args.mpd, BandwidthTrace.constant(int(bandwidth) * 1000000),
+                                         [recorder])
+    start = time.time()
+    if mode == "virtual":
+        run_in_virtual_time(player.start(context.args.mpd.url))
+        context.args.virtual = recorder.transitions
+    else:
+        asyncio.run(player.start(context.args.mpd.url))
+        context.args.real = recorder.transitions
+    context.args.wall_time = time.time() - start
+
+
+@then("The session ends after 1 hour of virtual time")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    end_time, _, state = context.args.virtual[-1]
+    assert state == State.END
+    assert 3600 <= end_time < 3610
+
+
+@then("The simulation takes a few seconds of wall time")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert context.args.wall_time < 10
+
+
+@then("Both sessions have the same state transitions")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    virtual = [(old_state, new_state) for _, old_state, new_state in context.args.virtual]
+    real = [(old_state, new_state) for _, old_state, new_state in context.args.real]
+    assert virtual == real
+    assert virtual[-1][1] == State.END
@@ -0,0 +1,81 @@
+import random
+from types import SimpleNamespace
+
+from behave import *
+
+from dash_emulator.clock import EventLoopClock, run_in_virtual_time
+from dash_emulator.config import Config
+from dash_emulator.player_factory import build_simulated_dash_player
+from dash_emulator.qoe import QoECollector
+from dash_emulator.trace import BandwidthTrace
+from dash_emulator.vectorized import simulate_sessions
+from features.steps.simulation import build_mpd
+
+use_step_matcher("re")
+
+
+@given("We have a reference set of (?P<num>\\d+) sessions over random traces with stalls")
+def step_impl(context, num):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    num : str
+    """
+    rand = random.Random(42)
+    context.args = SimpleNamespace()
+    context.args.mpd = build_mpd(60, 2.0)
+    context.args.traces = []
+    for _ in range(int(num)):
+        # Outages of 0 bps included
+        periods = [(rand.uniform(0.5, 5), rand.choice([0, rand.uniform(100000, 5000000)])) for _ in range(20)]
+        context.args.traces.append(BandwidthTrace(periods + [(1, 1000000)]))
+    context.args.panic_buffers = [rand.choice([1, 2, 3]) for _ in context.args.traces]
+    context.args.safe_buffers = [rand.choice([3.5, 4, 6]) for _ in context.args.traces]
+
+
+@when("The sessions are played by event driven simulated players in virtual time and by the vectorized simulator")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    mpd = context.args.mpd
+    event_driven_player = Config.event_driven_player
+    Config.event_driven_player = True
+    try:
+        context.args.reference = []
+        for trace, panic_buffer, safe_buffer in zip(context.args.traces, context.args.panic_buffers,
+                                                    context.args.safe_buffers):
+            qoe = QoECollector(mpd, EventLoopClock())
+            player = build_simulated_dash_player(mpd, trace, [qoe], {"panic_buffer": panic_buffer,
+                                                                      "safe_buffer": safe_buffer}, abr="dash")
+            run_in_virtual_time(player.start(mpd.url))
+            context.args.reference.append(qoe.result())
+        context.args.vectorized = simulate_sessions(mpd, context.args.traces, context.args.panic_buffers,
+                                                    context.args.safe_buffers)
+    finally:
+        Config.event_driven_player = event_driven_player
+
+
+@then("The QoE metrics of every session are exactly the same")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    for i, reference in enumerate(context.args.reference):
+        for name, value in reference.items():
+            assert context.args.vectorized[name][i] == value, (i, name, value, context.args.vectorized[name][i])
+
+
+@then("Some sessions stall")
+def step_impl(context):
+    """
+    Parameters
+    ----------
+    context : behave.runner.Context
+    """
+    assert any(reference["rebuffer_count"] > 0 for reference in context.args.reference)
@@ -0,0 +1,7 @@
+Feature: Simulate many sessions in lockstep with NumPy
+
+  Scenario: The vectorized simulator matches the event driven player in virtual time bit for bit
+    Given We have a reference set of 40 sessions over random traces with stalls
+    When The sessions are played by event driven simulated players in virtual time and by the vectorized simulator
+    Then The QoE metrics of every session are exactly the same
+    And Some sessions stall
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import argparse
+import logging
+import sys
+from typing import Dict, List, Union
+
+from dash_emulator.batch import BatchRunner, build_sessions
+from dash_emulator.config import Config
+from dash_emulator.event_loop import EVENT_LOOPS
+from dash_emulator.player_factory import ABR_CONTROLLERS
+
+log = logging.getLogger(__name__)
+
+
+def create_parser():
+    arg_parser = argparse.ArgumentParser(description="Simulate many sessions over bandwidth traces in virtual time")
+    arg_parser.add_argument("--mpd", type=str, action='append', required=True,
+                            help="URL or path of an MPD file. Repeat it to sweep over many MPD files.")
+    arg_parser.add_argument("--trace", type=str, action='append', required=True,
+                            help="Path to a bandwidth trace. Repeat it to sweep over many traces.")
+    arg_parser.add_argument("--abr", type=str, action='append', default=None, choices=list(ABR_CONTROLLERS),
+                            help="ABR algorithm. Repeat it to compare many algorithms. "
+                                 "Default to the algorithm of the config.")
+    arg_parser.add_argument("--abr-param", type=str, action='append', default=[],
+                            help="Values of an ABR parameter to sweep, e.g. panic_buffer=1,2,3. "
+                                 "Prefix it with an algorithm to sweep it for that one only, e.g. bola:min_buffer=1,2. "
+                                 "Repeat it to sweep over the combinations of many parameters.")
+    arg_parser.add_argument("--output", type=str, required=True,
+                            help="Path to the JSON Lines file to append the results to. "
+                                 "The sessions already in it are skipped.")
+    arg_parser.add_argument("--processes", type=int, required=False, default=None,
+                            help="Number of worker processes. Default to the number of CPUs.")
+    arg_parser.add_argument("--chunk-size", type=int, required=False, default=1,
+                            help="Number of sessions sent to a worker at once")
+    arg_parser.add_argument("--loop", type=str, required=False, default=Config.event_loop, choices=EVENT_LOOPS,
+                            help="Event loop implementation to download the MPD files with. "
+                                 "The sessions always run in virtual time.")
+    return arg_parser
+
+
+def parse_abr_value(value: str) -> Union[int, float]:
+    # Keep whole numbers integers, since some parameters count segments
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def parse_abr_grid(abr_params: List[str], abr: str) -> Dict[str, List[Union[int, float]]]:
+    grid = dict()
+    for abr_param in abr_params:
+        name, values = abr_param.split("=", 1)
+        if ":" in name:
+            algorithm, name = name.split(":", 1)
+            if algorithm.strip() != abr:
+                continue
+        grid[name.strip()] = [parse_abr_value(value) for value in values.split(",")]
+    return grid
+
+
+def print_progress(done: int, total: int):
+    if done == total or done % 100 == 0:
+        sys.stderr.write("\r%d/%d sessions" % (done, total))
+        if done == total:
+            sys.stderr.write("\n")
+        sys.stderr.flush()
+
+
+if __name__ == '__main__':
+    parser = create_parser()
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    sessions = []
+    for abr in args.abr if args.abr is not None else [Config.abr_algorithm]:
+        try:
+            abr_grid = parse_abr_grid(args.abr_param, abr)
+        except ValueError:
+            log.error("ABR parameters should look like [algorithm:]name=value1,value2")
+            exit(-1)
+        sessions += build_sessions(args.mpd, args.trace, abr_grid, abr)
+    try:
+        runner = BatchRunner(args.output, args.processes, args.chunk_size, progress=print_progress,
+                             event_loop=args.loop)
+    except ValueError as e:
+        log.error(str(e))
+        exit(-1)
+    num_failed = runner.run(sessions)
+    exit(1 if num_failed > 0 else 0)
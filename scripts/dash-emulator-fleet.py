@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import logging
+import re
+import sys
+
+from dash_emulator.config import Config
+from dash_emulator.event_loop import EVENT_LOOPS, run_in_event_loop, resolve_event_loop
+from dash_emulator.fleet import Fleet, QoEAggregator
+from dash_emulator.player_factory import ABR_CONTROLLERS
+from dash_emulator.session import SessionPool
+from dash_emulator.sharded_fleet import ShardedFleet
+
+log = logging.getLogger(__name__)
+
+
+def create_parser():
+    arg_parser = argparse.ArgumentParser(description="Play one MPD with many players in one process")
+    arg_parser.add_argument("--clients", type=int, required=True, help="Number of players")
+    arg_parser.add_argument("--stagger", type=float, required=False, default=Config.fleet_stagger,
+                            help="Delay between the starts of two players in seconds")
+    arg_parser.add_argument("--max-connections", type=int, required=False, default=Config.fleet_max_connections,
+                            help="Max number of connections shared by all the players, 0 for no limit")
+    arg_parser.add_argument("--processes", type=int, required=False, default=1,
+                            help="Number of worker processes to shard the players over. "
+                                 "With more than one, live counters are reported instead of the QoE of every player.")
+    arg_parser.add_argument("--output", type=str, required=False, default=None,
+                            help="Path to a JSON Lines file to write the QoE of every player to. "
+                                 "Only supported with a single process.")
+    arg_parser.add_argument("--abr", type=str, required=False, default=Config.abr_algorithm,
+                            choices=list(ABR_CONTROLLERS), help="ABR algorithm of the players")
+    arg_parser.add_argument("--loop", type=str, required=False, default=Config.event_loop, choices=EVENT_LOOPS,
+                            help="Event loop implementation. auto selects uvloop when it is installed.")
+    arg_parser.add_argument("target", type=str, help="Target MPD file link")
+    return arg_parser
+
+
+def print_report(report):
+    sys.stderr.write("%6.1fs running %d, finished %d, failed %d, stalled %d, rebuffer ratio %.4f, %.1f Mbps\n" % (
+        report["elapsed"], report["running"], report["finished"], report["failed"], report["stalled"],
+        report["rebuffer_ratio"], report["throughput"] / 1e6))
+    sys.stderr.flush()
+
+
+async def main(args):
+    cfg = Config
+    session_pool = SessionPool(args.max_connections, 0, cfg.keepalive_timeout, cfg.dns_cache_ttl, cfg.tcp_nodelay)
+    output = open(args.output, 'w') if args.output is not None else None
+    try:
+        fleet = Fleet(args.clients, args.stagger, QoEAggregator(output), session_pool)
+        return await fleet.run(args.target)
+    finally:
+        if output is not None:
+            output.close()
+
+
+if __name__ == '__main__':
+    parser = create_parser()
+    args = parser.parse_args()
+    if args.processes > 1 and args.output is not None:
+        # The workers only report live counters, not the QoE of every player
+        parser.error("--output can't be used with more than one process")
+
+    if re.match("^(http|https)://", args.target) is None:
+        log.error("Argument \"target\" (%s) is not in the right format" % args.target)
+        exit(-1)
+    try:
+        resolve_event_loop(args.loop)
+    except ValueError as e:
+        log.error(str(e))
+        exit(-1)
+
+    # The events of every player would flood the console
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("Fleet").setLevel(logging.INFO)
+
+    # The players are built with the ABR algorithm of the config
+    Config.abr_algorithm = args.abr
+    if args.processes > 1:
+        # The workers are forked with the config of the parent
+        Config.fleet_max_connections = args.max_connections
+        fleet = ShardedFleet(args.clients, args.processes, args.stagger, Config.fleet_report_interval,
+                             progress=print_report, event_loop=args.loop)
+        report = fleet.run(args.target)
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        exit(1 if report["failed"] > 0 or report["crashed_workers"] > 0 else 0)
+
+    sink = run_in_event_loop(main(args), args.loop)
+    json.dump(sink.summary(), sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    exit(1 if sink.num_failed > 0 else 0)
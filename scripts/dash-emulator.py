@@ -1,14 +1,19 @@
 #!/usr/bin/env python3
 
 import argparse
-import asyncio
 import logging
 import pathlib
 import re
 import sys
 from typing import Dict, Union
 
-from dash_emulator.player_factory import build_dash_player
+from dash_emulator.cache import SegmentCache
+from dash_emulator.clock import run_in_virtual_time
+from dash_emulator.config import Config
+from dash_emulator.event_loop import EVENT_LOOPS, run_in_event_loop, resolve_event_loop
+from dash_emulator.player_factory import ABR_CONTROLLERS, build_dash_player, build_simulated_dash_player
+from dash_emulator.simulation import fetch_mpd
+from dash_emulator.trace import load_trace
 
 log = logging.getLogger(__name__)
 
@@ -22,6 +27,25 @@ def create_parser():
     arg_parser.add_argument("--proxy", type=str, help='NOT IMPLEMENTED YET')
     arg_parser.add_argument("--output", type=str, required=False, default=None,
                             help="Path to output folder. Indicate this argument to save videos and related data.")
+    arg_parser.add_argument("--cache", type=str, required=False, default=None,
+                            help="Path to a segment cache folder, which is reused across runs.")
+    arg_parser.add_argument("--cache-size", type=int, required=False, default=Config.cache_max_size >> 20,
+                            help="Max size of the segment cache in MB")
+    arg_parser.add_argument("--cache-throughput", type=float, required=False,
+                            default=Config.cache_replay_throughput,
+                            help="Throughput to replay cached segments at, in bps. Replay at full speed if omitted.")
+    arg_parser.add_argument("--trace", type=str, required=False, default=None,
+                            help="Path to a bandwidth trace. Indicate this argument to simulate the session in virtual "
+                                 "time over the trace instead of downloading the segments.")
+    arg_parser.add_argument("--abr", type=str, required=False, default=Config.abr_algorithm,
+                            choices=list(ABR_CONTROLLERS), help="ABR algorithm")
+    arg_parser.add_argument("--loop", type=str, required=False, default=Config.event_loop, choices=EVENT_LOOPS,
+                            help="Event loop implementation. auto selects uvloop when it is installed. "
+                                 "Simulations over a trace always run on their own event loop in virtual time.")
+    arg_parser.add_argument("--event-driven", required=False, default=Config.event_driven_player,
+                            action='store_true',
+                            help="Let the player sleep until the next buffer underrun or download instead of waking "
+                                 "up every update interval")
     arg_parser.add_argument("--plot", required=False, default=False, action='store_true')
     arg_parser.add_argument("-y", required=False, default=False, action='store_true',
                             help="Automatically overwrite output folder")
@@ -42,6 +66,18 @@ def validate_args(arguments: Dict[str, Union[int, str, None]]) -> bool:
             PLAYER_TARGET, arguments[PLAYER_TARGET]))
         return False
 
+    # Validate trace
+    if arguments["trace"] is not None and not pathlib.Path(arguments["trace"]).is_file():
+        log.error("Trace file %s doesn't exist" % arguments["trace"])
+        return False
+
+    # Validate event loop
+    try:
+        resolve_event_loop(arguments["loop"])
+    except ValueError as e:
+        log.error(str(e))
+        return False
+
     # Validate proxy
     # TODO
 
@@ -72,6 +108,19 @@ if __name__ == '__main__':
 
     logging.basicConfig(level=logging.INFO)
 
-    player = build_dash_player()
+    # The players are built with the main loop of the config
+    Config.event_driven_player = args["event_driven"]
+
+    if args["trace"] is not None:
+        mpd = run_in_event_loop(fetch_mpd(args["target"]), args["loop"])
+        player = build_simulated_dash_player(mpd, load_trace(args["trace"]), abr=args["abr"])
+        run_in_virtual_time(player.start(args["target"]))
+        exit(0)
+
+    cache = None
+    if args["cache"] is not None:
+        cache = SegmentCache(args["cache"], args["cache_size"] << 20, args["cache_throughput"])
+
+    player = build_dash_player(output=args["output"], cache=cache, abr=args["abr"])
 
-    asyncio.run(player.start(args["target"]))
+    run_in_event_loop(player.start(args["target"]), args["loop"])
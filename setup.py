@@ -18,6 +18,11 @@ setup(name='dash-emulator',
       author_email='yang.jace.liu@linux.com',
       url='https://github.com/Yang-Jace-Liu/dash-emulator',
       packages=find_packages(),
-      scripts=["scripts/dash-emulator.py"],
-      install_requires=requirements
+      scripts=["scripts/dash-emulator.py", "scripts/dash-emulator-batch.py",
+               "scripts/dash-emulator-fleet.py"],
+      install_requires=requirements,
+      extras_require={
+          "vectorized": ["numpy"],  # for the vectorized session simulator
+          "uvloop": ["uvloop"]  # for a faster event loop
+      }
       )